@@ -0,0 +1,308 @@
+"""Reflexion 图的离线端到端基准测试。
+
+使用确定性的替身 LLM 和替身搜索后端（见 fakes.py）端到端运行 create_reflexion_graph /
+create_async_reflexion_graph，不访问网络，用于建立项目自身开销的回归基线：
+- 吞吐量：runs/sec
+- 整个运行以及每个节点（draft / execute_tools / revise）的 p50/p95/p99 延迟
+- 每次运行的内存分配（tracemalloc 峰值和留存量）
+- 对并发度和 max_iterations 做参数扫描
+
+用法（在仓库根目录，已 pip install -e .）：
+    python benchmarks/bench_graph.py
+    python benchmarks/bench_graph.py --concurrency 1,8,32 --max-iterations 1,2,3 --runs 64
+    python benchmarks/bench_graph.py --mode async --search-latency lognormal:0.05,0.5
+    python benchmarks/bench_graph.py --json baseline.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# 默认关闭搜索缓存，避免缓存命中掩盖搜索路径的开销（可用 --search-cache 打开）
+os.environ.setdefault("SEARCH_CACHE_ENABLED", "false")
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+from fakes import FakeChatModel, FakeSearchClient, LatencyDistribution
+from reflexion_agent import create_async_reflexion_graph, create_reflexion_graph
+from reflexion_agent.infra import get_search_cache, set_llm_instance, set_search_client
+
+NODE_NAMES = ("draft", "execute_tools", "revise")
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """计算分位数（最近秩法）。
+
+    Args:
+        samples: 样本
+        q: 分位数，0 到 100
+
+    Returns:
+        float: 分位数值，没有样本时返回 0.0
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class NodeTimer(BaseCallbackHandler):
+    """通过回调记录每个图节点的执行耗时。
+
+    图节点本身的运行带有 "graph:step:N" 标签，且运行名与 langgraph_node 元数据一致，
+    据此区分节点和节点内部的子运行（提示模板、模型调用等）。
+    """
+
+    def __init__(self):
+        self._starts: dict = {}
+        self._lock = threading.Lock()
+        self.samples: dict[str, list[float]] = {name: [] for name in NODE_NAMES}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, tags=None, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        if name in self.samples and (metadata or {}).get("langgraph_node") == name:
+            if any(tag.startswith("graph:step:") for tag in tags or ()):
+                with self._lock:
+                    self._starts[run_id] = (name, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+            if start is not None:
+                self.samples[start[0]].append(time.perf_counter() - start[1])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._starts.pop(run_id, None)
+
+
+def _questions(runs: int, distinct: Optional[int]) -> list[str]:
+    """生成测试问题；distinct 小于 runs 时问题会重复，用于测试缓存和请求合并。"""
+    distinct = distinct or runs
+    return [f"Benchmark question number {i % distinct} about reflexion agents" for i in range(runs)]
+
+
+def _run_sync(
+    graph, questions: list[str], concurrency: int, callbacks: list, configurable: Optional[dict] = None
+) -> tuple[list[float], int]:
+    """用线程池并发执行同步图，返回每次运行的耗时和失败次数。"""
+    config = {"callbacks": callbacks, "configurable": dict(configurable or {})}
+
+    def run_one(question: str) -> float:
+        start = time.perf_counter()
+        graph.invoke({"messages": [HumanMessage(content=question)]}, config)
+        return time.perf_counter() - start
+
+    durations, failures = [], 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(run_one, question) for question in questions]
+        for future in futures:
+            try:
+                durations.append(future.result())
+            except Exception:
+                failures += 1
+    return durations, failures
+
+
+def _run_async(
+    graph, questions: list[str], concurrency: int, callbacks: list, configurable: Optional[dict] = None
+) -> tuple[list[float], int]:
+    """在一个事件循环中以有界并发执行异步图，返回每次运行的耗时和失败次数。"""
+    config = {"callbacks": callbacks, "configurable": dict(configurable or {})}
+
+    async def main() -> list:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(question: str) -> float:
+            async with semaphore:
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=question)]}, config)
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(run_one(q) for q in questions), return_exceptions=True)
+
+    results = asyncio.run(main())
+    durations = [r for r in results if isinstance(r, float)]
+    return durations, len(results) - len(durations)
+
+
+def _measure_allocations(graph, mode: str, runs: int) -> dict:
+    """在 tracemalloc 下顺序执行若干次运行，统计每次运行的内存分配。
+
+    tracemalloc 会显著拖慢执行，因此与吞吐量测量分开进行。
+
+    Returns:
+        dict: peak_kib（单次运行的平均峰值分配）和 retained_kib（单次运行后的平均留存量）
+    """
+    peaks, retained = [], []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for i in range(runs):
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            question = f"Allocation probe {i}"
+            if mode == "async":
+                asyncio.run(graph.ainvoke({"messages": [HumanMessage(content=question)]}))
+            else:
+                graph.invoke({"messages": [HumanMessage(content=question)]})
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+            retained.append(current - baseline)
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_kib": sum(peaks) / len(peaks) / 1024 if peaks else 0.0,
+        "retained_kib": sum(retained) / len(retained) / 1024 if retained else 0.0,
+    }
+
+
+def run_benchmark(
+    max_iterations: int,
+    concurrency: int,
+    runs: int,
+    mode: str = "sync",
+    distinct_questions: Optional[int] = None,
+    alloc_runs: int = 3,
+    node_timing: bool = True,
+    configurable: Optional[dict] = None,
+) -> dict:
+    """执行一组配置的基准测试。
+
+    Args:
+        max_iterations: 反思循环的最大迭代次数
+        concurrency: 并发运行数
+        runs: 运行总数
+        mode: "sync"（线程池 + invoke）或 "async"（事件循环 + ainvoke）
+        distinct_questions: 不同问题的数量，默认每次运行的问题都不同
+        alloc_runs: 内存分配测量的运行次数，0 表示跳过
+        node_timing: 是否记录每个节点的耗时（回调本身有少量开销）
+        configurable: 传给每次运行的 configurable 选项，例如 {"speculative_search": True}
+
+    Returns:
+        dict: 该配置的测量结果
+    """
+    factory = create_async_reflexion_graph if mode == "async" else create_reflexion_graph
+    graph = factory(max_iterations=max_iterations)
+    runner = _run_async if mode == "async" else _run_sync
+
+    # 预热：构建链、填充各类延迟初始化的单例
+    runner(graph, _questions(1, None), 1, [], configurable)
+    if cache := get_search_cache():
+        cache.clear()
+
+    timer = NodeTimer()
+    questions = _questions(runs, distinct_questions)
+    start = time.perf_counter()
+    durations, failures = runner(
+        graph, questions, concurrency, [timer] if node_timing else [], configurable
+    )
+    wall = time.perf_counter() - start
+
+    result = {
+        "mode": mode,
+        "max_iterations": max_iterations,
+        "concurrency": concurrency,
+        "runs": runs,
+        "failures": failures,
+        "wall_seconds": wall,
+        "runs_per_sec": len(durations) / wall if wall else 0.0,
+        "run_ms": {f"p{q}": percentile(durations, q) * 1000 for q in (50, 95, 99)},
+        "nodes_ms": {
+            name: {f"p{q}": percentile(samples, q) * 1000 for q in (50, 95, 99)}
+            for name, samples in timer.samples.items()
+            if samples
+        },
+    }
+    if alloc_runs:
+        result["allocations"] = _measure_allocations(graph, mode, alloc_runs)
+    return result
+
+
+def _format_row(result: dict) -> str:
+    nodes = "  ".join(
+        f"{name}={ms['p50']:.1f}/{ms['p95']:.1f}/{ms['p99']:.1f}"
+        for name, ms in result["nodes_ms"].items()
+    )
+    allocations = result.get("allocations")
+    alloc = f"{allocations['peak_kib']:.0f}/{allocations['retained_kib']:.0f}" if allocations else "-"
+    return (
+        f"{result['max_iterations']:>4} {result['concurrency']:>5} {result['runs_per_sec']:>9.1f} "
+        f"{result['run_ms']['p50']:>8.1f} {result['run_ms']['p95']:>8.1f} {result['run_ms']['p99']:>8.1f} "
+        f"{alloc:>13}  {nodes}"
+    )
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv: Optional[list[str]] = None) -> list[dict]:
+    parser = argparse.ArgumentParser(description="Offline reflexion graph benchmark (no network).")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="comma-separated sweep")
+    parser.add_argument("--max-iterations", type=_int_list, default=[1, 2, 3], help="comma-separated sweep")
+    parser.add_argument("--runs", type=int, default=32, help="runs per configuration")
+    parser.add_argument("--distinct-questions", type=int, default=None)
+    parser.add_argument("--llm-latency", default="const:0", help="e.g. const:0.2, uniform:0.1,0.5")
+    parser.add_argument("--search-latency", default="const:0", help="e.g. lognormal:0.05,0.5")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--alloc-runs", type=int, default=3, help="runs measured under tracemalloc (0 to skip)")
+    parser.add_argument("--no-node-timing", action="store_true")
+    parser.add_argument("--search-cache", action="store_true", help="keep the search cache enabled")
+    parser.add_argument(
+        "--speculative-search", action="store_true", help="prefetch draft search queries while streaming"
+    )
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    if args.search_cache:
+        os.environ["SEARCH_CACHE_ENABLED"] = "true"
+    set_llm_instance(FakeChatModel(latency=LatencyDistribution(args.llm_latency, seed=args.seed)))
+    search = FakeSearchClient(latency=LatencyDistribution(args.search_latency, seed=args.seed + 1))
+    set_search_client(search)
+
+    print(
+        f"mode={args.mode} runs={args.runs} llm={args.llm_latency} search={args.search_latency} "
+        f"python={sys.version.split()[0]}"
+    )
+    print(f"{'iter':>4} {'conc':>5} {'runs/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak/kept KiB':>13}  node p50/p95/p99 ms")
+    results = []
+    for max_iterations in args.max_iterations:
+        for concurrency in args.concurrency:
+            result = run_benchmark(
+                max_iterations,
+                concurrency,
+                args.runs,
+                mode=args.mode,
+                distinct_questions=args.distinct_questions,
+                alloc_runs=args.alloc_runs,
+                node_timing=not args.no_node_timing,
+                configurable={"speculative_search": True} if args.speculative_search else None,
+            )
+            results.append(result)
+            print(_format_row(result), flush=True)
+    print(f"search calls: {search.calls}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"args": {k: v for k, v in vars(args).items() if k != "json_path"}, "results": results},
+                f,
+                indent=2,
+            )
+    return results
+
+
+if __name__ == "__main__":
+    main()
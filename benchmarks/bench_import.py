@@ -0,0 +1,169 @@
+"""包导入时间基准测试（冷启动回归预算）。
+
+在全新的子进程中用 python -X importtime 执行导入语句，解析每个模块的自身耗时，
+统计总导入时间（多次重复取中位数）和耗时最多的顶层包。解释器启动时就会加载的模块
+（python -c pass 中出现的模块，例如 site 和 .pth 钩子）不计入。结果与预算比较：
+- 总耗时超过预算（乘以 --budget-scale）时判定失败
+- import reflexion_agent 还会检查是否加载了不应在包导入时加载的重量级依赖
+  （LangGraph、LangChain、httpx、pydantic、python-dotenv）
+
+任何检查失败时退出码为 1，可以直接用作 CI 的回归门禁。
+
+用法（在仓库根目录，已 pip install -e .）：
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 9 --top 15
+    python benchmarks/bench_import.py --budget-scale 2 --json importtime.json   # 较慢的 CI 机器
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Optional
+
+# 导入语句 -> (预算毫秒数, 不允许加载的顶层包)
+# 预算按开发机上测得的中位数留出约两倍余量；-X importtime 本身会让导入变慢
+TARGETS: dict[str, tuple[float, tuple[str, ...]]] = {
+    "import reflexion_agent": (
+        15.0,
+        ("langgraph", "langchain", "langchain_core", "langsmith", "httpx", "pydantic", "dotenv"),
+    ),
+    "from reflexion_agent.infra import RunBudget": (600.0, ("langgraph", "langchain", "httpx")),
+    "from reflexion_agent import get_reflexion_graph": (1200.0, ("langchain", "langchain_community")),
+}
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int]]:
+    """解析 -X importtime 的输出。
+
+    Args:
+        stderr: 子进程的标准错误输出
+
+    Returns:
+        list[tuple[str, int]]: (模块名, 自身耗时微秒) 列表
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            # 跳过表头 "self [us] | cumulative | imported package"
+            continue
+        modules.append((parts[2].strip(), int(parts[0])))
+    return modules
+
+
+def measure(statement: str, exclude: frozenset = frozenset()) -> list[tuple[str, int]]:
+    """在全新的解释器中执行导入语句并返回每个模块的自身耗时。
+
+    Args:
+        statement: 导入语句
+        exclude: 不计入的模块名（解释器启动时加载的模块）
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{proc.stderr[-2000:]}")
+    return [(name, us) for name, us in parse_importtime(proc.stderr) if name not in exclude]
+
+
+def startup_modules() -> frozenset:
+    """解释器启动时（执行任何语句之前）就会加载的模块。"""
+    return frozenset(name for name, _ in measure("pass"))
+
+
+def run_target(
+    statement: str,
+    budget_ms: float,
+    forbidden: tuple[str, ...],
+    repeat: int,
+    top: int,
+    exclude: frozenset = frozenset(),
+) -> dict:
+    """多次测量一个导入语句并与预算比较。
+
+    Args:
+        statement: 导入语句
+        budget_ms: 预算（毫秒）
+        forbidden: 不允许加载的顶层包
+        repeat: 重复次数（取中位数）
+        top: 报告耗时最多的前几个顶层包
+        exclude: 不计入的模块名（解释器启动时加载的模块）
+
+    Returns:
+        dict: 测量结果，ok 为是否通过
+    """
+    # 第一次运行预热字节码缓存和文件系统缓存，不计入结果
+    measure(statement, exclude)
+    totals = []
+    by_package: dict[str, list[int]] = defaultdict(list)
+    loaded: set[str] = set()
+    for _ in range(repeat):
+        modules = measure(statement, exclude)
+        totals.append(sum(us for _, us in modules) / 1000)
+        per_run: dict[str, int] = defaultdict(int)
+        for name, us in modules:
+            per_run[name.split(".")[0]] += us
+            loaded.add(name.split(".")[0])
+        for package, us in per_run.items():
+            by_package[package].append(us)
+
+    total_ms = statistics.median(totals)
+    heaviest = sorted(
+        ((package, statistics.median(samples) / 1000) for package, samples in by_package.items()),
+        key=lambda item: -item[1],
+    )[:top]
+    violations = sorted(loaded & set(forbidden))
+    return {
+        "statement": statement,
+        "total_ms": round(total_ms, 2),
+        "min_ms": round(min(totals), 2),
+        "budget_ms": budget_ms,
+        "forbidden_loaded": violations,
+        "heaviest": [{"package": package, "ms": round(ms, 2)} for package, ms in heaviest],
+        "ok": total_ms <= budget_ms and not violations,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> list[dict]:
+    parser = argparse.ArgumentParser(description="Import-time benchmark with regression budgets.")
+    parser.add_argument("--repeat", type=int, default=5, help="measured runs per statement (median)")
+    parser.add_argument("--top", type=int, default=8, help="heaviest top-level packages to report")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every budget (slow machines)")
+    parser.add_argument("--statement", action="append", help="measure only these statements (budget: none)")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    if args.statement:
+        targets = {statement: TARGETS.get(statement, (float("inf"), ())) for statement in args.statement}
+    else:
+        targets = TARGETS
+
+    exclude = startup_modules()
+    results = []
+    for statement, (budget_ms, forbidden) in targets.items():
+        result = run_target(statement, budget_ms * args.budget_scale, forbidden, args.repeat, args.top, exclude)
+        results.append(result)
+        status = "ok" if result["ok"] else "OVER BUDGET"
+        print(f"{statement}")
+        print(f"  total {result['total_ms']:.1f} ms (min {result['min_ms']:.1f}, budget {result['budget_ms']:.0f}) {status}")
+        if result["forbidden_loaded"]:
+            print(f"  loaded forbidden packages: {', '.join(result['forbidden_loaded'])}")
+        for entry in result["heaviest"]:
+            print(f"    {entry['ms']:8.1f} ms  {entry['package']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    sys.exit(0 if all(result["ok"] for result in main()) else 1)
@@ -0,0 +1,235 @@
+"""离线基准测试使用的替身后端。
+
+- LatencyDistribution: 可配置的延迟分布（const / uniform / lognormal），使用固定种子保证可复现
+- FakeChatModel: 确定性的聊天模型，按绑定的工具生成合法的 AnswerQuestion / ReviseAnswer 工具调用
+- FakeSearchClient: 与 TavilySearchClient 接口一致的搜索替身，按延迟分布模拟网络耗时
+
+所有替身都不访问网络，用于测量项目自身（图编排、消息 reducer、工具解析等）的开销。
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class LatencyDistribution:
+    """延迟分布。
+
+    规格字符串格式：
+    - "const:0.05": 固定 50ms
+    - "uniform:0.01,0.1": 10ms 到 100ms 之间均匀分布
+    - "lognormal:0.05,0.5": 中位数 50ms、对数标准差 0.5 的对数正态分布（长尾）
+    """
+
+    def __init__(self, spec: str = "const:0", seed: int = 0):
+        """解析延迟分布规格。
+
+        Args:
+            spec: 分布规格字符串
+            seed: 随机数种子
+
+        Raises:
+            ValueError: 如果规格字符串无法解析
+        """
+        kind, _, params = spec.partition(":")
+        try:
+            values = [float(v) for v in params.split(",")] if params else []
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec!r}") from None
+        if kind == "const" and len(values) <= 1:
+            self._sample = lambda rng: values[0] if values else 0.0
+        elif kind == "uniform" and len(values) == 2:
+            self._sample = lambda rng: rng.uniform(values[0], values[1])
+        elif kind == "lognormal" and len(values) == 2:
+            mu = math.log(values[0]) if values[0] > 0 else 0.0
+            self._sample = lambda rng: rng.lognormvariate(mu, values[1]) if values[0] > 0 else 0.0
+        else:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        self.spec = spec
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """采样一次延迟（秒）。"""
+        with self._lock:
+            return max(0.0, self._sample(self._rng))
+
+
+_call_ids = itertools.count()
+
+
+class FakeChatModel(BaseChatModel):
+    """确定性的替身聊天模型。
+
+    bind_tools 只记录 tool_choice；生成时根据 tool_choice 返回对应工具的调用，
+    参数内容由消息数量决定，因此同样的输入总是得到同样的输出。
+    """
+
+    latency: Any = None
+    answer_words: int = 250
+    # 流式输出时，延迟中首个片段之前的比例，其余部分平均分摊到各个片段
+    first_chunk_fraction: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-reflexion"
+
+    def bind_tools(self, tools, *, tool_choice: Optional[str] = None, **kwargs):
+        return self.bind(tool_choice=tool_choice, **kwargs)
+
+    def _tool_args(self, messages: list[BaseMessage], tool_name: str) -> dict:
+        """生成工具调用参数。"""
+        step = len(messages)
+        topic = next(
+            (m.content for m in messages if m.type == "human" and isinstance(m.content, str)),
+            "topic",
+        )[:40]
+        args = {
+            "answer": " ".join(f"word{(step + i) % 97}" for i in range(self.answer_words)),
+            "reflection": {
+                "missing": f"Missing details about {topic} (step {step}).",
+                "superfluous": "Nothing superfluous.",
+            },
+            "search_queries": [f"{topic} aspect {step}", f"{topic} overview"],
+        }
+        if tool_name == "ReviseAnswer":
+            args["references"] = [f"https://example.com/{step}/{i}" for i in range(3)]
+        return args
+
+    def _delay(self) -> float:
+        return self.latency.sample() if self.latency is not None else 0.0
+
+    def _message(self, messages: list[BaseMessage], tool_choice: Optional[str]) -> AIMessage:
+        tool_name = tool_choice or "AnswerQuestion"
+        args = self._tool_args(messages, tool_name)
+        # 按约 4 个字符一个 token 估算用量，便于验证 token 相关的统计
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(json.dumps(args, ensure_ascii=False)) // 4
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": tool_name, "args": args, "id": f"call_{next(_call_ids)}"}],
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, tool_choice=None, **kwargs) -> ChatResult:
+        if delay := self._delay():
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, tool_choice))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tool_choice=None, **kwargs) -> ChatResult:
+        if delay := self._delay():
+            await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, tool_choice))])
+
+    def _chunks(self, messages, tool_choice) -> Iterator[tuple[float, ChatGenerationChunk]]:
+        """按 16 个字符一块切分工具调用参数，模拟真实模型的增量输出。
+
+        Yields:
+            tuple: (片段应当输出的绝对时间点, 片段)；按绝对时间点输出，避免逐次 sleep 的误差累积
+        """
+        delay = self._delay()
+        message = self._message(messages, tool_choice)
+        tool_call = message.tool_calls[0]
+        payload = json.dumps(tool_call["args"], ensure_ascii=False)
+        starts = range(0, len(payload), 16)
+        per_chunk = delay * (1 - self.first_chunk_fraction) / max(1, len(starts))
+        began = time.monotonic()
+        for n, i in enumerate(starts):
+            first = i == 0
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": tool_call["name"] if first else None,
+                            "args": payload[i : i + 16],
+                            "id": tool_call["id"] if first else None,
+                            "index": 0,
+                        }
+                    ],
+                )
+            )
+            yield began + delay * self.first_chunk_fraction + n * per_chunk, chunk
+
+    def _stream(self, messages, stop=None, run_manager=None, tool_choice=None, **kwargs):
+        for at, chunk in self._chunks(messages, tool_choice):
+            if (wait := at - time.monotonic()) > 0:
+                time.sleep(wait)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, tool_choice=None, **kwargs):
+        # 原生异步流式输出：默认实现会把同步生成器的每一步都放到线程池执行
+        for at, chunk in self._chunks(messages, tool_choice):
+            if (wait := at - time.monotonic()) > 0:
+                await asyncio.sleep(wait)
+            yield chunk
+
+
+class FakeSearchClient:
+    """与 TavilySearchClient 接口一致的搜索替身。"""
+
+    def __init__(self, latency: Optional[LatencyDistribution] = None, max_results: int = 5, content_chars: int = 600):
+        """初始化搜索替身。
+
+        Args:
+            latency: 每个查询的延迟分布，为 None 时没有延迟
+            max_results: 每个查询返回的结果数
+            content_chars: 每条结果的内容长度
+        """
+        self.latency = latency
+        self.max_results = max_results
+        self.content_chars = content_chars
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _results(self, query: str, max_results: Optional[int]) -> list[dict]:
+        with self._lock:
+            self.calls += 1
+        slug = "_".join(query.split())
+        return [
+            {
+                "title": f"{query} #{i}",
+                "url": f"https://example.com/{slug}/{i}",
+                "content": (f"{query} result {i}. " * 50)[: self.content_chars],
+                "score": 1.0 - i / 10,
+            }
+            for i in range(max_results or self.max_results)
+        ]
+
+    def _delay(self) -> float:
+        return self.latency.sample() if self.latency is not None else 0.0
+
+    def search(self, query: str, max_results: Optional[int] = None) -> list[dict]:
+        if delay := self._delay():
+            time.sleep(delay)
+        return self._results(query, max_results)
+
+    async def asearch(self, query: str, max_results: Optional[int] = None) -> list[dict]:
+        if delay := self._delay():
+            await asyncio.sleep(delay)
+        return self._results(query, max_results)
+
+    def batch(self, queries: list[str], max_results: Optional[int] = None) -> list[list[dict]]:
+        return [self.search(query, max_results) for query in queries]
+
+    async def abatch(self, queries: list[str], max_results: Optional[int] = None) -> list[list[dict]]:
+        return list(await asyncio.gather(*(self.asearch(query, max_results) for query in queries)))
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
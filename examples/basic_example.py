@@ -11,11 +11,12 @@ load_dotenv()
 
 from langchain_core.messages import HumanMessage
 
-from reflexion_agent.graph import create_reflexion_graph
+from reflexion_agent.graph import get_reflexion_graph
 
 # 为 langgraph.json 创建图实例
 # 这是 LangGraph 开发服务器需要的全局变量
-graph = create_reflexion_graph()
+# get_reflexion_graph 按配置缓存编译后的图，重复导入或按请求获取时不会重新编译
+graph = get_reflexion_graph()
 
 if __name__ == "__main__":
     # 示例查询：关于 AI-Powered SOC 和自主 SOC 的问题
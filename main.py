@@ -11,11 +11,11 @@ load_dotenv()
 
 from langchain_core.messages import HumanMessage
 
-from reflexion_agent.graph import create_reflexion_graph
+from reflexion_agent.graph import get_reflexion_graph
 
 if __name__ == "__main__":
     # 创建 Reflexion Agent 图
-    graph = create_reflexion_graph()
+    graph = get_reflexion_graph()
 
     # 生成图的可视化（保存为 PNG 图片）
     # 这有助于理解 Agent 的工作流程
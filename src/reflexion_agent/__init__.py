@@ -5,30 +5,62 @@
 
 主要导出：
 - create_reflexion_graph: 创建 Reflexion Agent 的工作流图
+- create_async_reflexion_graph: 创建使用异步节点的工作流图
+- get_reflexion_graph: 按配置缓存的已编译工作流图
+- invalidate_graph_cache: 使已缓存的编译图失效
+- get_run_counters: 读取运行状态中的迭代和节点计数器
+- run_batch / arun_batch: 并发执行一批问题，按完成顺序返回结果
+- RunBudget: 单次运行的耗时、token 和搜索次数预算
+- AnswerCache / AnswerCachedGraph: 整次运行的语义答案缓存
+- LLMSpec: 通过 configurable["llm"] 按运行选择模型（见 infra.llm_pool）
 - setup_azure_openai: 配置 Azure OpenAI
 - first_responder: 初始响应生成链（向后兼容）
 - revisor: 答案修订链（向后兼容）
 - get_llm: 获取 LLM 实例
+- warmup / awarmup: 在接收第一个请求之前预先创建 LLM、链、ToolNode、搜索客户端和编译后的图
+
+所有导出都是延迟加载的（见 reflexion_agent._lazy）：import reflexion_agent 本身几乎没有开销，
+LangGraph、LangChain 等依赖在第一次访问用到它们的名称时才会导入。
 """
 
-from langchain_core.output_parsers import PydanticToolsParser
+from reflexion_agent._lazy import lazy_exports
+from reflexion_agent.infra.singleton import LazySingleton
 
-from reflexion_agent.graph import create_reflexion_graph
-from reflexion_agent.infra import (
-    AnswerQuestion,
-    REVISE_INSTRUCTIONS,
-    ReviseAnswer,
-    create_actor_prompt_template,
-    get_llm,
-    get_llm_instance,
-    setup_azure_openai,
-)
+# 子模块 -> 导出的名称。子模块在第一次访问其中某个名称时才会导入
+# infra 中的 schema / prompts 名称不在 __all__ 中，但保持可以从包级别导入（向后兼容）
+_lazy_getattr, _lazy_dir, _ = lazy_exports(__name__, {
+    "batch": ("BatchResult", "arun_batch", "run_batch"),
+    "graph": (
+        "create_reflexion_graph",
+        "create_async_reflexion_graph",
+        "get_reflexion_graph",
+        "invalidate_graph_cache",
+        "get_graph_registry_stats",
+        "get_run_counters",
+    ),
+    "startup": ("warmup", "awarmup"),
+    "infra": (
+        "RunBudget",
+        "AnswerCache",
+        "AnswerCachedGraph",
+        "LLMSpec",
+        "setup_azure_openai",
+        "get_llm",
+        "get_llm_instance",
+        "AnswerQuestion",
+        "ReviseAnswer",
+        "REVISE_INSTRUCTIONS",
+        "create_actor_prompt_template",
+    ),
+})
 
 # 向后兼容：创建 first_responder 和 revisor
 # 这些链的实现逻辑已经在 nodes 模块中，这里为了向后兼容重新导出
 
 def _create_first_responder():
     """创建初始响应生成链（向后兼容）。"""
+    from reflexion_agent.infra import AnswerQuestion, create_actor_prompt_template, get_llm_instance
+
     llm = get_llm_instance()
     actor_prompt_template = create_actor_prompt_template()
     first_responder = actor_prompt_template.partial(
@@ -36,12 +68,9 @@ def _create_first_responder():
     ) | llm.bind_tools(tools=[AnswerQuestion], tool_choice="AnswerQuestion")
     return first_responder
 
-_first_responder_instance = None
+_first_responder_instance = LazySingleton(_create_first_responder, name="first_responder")
 def _get_first_responder():
-    global _first_responder_instance
-    if _first_responder_instance is None:
-        _first_responder_instance = _create_first_responder()
-    return _first_responder_instance
+    return _first_responder_instance.get()
 
 class _FirstResponder:
     """可调用的 first_responder 对象（向后兼容）。"""
@@ -50,11 +79,10 @@ class _FirstResponder:
 
 first_responder = _FirstResponder()
 
-# Pydantic 工具解析器（向后兼容）
-validator = PydanticToolsParser(tools=[AnswerQuestion])
-
 def _create_revisor():
     """创建答案修订链（向后兼容）。"""
+    from reflexion_agent.infra import REVISE_INSTRUCTIONS, ReviseAnswer, create_actor_prompt_template, get_llm_instance
+
     llm = get_llm_instance()
     actor_prompt_template = create_actor_prompt_template()
     revisor = actor_prompt_template.partial(
@@ -62,12 +90,9 @@ def _create_revisor():
     ) | llm.bind_tools(tools=[ReviseAnswer], tool_choice="ReviseAnswer")
     return revisor
 
-_revisor_instance = None
+_revisor_instance = LazySingleton(_create_revisor, name="revisor")
 def _get_revisor():
-    global _revisor_instance
-    if _revisor_instance is None:
-        _revisor_instance = _create_revisor()
-    return _revisor_instance
+    return _revisor_instance.get()
 
 class _Revisor:
     """可调用的 revisor 对象（向后兼容）。"""
@@ -76,12 +101,43 @@ class _Revisor:
 
 revisor = _Revisor()
 
+
+def __getattr__(name: str):
+    # Pydantic 工具解析器（向后兼容），第一次访问时创建
+    if name == "validator":
+        from langchain_core.output_parsers import PydanticToolsParser
+
+        from reflexion_agent.infra import AnswerQuestion
+
+        global validator
+        validator = PydanticToolsParser(tools=[AnswerQuestion])
+        return validator
+    return _lazy_getattr(name)
+
+
+def __dir__() -> list[str]:
+    return sorted(set(_lazy_dir()) | {"validator"})
+
 __all__ = [
     "create_reflexion_graph",
+    "create_async_reflexion_graph",
+    "get_reflexion_graph",
+    "invalidate_graph_cache",
+    "get_graph_registry_stats",
+    "get_run_counters",
+    "run_batch",
+    "arun_batch",
+    "BatchResult",
+    "RunBudget",
+    "AnswerCache",
+    "AnswerCachedGraph",
+    "LLMSpec",
     "setup_azure_openai",
     "first_responder",
     "revisor",
     "get_llm",
     "get_llm_instance",
+    "warmup",
+    "awarmup",
     "validator",
 ]
@@ -0,0 +1,48 @@
+"""包级别的延迟导入。
+
+reflexion_agent、reflexion_agent.infra 和 reflexion_agent.nodes 的 __init__ 只声明
+"名称 -> 子模块" 的映射，通过模块级 __getattr__（PEP 562）在第一次访问某个名称时
+才导入对应的子模块。import reflexion_agent 因此不会加载 LangGraph、LangChain、httpx
+等依赖，CLI 和自动扩缩容的服务进程只为实际用到的部分付出导入开销。
+
+    __getattr__, __dir__, __all__ = lazy_exports(__name__, {
+        "budget": ("RunBudget", "get_run_budget"),
+        ...
+    })
+
+from reflexion_agent.infra import RunBudget 同样会触发 __getattr__。解析后的值会写回
+包的命名空间，之后的访问不再经过 __getattr__。
+"""
+
+import importlib
+import sys
+from typing import Any, Callable
+
+
+def lazy_exports(
+    package: str, exports: dict[str, tuple[str, ...]]
+) -> tuple[Callable[[str], Any], Callable[[], list[str]], list[str]]:
+    """为包生成延迟导入的 __getattr__ 和 __dir__。
+
+    Args:
+        package: 包名（在 __init__ 中传入 __name__）
+        exports: 子模块名（相对于包）-> 从该子模块导出的名称
+
+    Returns:
+        tuple: (__getattr__, __dir__, 所有导出名称的列表)
+    """
+    origins = {name: module for module, names in exports.items() for name in names}
+
+    def __getattr__(name: str) -> Any:
+        module = origins.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(f".{module}", package), name)
+        # 写回包的命名空间，后续访问直接命中模块字典
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(sys.modules[package])) | set(origins))
+
+    return __getattr__, __dir__, list(origins)
@@ -0,0 +1,305 @@
+"""批量问答 API。
+
+在一个有界的线程池（或事件循环）上并发执行大量 reflexion 任务：
+- 所有任务共享同一个编译后的图、LLM 实例和搜索客户端（连接池、缓存、单飞合并）
+- 结果按完成顺序流式返回
+- 单个问题失败不会中断整个批次，错误记录在对应的结果中
+- 可选的 JSONL 检查点文件：每完成一个问题追加一行，中断后重新运行会跳过已成功的问题
+
+用法：
+    for result in run_batch(questions, concurrency=16, checkpoint_path="batch.jsonl"):
+        print(result.index, result.error or result.answer[:80])
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field, fields
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+from reflexion_agent.graph import MAX_ITERATIONS, get_reflexion_graph, get_run_counters
+from reflexion_agent.infra.answer_cache import AnswerCache, AnswerCachedGraph
+from reflexion_agent.infra.budget import RunBudget
+from reflexion_agent.nodes import StoppingPolicy
+
+
+@dataclass
+class BatchResult:
+    """单个问题的执行结果。"""
+
+    index: int
+    question: str
+    answer: Optional[str] = None
+    references: list[str] = field(default_factory=list)
+    error: Optional[str] = None
+    duration_seconds: float = 0.0
+    iterations: int = 0
+    # 是否来自检查点文件（之前的运行已经完成）
+    resumed: bool = False
+    # 运行预算的消耗报告（提供 budget_factory 时）
+    budget_usage: Optional[dict] = None
+    # 是否由语义答案缓存直接返回（提供 answer_cache 时）
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# BatchResult 的字段名：检查点记录中的其他键（例如其他版本写入的字段）在恢复时忽略
+_RESULT_FIELDS = frozenset(f.name for f in fields(BatchResult))
+
+
+def _final_answer(state: dict) -> tuple[Optional[str], list[str]]:
+    """从最终状态中提取最后一次答案及其引用。"""
+    for message in reversed(state.get("messages", [])):
+        if isinstance(message, AIMessage) and message.tool_calls:
+            args = message.tool_calls[0]["args"]
+            return args.get("answer"), list(args.get("references") or [])
+    return None, []
+
+
+def _load_checkpoint(checkpoint_path: Optional[str], questions: list[str]) -> dict[int, BatchResult]:
+    """读取检查点文件中已成功完成的问题（索引和问题文本都需要匹配）。"""
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return {}
+    completed = {}
+    with open(checkpoint_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时可能留下写了一半的最后一行
+                continue
+            index = record.get("index")
+            if (
+                isinstance(index, int)
+                and 0 <= index < len(questions)
+                and record.get("question") == questions[index]
+                and record.get("error") is None
+            ):
+                record = {key: value for key, value in record.items() if key in _RESULT_FIELDS}
+                record["resumed"] = True
+                completed[index] = BatchResult(**record)
+    return completed
+
+
+def _run_config(
+    config: Optional[RunnableConfig],
+    index: int,
+    budget_factory: Optional[Callable[[], RunBudget]] = None,
+) -> RunnableConfig:
+    """为单个问题构造运行配置，run_id 用于区分指标中的各个运行，每个问题使用独立的预算。"""
+    config = dict(config or {})
+    config["configurable"] = {"run_id": f"batch-{index}", **(config.get("configurable") or {})}
+    if budget_factory is not None:
+        config["configurable"]["budget"] = budget_factory()
+    return config
+
+
+def _result_from_state(index: int, question: str, state: dict, started: float) -> BatchResult:
+    answer, references = _final_answer(state)
+    messages = state.get("messages") or []
+    return BatchResult(
+        index=index,
+        question=question,
+        answer=answer,
+        references=references,
+        duration_seconds=time.perf_counter() - started,
+        iterations=get_run_counters(state)["iterations"],
+        budget_usage=state.get("budget_usage"),
+        cached=bool(messages and messages[-1].response_metadata.get("answer_cache")),
+    )
+
+
+def _ends_with_partial_line(path: str) -> bool:
+    """检查点文件是否以不完整的行（没有换行符）结尾。"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+class _CheckpointWriter:
+    """以追加方式写入 JSONL 检查点，每条结果写完立即刷新到磁盘。"""
+
+    def __init__(self, path: Optional[str]):
+        self._file = open(path, "a", encoding="utf-8") if path else None
+        if self._file is not None and _ends_with_partial_line(path):
+            # 上次中断时留下了写了一半的最后一行，先换行，避免新记录与它连在一起无法解析
+            self._file.write("\n")
+
+    def write(self, result: BatchResult) -> None:
+        if self._file is None:
+            return
+        record = asdict(result)
+        record.pop("resumed")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+def run_batch(
+    questions: Iterable[str],
+    concurrency: int = 8,
+    max_iterations: int = MAX_ITERATIONS,
+    checkpoint_path: Optional[str] = None,
+    config: Optional[RunnableConfig] = None,
+    yield_completed: bool = True,
+    stopping_policy: Optional[StoppingPolicy] = None,
+    budget_factory: Optional[Callable[[], RunBudget]] = None,
+    answer_cache: Optional[AnswerCache] = None,
+) -> Iterator[BatchResult]:
+    """在有界线程池上并发执行一批问题，按完成顺序返回结果。
+
+    Args:
+        questions: 问题列表
+        concurrency: 同时执行的问题数，小于 1 时按 1 处理
+        max_iterations: 反思循环的最大迭代次数
+        checkpoint_path: JSONL 检查点文件路径。已成功的问题不会重新执行，
+            失败的问题会在下次运行时重试
+        config: 传给每次运行的基础配置（例如 configurable 中的搜索并发设置）
+        yield_completed: 是否先返回检查点文件中已完成的结果（resumed=True）
+        stopping_policy: 提前终止策略，为 None 时固定执行 max_iterations 轮
+        budget_factory: 为每个问题创建运行预算的函数（见 infra.budget），例如
+            lambda: RunBudget(deadline_seconds=60)；预算耗尽时返回目前最好的答案
+        answer_cache: 语义答案缓存（见 infra.answer_cache）。与已回答问题足够相似的问题直接
+            返回缓存的答案（cached=True），新的答案写入缓存
+
+    Yields:
+        BatchResult: 每个问题的结果；执行失败时 error 为错误描述
+    """
+    questions = list(questions)
+    concurrency = max(1, concurrency)
+    completed = _load_checkpoint(checkpoint_path, questions)
+    if yield_completed:
+        yield from completed.values()
+
+    graph = get_reflexion_graph(max_iterations, stopping_policy=stopping_policy)
+    if answer_cache is not None:
+        graph = AnswerCachedGraph(graph, answer_cache)
+    pending = deque(i for i in range(len(questions)) if i not in completed)
+
+    def run_one(index: int) -> BatchResult:
+        started = time.perf_counter()
+        try:
+            state = graph.invoke(
+                {"messages": [HumanMessage(content=questions[index])]}, _run_config(config, index, budget_factory)
+            )
+        except Exception as e:
+            return BatchResult(
+                index=index,
+                question=questions[index],
+                error=repr(e),
+                duration_seconds=time.perf_counter() - started,
+            )
+        return _result_from_state(index, questions[index], state, started)
+
+    writer = _CheckpointWriter(checkpoint_path)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="reflexion-batch")
+    in_flight = set()
+    try:
+        while pending or in_flight:
+            # 只提交并发窗口内的任务，避免一次性为成千上万个问题创建 Future
+            while pending and len(in_flight) < concurrency:
+                in_flight.add(executor.submit(run_one, pending.popleft()))
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                writer.write(result)
+                yield result
+    finally:
+        # 调用方提前停止迭代时，丢弃尚未开始的任务
+        executor.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+
+
+async def arun_batch(
+    questions: Iterable[str],
+    concurrency: int = 8,
+    max_iterations: int = MAX_ITERATIONS,
+    checkpoint_path: Optional[str] = None,
+    config: Optional[RunnableConfig] = None,
+    yield_completed: bool = True,
+    stopping_policy: Optional[StoppingPolicy] = None,
+    budget_factory: Optional[Callable[[], RunBudget]] = None,
+    answer_cache: Optional[AnswerCache] = None,
+) -> AsyncIterator[BatchResult]:
+    """在当前事件循环中并发执行一批问题（异步版本），按完成顺序返回结果。
+
+    使用异步节点的图，等待 LLM 和搜索时不占用线程，适合较高的并发度。
+
+    Args:
+        questions: 问题列表
+        concurrency: 同时执行的问题数，小于 1 时按 1 处理
+        max_iterations: 反思循环的最大迭代次数
+        checkpoint_path: JSONL 检查点文件路径
+        config: 传给每次运行的基础配置
+        yield_completed: 是否先返回检查点文件中已完成的结果（resumed=True）
+        stopping_policy: 提前终止策略，为 None 时固定执行 max_iterations 轮
+        budget_factory: 为每个问题创建运行预算的函数（见 infra.budget），例如
+            lambda: RunBudget(deadline_seconds=60)；预算耗尽时返回目前最好的答案
+        answer_cache: 语义答案缓存（见 infra.answer_cache）。与已回答问题足够相似的问题直接
+            返回缓存的答案（cached=True），新的答案写入缓存
+
+    Yields:
+        BatchResult: 每个问题的结果；执行失败时 error 为错误描述
+    """
+    questions = list(questions)
+    concurrency = max(1, concurrency)
+    completed = _load_checkpoint(checkpoint_path, questions)
+    if yield_completed:
+        for result in completed.values():
+            yield result
+
+    graph = get_reflexion_graph(max_iterations, use_async=True, stopping_policy=stopping_policy)
+    if answer_cache is not None:
+        graph = AnswerCachedGraph(graph, answer_cache)
+    pending = iter([i for i in range(len(questions)) if i not in completed])
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        # 每个 worker 依次领取问题，worker 数量即并发上限
+        for index in pending:
+            started = time.perf_counter()
+            try:
+                state = await graph.ainvoke(
+                    {"messages": [HumanMessage(content=questions[index])]}, _run_config(config, index, budget_factory)
+                )
+                result = _result_from_state(index, questions[index], state, started)
+            except Exception as e:
+                result = BatchResult(
+                    index=index,
+                    question=questions[index],
+                    error=repr(e),
+                    duration_seconds=time.perf_counter() - started,
+                )
+            await results.put(result)
+        await results.put(None)
+
+    writer = _CheckpointWriter(checkpoint_path)
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        remaining = len(workers)
+        while remaining:
+            result = await results.get()
+            if result is None:
+                remaining -= 1
+                continue
+            writer.write(result)
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        writer.close()
@@ -8,37 +8,107 @@
 4. 条件循环：根据迭代次数决定是继续改进还是结束
 """
 
-from typing import Annotated, TypedDict
+import operator
+import threading
+import time
+from collections import OrderedDict
+from typing import Annotated, Optional, TypedDict
 
 from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
 
 # 直接从 nodes 包导入节点函数
+from reflexion_agent.infra.metrics import instrument_node, instrument_router
+from reflexion_agent.infra.result_store import track_result_urls
+from reflexion_agent.infra.settings import get_settings
 from reflexion_agent.nodes import (
+    StoppingPolicy,
+    adraft_node,
+    aexecute_tools_node,
+    arevise_node,
     create_event_loop,
     draft_node,
     execute_tools_node,
     revise_node,
+    track_answers,
 )
 
 
+def merge_counts(left: dict[str, int], right: dict[str, int]) -> dict[str, int]:
+    """合并节点计数器的 reducer：按键累加。
+    
+    Args:
+        left: 当前计数
+        right: 节点返回的增量计数
+        
+    Returns:
+        dict[str, int]: 合并后的计数
+    """
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        merged[key] = merged.get(key, 0) + value
+    return merged
+
+
 # 定义状态结构
 class ReflexionState(TypedDict):
     """Reflexion Agent 的状态定义。
     
     状态包含消息列表，用于在节点之间传递消息历史。
+    同时携带由 reducer 增量维护的计数器，路由函数可以 O(1) 读取迭代次数，
+    而不必每一步都重新扫描整个消息历史：
+    - iterations: 已完成的工具执行（搜索）轮数，由 execute_tools 节点每次加 1
+    - node_counts: 各节点的执行次数，例如 {"draft": 1, "execute_tools": 2, "revise": 2}
+    - budget_usage: 运行预算的消耗报告（只在 configurable 中传入 budget 时写入，见 infra.budget），
+      每个节点结束时用最新的快照覆盖
+    - answer_progress: 停止策略读取的答案进度摘要（上一次和最新的答案、已经提出过的查询等），
+      draft / revise 写入本轮的答案参数，由 track_answers 合并（见 nodes.stopping）
+    - result_urls: 之前各轮搜索已经返回过的结果 URL，用于结果整形的跨轮次去重，
+      execute_tools 写入本步骤新增的 URL，由 track_result_urls 合并（见 infra.result_store）
     """
     messages: Annotated[list[BaseMessage], add_messages]
+    iterations: Annotated[int, operator.add]
+    node_counts: Annotated[dict[str, int], merge_counts]
+    budget_usage: Optional[dict]
+    answer_progress: Annotated[dict, track_answers]
+    result_urls: Annotated[frozenset, track_result_urls]
+
+
+def get_run_counters(state: dict) -> dict:
+    """从状态中读取运行计数器，便于外部监控。
+    
+    既可以传入 graph.invoke 返回的最终状态，也可以传入 graph.get_state(config).values。
+    
+    Args:
+        state: 图的状态字典
+        
+    Returns:
+        dict: 包含 iterations、node_counts 和 budget_usage（没有预算时为 None）的计数器快照
+    """
+    return {
+        "iterations": state.get("iterations", 0),
+        "node_counts": dict(state.get("node_counts") or {}),
+        "budget_usage": state.get("budget_usage"),
+    }
 
 
 # 最大迭代次数：限制反思循环的执行次数，避免无限循环
 MAX_ITERATIONS = 2
 
 
-def create_reflexion_graph(max_iterations: int = MAX_ITERATIONS):
-    """创建 Reflexion Agent 的工作流图。
+def _build_reflexion_graph(
+    draft,
+    execute_tools,
+    revise,
+    max_iterations: int,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    stopping_policy: Optional[StoppingPolicy] = None,
+):
+    """构建并编译 Reflexion Agent 的工作流图。
     
+    同步与异步版本共享同一套图结构，只是节点实现不同。
     构建一个包含以下节点的图：
     - draft: 初始答案生成节点
     - execute_tools: 工具执行节点（搜索）
@@ -53,7 +123,12 @@ def create_reflexion_graph(max_iterations: int = MAX_ITERATIONS):
        - 如果达到最大迭代次数，结束流程
     
     Args:
-        max_iterations: 反思循环的最大迭代次数，默认为 2
+        draft: 初始答案生成节点函数
+        execute_tools: 工具执行节点函数
+        revise: 答案修订节点函数
+        max_iterations: 反思循环的最大迭代次数
+        checkpointer: 检查点存储，为 None 时不保存检查点
+        stopping_policy: 提前终止策略，为 None 时固定执行 max_iterations 轮
         
     Returns:
         Compiled StateGraph: 编译后的图对象，可以直接调用 invoke 方法
@@ -63,18 +138,24 @@ def create_reflexion_graph(max_iterations: int = MAX_ITERATIONS):
     # 它使用自定义状态结构来管理节点之间的数据传递。
     # 在这个实现中，我们定义 ReflexionState 来包含消息列表，使用 add_messages 来合并消息。
     builder = StateGraph(ReflexionState)
+    # 节点和共享组件（搜索缓存、并发、压缩等）从运行配置读取设置，
+    # 构建图时先解析一次配置（加载 .env；包导入时不加载）
+    get_settings()
 
     # 添加三个主要节点
-    # draft: 初始答案生成节点，使用 draft_node 函数
-    builder.add_node("draft", draft_node)
+    # 每个节点都经过 instrument_node 包装：启用指标时记录耗时、token 和搜索统计，关闭时几乎没有开销
+    # draft: 初始答案生成节点
+    builder.add_node("draft", instrument_node("draft", draft))
     # execute_tools: 工具执行节点，执行搜索查询
-    builder.add_node("execute_tools", execute_tools_node)
-    # revise: 答案修订节点，使用 revise_node 函数
-    builder.add_node("revise", revise_node)
+    builder.add_node("execute_tools", instrument_node("execute_tools", execute_tools))
+    # revise: 答案修订节点
+    builder.add_node("revise", instrument_node("revise", revise))
 
     # 创建事件循环条件函数
     # 这个函数会根据迭代次数决定是继续执行还是结束流程
-    event_loop = create_event_loop(max_iterations=max_iterations)
+    event_loop = instrument_router(
+        create_event_loop(max_iterations=max_iterations, stopping_policy=stopping_policy)
+    )
 
     # 添加边连接节点
     # START -> draft: 从入口点开始，执行初始答案生成
@@ -88,7 +169,201 @@ def create_reflexion_graph(max_iterations: int = MAX_ITERATIONS):
 
     # 编译并返回图
     # 注意：使用 add_edge(START, "draft") 会自动设置入口点，无需再调用 set_entry_point
-    return builder.compile()
+    # 传入 checkpointer 后，每一步结束时都会保存检查点，可以通过 thread_id 恢复或回放
+    return builder.compile(checkpointer=checkpointer)
+
+
+def create_reflexion_graph(
+    max_iterations: int = MAX_ITERATIONS,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    stopping_policy: Optional[StoppingPolicy] = None,
+):
+    """创建 Reflexion Agent 的工作流图。
+    
+    图的流程：
+    1. 从 draft 节点开始，生成初始答案
+    2. draft -> execute_tools：执行工具调用获取更多信息
+    3. execute_tools -> revise：基于工具结果修订答案
+    4. 在 revise 后，根据迭代次数决定继续改进还是结束
+    
+    使用同步节点实现，适合 main.py 等脚本通过 invoke 直接调用。
+    
+    Args:
+        max_iterations: 反思循环的最大迭代次数，默认为 2
+        checkpointer: 检查点存储（例如 SqliteDeltaCheckpointer），为 None 时不保存检查点。
+            使用检查点时需要在 config 中提供 thread_id
+        stopping_policy: 提前终止策略（例如 DEFAULT_STOPPING_POLICY），为 None 时固定执行
+            max_iterations 轮，max_iterations 始终是硬上限
+        
+    Returns:
+        Compiled StateGraph: 编译后的图对象，可以直接调用 invoke 方法
+    """
+    return _build_reflexion_graph(
+        draft_node, execute_tools_node, revise_node,
+        max_iterations=max_iterations,
+        checkpointer=checkpointer,
+        stopping_policy=stopping_policy,
+    )
+
 
+def create_async_reflexion_graph(
+    max_iterations: int = MAX_ITERATIONS,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    stopping_policy: Optional[StoppingPolicy] = None,
+):
+    """创建使用异步节点的 Reflexion Agent 工作流图。
+    
+    图结构与 create_reflexion_graph 完全相同，但 draft/execute_tools/revise
+    节点都是 async def 实现（内部使用 ainvoke/abatch）。LLM 和搜索的等待时间
+    不会占用工作线程，一个事件循环即可同时调度大量并发运行。
+    
+    注意：异步节点只能通过 ainvoke/astream 调用。
+    
+    Args:
+        max_iterations: 反思循环的最大迭代次数，默认为 2
+        checkpointer: 检查点存储（例如 SqliteDeltaCheckpointer），为 None 时不保存检查点。
+            使用检查点时需要在 config 中提供 thread_id
+        stopping_policy: 提前终止策略（例如 DEFAULT_STOPPING_POLICY），为 None 时固定执行
+            max_iterations 轮，max_iterations 始终是硬上限
+        
+    Returns:
+        Compiled StateGraph: 编译后的图对象，通过 await graph.ainvoke(...) 调用
+    """
+    return _build_reflexion_graph(
+        adraft_node, aexecute_tools_node, arevise_node,
+        max_iterations=max_iterations,
+        checkpointer=checkpointer,
+        stopping_policy=stopping_policy,
+    )
+
+
+# 已编译图的注册表：配置键 -> 编译后的图（LRU）
+# 编译图需要重新构建 StateGraph 并校验整个拓扑，按配置缓存后，每个请求都可以直接复用。
+# 键中的 checkpointer / stopping_policy 按对象身份区分，编译后的图本身也强引用它们；
+# 每个请求都传入新对象时，由条目数上限淘汰最久未使用的图，释放对应的对象
+_GRAPH_REGISTRY_MAX_SIZE = 32
+_graph_registry: "OrderedDict[tuple, object]" = OrderedDict()
+_graph_registry_lock = threading.Lock()
+_graph_registry_stats = {
+    "hits": 0,
+    "misses": 0,
+    "compiles": 0,
+    "evictions": 0,
+    "compile_seconds": 0.0,
+    "last_compile_seconds": 0.0,
+}
+
+
+def _graph_config_key(
+    max_iterations: int,
+    use_async: bool,
+    checkpointer: Optional[BaseCheckpointSaver],
+    stopping_policy: Optional[StoppingPolicy],
+) -> tuple:
+    """生成图注册表的配置键。
+
+    键包含所有会影响编译结果的参数，以及当前配置中的模型设置（Azure OpenAI / OpenAI、
+    多部署路由）和搜索设置（Tavily、搜索缓存和并发）。节点在运行时才通过共享的链和搜索客户端
+    读取这些设置，但把它们放进键里后，reload_settings() / set_settings() 切换模型或搜索配置
+    之后得到的是另一张图，不会与旧配置下编译的图混用。checkpointer 和 stopping_policy
+    按对象身份区分（nodes.stopping 中的策略工厂对相同参数返回同一个对象）。
+    """
+    settings = get_settings()
+    return (
+        "async" if use_async else "sync",
+        max_iterations,
+        checkpointer,
+        stopping_policy,
+        (settings.azure, settings.openai, settings.llm_router),
+        (settings.tavily, settings.search),
+    )
+
+
+def get_reflexion_graph(
+    max_iterations: int = MAX_ITERATIONS,
+    *,
+    use_async: bool = False,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    stopping_policy: Optional[StoppingPolicy] = None,
+):
+    """获取已编译的 Reflexion Agent 工作流图（按配置缓存）。
+
+    相同配置（参数以及当前的模型和搜索设置，见 _graph_config_key）的调用返回同一个编译后的
+    图对象，只有第一次调用（冷路径）会构建并编译图。编译后的图是无状态的，可以在多个线程和
+    并发运行之间安全共享。注册表最多保留 _GRAPH_REGISTRY_MAX_SIZE 个图，超出时淘汰最久未使用的图。
 
+    Args:
+        max_iterations: 反思循环的最大迭代次数，默认为 2
+        use_async: 是否使用异步节点（等价于 create_async_reflexion_graph）
+        checkpointer: 检查点存储，为 None 时不保存检查点
+        stopping_policy: 提前终止策略（例如 DEFAULT_STOPPING_POLICY）；按对象身份命中缓存，
+            策略工厂对相同参数返回同一个对象
+
+    Returns:
+        Compiled StateGraph: 编译后的图对象
+    """
+    key = _graph_config_key(max_iterations, use_async, checkpointer, stopping_policy)
+    # 加锁避免并发冷启动时重复编译；命中时更新 LRU 顺序和统计同样需要锁
+    with _graph_registry_lock:
+        graph = _graph_registry.get(key)
+        if graph is not None:
+            _graph_registry.move_to_end(key)
+            _graph_registry_stats["hits"] += 1
+            return graph
+        _graph_registry_stats["misses"] += 1
+        factory = create_async_reflexion_graph if use_async else create_reflexion_graph
+        start = time.perf_counter()
+        graph = factory(
+            max_iterations=max_iterations,
+            checkpointer=checkpointer,
+            stopping_policy=stopping_policy,
+        )
+        elapsed = time.perf_counter() - start
+        _graph_registry_stats["compiles"] += 1
+        _graph_registry_stats["compile_seconds"] += elapsed
+        _graph_registry_stats["last_compile_seconds"] = elapsed
+        _graph_registry[key] = graph
+        while len(_graph_registry) > _GRAPH_REGISTRY_MAX_SIZE:
+            _graph_registry.popitem(last=False)
+            _graph_registry_stats["evictions"] += 1
+    return graph
 
+
+def invalidate_graph_cache(
+    max_iterations: Optional[int] = None,
+    *,
+    use_async: Optional[bool] = None,
+) -> int:
+    """使已缓存的编译图失效。
+
+    不传参数时清空整个注册表；传入参数时只移除匹配的条目。
+    下一次 get_reflexion_graph() 调用会重新编译。
+
+    Args:
+        max_iterations: 只移除该迭代次数的图
+        use_async: 只移除同步（False）或异步（True）版本的图
+
+    Returns:
+        int: 被移除的条目数
+    """
+    with _graph_registry_lock:
+        keys = [
+            key
+            for key in _graph_registry
+            if (max_iterations is None or key[1] == max_iterations)
+            and (use_async is None or key[0] == ("async" if use_async else "sync"))
+        ]
+        for key in keys:
+            del _graph_registry[key]
+    return len(keys)
+
+
+def get_graph_registry_stats() -> dict:
+    """获取图注册表的统计信息，用于区分冷路径（编译）和热路径（命中）。
+
+    Returns:
+        dict: 包含 hits、misses、compiles、evictions（LRU 淘汰数）、compile_seconds（累计编译耗时）、
+            last_compile_seconds（最近一次编译耗时）和当前缓存条目数 size
+    """
+    with _graph_registry_lock:
+        return {**_graph_registry_stats, "size": len(_graph_registry)}
@@ -1,35 +1,86 @@
 """Infrastructure 模块 - 统一导出基础设施组件。
 
 本模块提供 Reflexion Agent 所需的基础设施组件，包括：
+- answer_cache: 整次运行的语义答案缓存（哈希嵌入、向量索引、TTL 和容量淘汰）
+- budget: 单次运行的耗时、token 和搜索次数预算
+- checkpoint: 增量保存消息历史的 SQLite 检查点
+- compaction: revise 阶段的上下文压缩
 - config: Azure OpenAI 配置
 - llm: LLM 初始化和管理
+- llm_pool: 按模型、参数和凭据缓存模型实例及链的多租户 LRU 池
+- llm_router: 多部署 LLM 路由（EWMA 延迟负载均衡、熔断、RPM/TPM 限制）
+- metrics: 节点插桩、指标注册表和运行追踪
 - prompts: 提示模板
+- rate_limit: LLM 和搜索请求的客户端限流（令牌桶 + AIMD 自适应并发）
+- result_store: 搜索结果整形（URL 去重、片段截断）和内容寻址的完整结果存储
 - schema: Pydantic 数据模型
+- search: 共享连接池的 Tavily 搜索客户端
+- search_cache: 搜索结果缓存（内存 LRU + 可选 SQLite）
+- settings: 只解析一次的类型化运行配置（环境变量和 .env）
+- singleflight: 并发相同请求的单飞合并
+- singleton: 线程安全（双重检查锁）且支持 asyncio 的延迟初始化单例
 """
 
-from reflexion_agent.infra.config import (
-    get_deployment_name,
-    is_azure_openai_configured,
-    setup_azure_openai,
-)
-from reflexion_agent.infra.llm import get_llm, get_llm_instance
-from reflexion_agent.infra.prompts import REVISE_INSTRUCTIONS, create_actor_prompt_template
-from reflexion_agent.infra.schema import AnswerQuestion, Reflection, ReviseAnswer
-
-__all__ = [
-    # config
-    "setup_azure_openai",
-    "get_deployment_name",
-    "is_azure_openai_configured",
-    # llm
-    "get_llm",
-    "get_llm_instance",
-    # prompts
-    "create_actor_prompt_template",
-    "REVISE_INSTRUCTIONS",
-    # schema
-    "Reflection",
-    "AnswerQuestion",
-    "ReviseAnswer",
-]
+from reflexion_agent._lazy import lazy_exports
 
+# 子模块 -> 导出的名称。子模块在第一次访问其中某个名称时才会导入（见 reflexion_agent._lazy）
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    "answer_cache": (
+        "AnswerCache",
+        "AnswerCachedGraph",
+        "HashingEmbedder",
+        "get_answer_cache",
+        "set_answer_cache",
+    ),
+    "budget": ("RunBudget", "get_run_budget"),
+    "checkpoint": ("SqliteDeltaCheckpointer",),
+    "compaction": (
+        "MessageCompactor",
+        "count_tokens",
+        "get_default_compactor",
+        "set_default_compactor",
+    ),
+    "config": ("setup_azure_openai", "get_deployment_name", "is_azure_openai_configured"),
+    "llm": ("get_llm", "get_llm_instance", "aget_llm_instance", "set_llm_instance"),
+    "llm_pool": ("LLMPool", "LLMSpec", "get_llm_pool", "set_llm_pool"),
+    "llm_router": ("Deployment", "LLMRouter", "RoutedChatModel", "create_llm_router"),
+    "metrics": (
+        "MetricsRegistry",
+        "enable_metrics",
+        "metrics_enabled",
+        "get_metrics_registry",
+        "get_run_trace",
+        "dump_traces",
+        "reset_metrics",
+        "start_metrics_server",
+    ),
+    "prompts": (
+        "create_actor_prompt_template",
+        "REVISE_INSTRUCTIONS",
+        "LAYOUT_CACHE_FRIENDLY",
+        "LAYOUT_LEGACY",
+        "check_prefix_stability",
+    ),
+    "rate_limit": (
+        "RateLimiter",
+        "TokenBucket",
+        "AdaptiveConcurrency",
+        "get_rate_limiter",
+        "set_rate_limiter",
+    ),
+    "result_store": (
+        "ResultShaper",
+        "ResultStore",
+        "get_result_store",
+        "set_result_store",
+        "get_default_result_shaper",
+        "set_default_result_shaper",
+        "track_result_urls",
+    ),
+    "schema": ("Reflection", "AnswerQuestion", "ReviseAnswer"),
+    "search": ("TavilySearchClient", "get_search_client", "set_search_client"),
+    "search_cache": ("SearchCache", "get_search_cache", "set_search_cache", "normalize_query"),
+    "settings": ("Settings", "get_settings", "reload_settings", "set_settings"),
+    "singleflight": ("SingleFlight", "AsyncSingleFlight"),
+    "singleton": ("LazySingleton",),
+})
@@ -0,0 +1,508 @@
+"""整次运行的语义答案缓存模块。
+
+很多问题是几小时前已经回答过的问题的改写，但每个问题仍然要完整执行一次
+draft + N ×（搜索 + revise）。答案缓存位于编译后的图之前：
+- 用可替换的本地嵌入器把用户问题转换为向量（默认 HashingEmbedder：词、相邻词对和
+  字符 n-gram 的特征哈希，完全离线，不需要额外依赖）
+- 在向量索引中查找余弦相似度不低于阈值的近似重复问题，命中时直接返回缓存的最终
+  ReviseAnswer（答案、引用、反思和搜索查询），不执行任何节点
+- 未命中时正常运行图，并把最终答案写入缓存；预算耗尽时降级返回的答案不会被缓存
+- 条目按 TTL 过期，超出容量时淘汰最久未使用的条目
+
+用法：
+    graph = AnswerCachedGraph(get_reflexion_graph())
+    state = graph.invoke({"messages": [("user", question)]})
+
+命中时最终状态只包含问题和一条 ReviseAnswer 工具调用消息，消息的
+response_metadata["answer_cache"] 记录相似度和原始问题。stream / astream 同样先查缓存：
+命中时按 stream_mode 输出与缓存答案对应的数据块（values 为最终状态，updates 为
+{"answer_cache": {"messages": [...]}}，messages 为 (消息, 元数据)，custom 为一次完整的
+answer_delta 事件），未命中时原样转发原图的数据块，并从 values / updates 数据块中收集
+最终答案写入缓存（只使用 messages / custom 等模式时收集不到最终答案，不会写入缓存）。
+subgraphs=True 或 version="v2" 的流直接转发给原图，不使用缓存。运行配置的 configurable 中
+answer_cache 为 False 时既不查找也不写入（强制重新研究，结果不进入缓存）。
+
+缓存条目按作用域隔离，只有同一作用域的问题才会互相命中。作用域取 configurable 中的
+answer_cache_scope（例如租户 ID）；未设置时取 configurable["llm"] 指定的模型（LLMSpec，
+见 infra.llm_pool），使用全局模型的运行共用一个作用域。因此不同模型、参数或 API 密钥的
+租户不会拿到彼此的答案。
+
+答案缓存相关环境变量：
+- ANSWER_CACHE_ENABLED: 是否启用全局答案缓存（get_answer_cache），默认为 false
+- ANSWER_CACHE_THRESHOLD: 命中所需的最低余弦相似度，默认为 0.85
+- ANSWER_CACHE_TTL: 条目有效期（秒），默认为 21600（六小时）
+- ANSWER_CACHE_MAX_ENTRIES: 最大条目数，默认为 1024
+"""
+
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional, Union
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+from reflexion_agent.infra.llm_pool import llm_spec_from_config
+from reflexion_agent.infra.metrics import get_metrics_registry, metrics_enabled
+from reflexion_agent.infra.search_cache import normalize_query
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleton import LazySingleton
+
+# 嵌入向量：稠密向量（浮点数列表）或稀疏向量（维度下标 -> 权重）
+Vector = Union[list[float], dict[int, float]]
+# 嵌入器：把文本转换为向量
+Embedder = Callable[[str], Vector]
+
+# 构成问题措辞、但几乎不区分主题的词
+_STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from how i in is it me of on or please "
+    "should tell the their this to was what when where which who why will with would you".split()
+)
+_WORD_RE = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """基于特征哈希的离线问题嵌入器。
+
+    特征包括去掉停用词后的词（权重 1）、相邻词对（权重 0.5）和词内字符 n-gram
+    （总权重与一个词相同，用于匹配单复数、连字符等词形变化）。词频取对数，
+    结果按 L2 归一化，以稀疏向量（维度下标 -> 权重）返回。哈希使用 crc32，跨进程稳定。
+    """
+
+    def __init__(self, dimensions: int = 1 << 18, char_ngram: int = 4):
+        """初始化嵌入器。
+
+        Args:
+            dimensions: 哈希空间大小
+            char_ngram: 字符 n-gram 的长度，0 表示不使用字符特征
+        """
+        self.dimensions = dimensions
+        self.char_ngram = char_ngram
+
+    def _bucket(self, feature: str) -> int:
+        return zlib.crc32(feature.encode("utf-8")) % self.dimensions
+
+    def __call__(self, text: str) -> dict[int, float]:
+        words = [w for w in _WORD_RE.findall(normalize_query(text)) if w not in _STOPWORDS]
+        features: Counter = Counter()
+        for word in words:
+            features["w:" + word] += 1.0
+            if self.char_ngram and len(word) > self.char_ngram:
+                grams = [word[i : i + self.char_ngram] for i in range(len(word) - self.char_ngram + 1)]
+                for gram in grams:
+                    features["c:" + gram] += 1.0 / len(grams)
+        for left, right in zip(words, words[1:]):
+            features["b:" + left + " " + right] += 0.5
+
+        vector: dict[int, float] = {}
+        for feature, count in features.items():
+            bucket = self._bucket(feature)
+            vector[bucket] = vector.get(bucket, 0.0) + (1.0 + math.log(count) if count >= 1 else count)
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {k: v / norm for k, v in vector.items()} if norm else {}
+
+
+def _as_sparse(vector: Vector) -> dict[int, float]:
+    """把向量转换为 L2 归一化的稀疏形式。"""
+    items = vector.items() if isinstance(vector, dict) else enumerate(vector)
+    sparse = {int(k): float(v) for k, v in items if v}
+    norm = math.sqrt(sum(v * v for v in sparse.values()))
+    return {k: v / norm for k, v in sparse.items()} if norm else {}
+
+
+@dataclass
+class CachedAnswer:
+    """一条缓存的最终答案。"""
+
+    question: str
+    # 最终 ReviseAnswer 工具调用的参数（answer、references、reflection、search_queries）
+    args: dict
+    created_at: float
+    vector: dict[int, float] = field(repr=False, default_factory=dict)
+    hits: int = 0
+    # 作用域（租户或模型），只有同一作用域的查找才能命中
+    scope: Hashable = field(repr=False, default=None)
+
+
+class AnswerCache:
+    """带 TTL 和容量上限的语义答案缓存。
+
+    向量索引是一个倒排表（维度下标 -> {条目 ID: 权重}），查找时只累加与问题共享特征的
+    条目的点积，对哈希嵌入器的稀疏向量近似于按需扫描。稠密嵌入器同样可用，
+    此时退化为对所有条目的线性扫描。所有操作都由同一把锁保护，可以在多个线程之间共享。
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        threshold: float = 0.85,
+        ttl: float = 21600.0,
+        max_entries: int = 1024,
+    ):
+        """初始化答案缓存。
+
+        Args:
+            embedder: 嵌入器，为 None 时使用 HashingEmbedder
+            threshold: 命中所需的最低余弦相似度
+            ttl: 条目有效期（秒）
+            max_entries: 最大条目数
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # 条目 ID -> 缓存答案，OrderedDict 的顺序即 LRU 顺序
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._postings: dict[int, dict[int, float]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _remove(self, entry_id: int) -> None:
+        """删除条目及其倒排表记录（调用方需持有锁）。"""
+        entry = self._entries.pop(entry_id)
+        for dim in entry.vector:
+            postings = self._postings.get(dim)
+            if postings is not None:
+                postings.pop(entry_id, None)
+                if not postings:
+                    del self._postings[dim]
+
+    def _scores(self, vector: dict[int, float], scope: Hashable) -> dict[int, float]:
+        """计算问题向量与同一作用域中共享特征的各条目的余弦相似度（调用方需持有锁）。"""
+        scores: dict[int, float] = {}
+        for dim, weight in vector.items():
+            for entry_id, entry_weight in self._postings.get(dim, {}).items():
+                scores[entry_id] = scores.get(entry_id, 0.0) + weight * entry_weight
+        return {entry_id: score for entry_id, score in scores.items() if self._entries[entry_id].scope == scope}
+
+    def lookup(self, question: str, scope: Hashable = None) -> Optional[tuple[CachedAnswer, float]]:
+        """在作用域内查找与问题最相似的未过期答案。
+
+        Args:
+            question: 用户问题
+            scope: 作用域（租户或模型），None 为默认作用域
+
+        Returns:
+            Optional[tuple[CachedAnswer, float]]: 缓存答案和相似度；没有达到阈值的条目时返回 None
+        """
+        vector = _as_sparse(self.embedder(question))
+        now = time.time()
+        with self._lock:
+            scores = self._scores(vector, scope)
+            for entry_id, score in sorted(scores.items(), key=lambda item: -item[1]):
+                if score < self.threshold:
+                    break
+                entry = self._entries[entry_id]
+                if now - entry.created_at >= self.ttl:
+                    # 过期条目直接删除，继续检查次优的候选
+                    self._remove(entry_id)
+                    continue
+                self._entries.move_to_end(entry_id)
+                entry.hits += 1
+                self._hits += 1
+                return entry, score
+            self._misses += 1
+            return None
+
+    def put(self, question: str, args: dict, scope: Hashable = None) -> None:
+        """在作用域内写入一条最终答案。
+
+        与同一作用域中已有条目的相似度达到阈值时替换该条目，避免同一问题的多个改写占满容量。
+
+        Args:
+            question: 用户问题
+            args: 最终 ReviseAnswer 工具调用的参数
+            scope: 作用域（租户或模型），None 为默认作用域
+        """
+        vector = _as_sparse(self.embedder(question))
+        if not vector:
+            return
+        with self._lock:
+            scores = self._scores(vector, scope)
+            for entry_id, score in scores.items():
+                if score >= self.threshold:
+                    self._remove(entry_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = CachedAnswer(question, dict(args), time.time(), vector, scope=scope)
+            for dim, weight in vector.items():
+                self._postings.setdefault(dim, {})[entry_id] = weight
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """清空缓存并重置命中统计。"""
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._hits = self._misses = 0
+
+    @property
+    def stats(self) -> dict:
+        """缓存命中统计。
+
+        Returns:
+            dict: 包含 hits、misses、hit_rate 和条目数 size
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
+
+
+def _question_from_inputs(inputs: Any) -> Optional[str]:
+    """从图的输入中提取最后一个用户问题，无法识别时返回 None。"""
+    if isinstance(inputs, str):
+        return inputs
+    messages = inputs.get("messages") if isinstance(inputs, dict) else None
+    if isinstance(messages, (str, BaseMessage, tuple)):
+        messages = [messages]
+    for message in reversed(messages or []):
+        if isinstance(message, str):
+            return message
+        if isinstance(message, HumanMessage) and isinstance(message.content, str):
+            return message.content
+        if isinstance(message, tuple) and len(message) == 2 and message[0] in ("user", "human"):
+            return message[1]
+        if isinstance(message, dict) and message.get("role") in ("user", "human"):
+            return message.get("content")
+    return None
+
+
+def _final_revision(state: Any) -> Optional[dict]:
+    """提取可以缓存的最终 ReviseAnswer 参数；预算耗尽时的降级答案返回 None。"""
+    messages = state.get("messages") if isinstance(state, dict) else None
+    for message in reversed(messages or []):
+        if isinstance(message, AIMessage) and message.tool_calls:
+            if message.response_metadata.get("budget_exhausted"):
+                return None
+            tool_call = message.tool_calls[0]
+            return tool_call["args"] if tool_call["name"] == "ReviseAnswer" else None
+    return None
+
+
+def _cached_state(question: str, entry: CachedAnswer, similarity: float) -> dict:
+    """构造命中缓存时返回的最终状态。"""
+    message = AIMessage(
+        content="",
+        tool_calls=[{"name": "ReviseAnswer", "args": dict(entry.args), "id": f"answer-cache-{entry.hits}"}],
+        response_metadata={"answer_cache": {"similarity": round(similarity, 4), "question": entry.question}},
+    )
+    return {
+        "messages": [HumanMessage(content=question), message],
+        "iterations": 0,
+        "node_counts": {},
+        "budget_usage": None,
+    }
+
+
+# stream / astream 能够识别数据块格式的流模式
+_STREAM_MODES = frozenset({"values", "updates", "messages", "custom", "debug", "tasks", "checkpoints"})
+
+
+def _cached_chunk(state: dict, mode: str) -> Optional[Any]:
+    """命中缓存时某个流模式输出的数据块，该模式没有对应的数据时返回 None。"""
+    message = state["messages"][-1]
+    if mode == "values":
+        return state
+    if mode == "updates":
+        return {"answer_cache": {"messages": [message]}}
+    if mode == "messages":
+        return message, {"langgraph_node": "answer_cache"}
+    if mode == "custom":
+        answer = message.tool_calls[0]["args"].get("answer", "")
+        return {"type": "answer_delta", "node": "answer_cache", "delta": answer}
+    return None
+
+
+class _StreamCollector:
+    """处理 stream / astream 的流模式，命中时生成数据块，未命中时从数据块中收集最终消息。"""
+
+    def __init__(self, graph, stream_mode: Any, kwargs: dict):
+        mode = stream_mode if stream_mode is not None else getattr(graph, "stream_mode", "updates")
+        self.modes = [mode] if isinstance(mode, str) else list(mode)
+        self.multiple = not isinstance(mode, str)
+        # subgraphs、v2 等其他输出格式不做处理，直接转发给原图
+        self.supported = (
+            not kwargs.get("subgraphs")
+            and kwargs.get("version", "v1") == "v1"
+            and all(m in _STREAM_MODES for m in self.modes)
+        )
+        self.messages: list[BaseMessage] = []
+
+    def cached_chunks(self, state: dict) -> list:
+        chunks = []
+        for mode in self.modes:
+            chunk = _cached_chunk(state, mode)
+            if chunk is not None:
+                chunks.append((mode, chunk) if self.multiple else chunk)
+        return chunks
+
+    def collect(self, chunk: Any) -> None:
+        mode, data = chunk if self.multiple else (self.modes[0], chunk)
+        if mode == "values" and isinstance(data, dict):
+            self.messages = list(data.get("messages") or [])
+        elif mode == "updates" and isinstance(data, dict) and "values" not in self.modes:
+            for update in data.values():
+                if isinstance(update, dict):
+                    self.messages.extend(update.get("messages") or [])
+
+
+def _cache_enabled(config: Optional[RunnableConfig]) -> bool:
+    return ((config or {}).get("configurable") or {}).get("answer_cache", True) is not False
+
+
+def _cache_scope(config: Optional[RunnableConfig]) -> Hashable:
+    """运行所属的缓存作用域。
+
+    Args:
+        config: 运行配置
+
+    Returns:
+        Hashable: configurable["answer_cache_scope"]；未设置时为 configurable["llm"] 指定的
+            LLMSpec；都未设置时为 None（全局模型的默认作用域）
+    """
+    configurable = (config or {}).get("configurable") or {}
+    scope = configurable.get("answer_cache_scope")
+    return scope if scope is not None else llm_spec_from_config(config)
+
+
+def _record_lookup(outcome: str) -> None:
+    if metrics_enabled():
+        get_metrics_registry().inc("reflexion_answer_cache_lookups_total", outcome=outcome)
+
+
+class AnswerCachedGraph:
+    """在编译后的图之前加一层语义答案缓存。
+
+    invoke / ainvoke / stream / astream 先在运行的作用域（见 _cache_scope）内查缓存，
+    命中时不执行图；其他属性（get_graph、get_state 等）直接转发给原图。
+    """
+
+    def __init__(self, graph, cache: Optional[AnswerCache] = None):
+        """包装编译后的图。
+
+        Args:
+            graph: 编译后的 Reflexion 图
+            cache: 答案缓存，为 None 时使用全局缓存（未启用时新建一个默认配置的缓存）
+        """
+        self.graph = graph
+        self.cache = cache or get_answer_cache() or AnswerCache()
+
+    def _lookup(self, inputs: Any, config: Optional[RunnableConfig]) -> tuple[Optional[str], Optional[dict]]:
+        """查找缓存，返回 (问题, 命中时的最终状态)；不使用缓存的运行返回的问题为 None。"""
+        question = _question_from_inputs(inputs)
+        if question is None or not _cache_enabled(config):
+            return None, None
+        found = self.cache.lookup(question, _cache_scope(config))
+        _record_lookup("hit" if found else "miss")
+        return question, _cached_state(question, *found) if found else None
+
+    def _store(self, question: Optional[str], state: Any, config: Optional[RunnableConfig]) -> None:
+        args = _final_revision(state)
+        if question is not None and args is not None:
+            self.cache.put(question, args, _cache_scope(config))
+
+    def invoke(self, inputs: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        """与 graph.invoke 相同，命中缓存时直接返回缓存的最终状态。"""
+        question, cached = self._lookup(inputs, config)
+        if cached is not None:
+            return cached
+        state = self.graph.invoke(inputs, config, **kwargs)
+        self._store(question, state, config)
+        return state
+
+    async def ainvoke(self, inputs: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        """invoke 的异步版本。"""
+        question, cached = self._lookup(inputs, config)
+        if cached is not None:
+            return cached
+        state = await self.graph.ainvoke(inputs, config, **kwargs)
+        self._store(question, state, config)
+        return state
+
+    def stream(
+        self, inputs: Any, config: Optional[RunnableConfig] = None, *, stream_mode: Any = None, **kwargs
+    ) -> Any:
+        """与 graph.stream 相同，命中缓存时输出缓存答案对应的数据块。"""
+        collector = _StreamCollector(self.graph, stream_mode, kwargs)
+        if not collector.supported:
+            yield from self.graph.stream(inputs, config, stream_mode=stream_mode, **kwargs)
+            return
+        question, cached = self._lookup(inputs, config)
+        if cached is not None:
+            yield from collector.cached_chunks(cached)
+            return
+        for chunk in self.graph.stream(inputs, config, stream_mode=stream_mode, **kwargs):
+            collector.collect(chunk)
+            yield chunk
+        # 调用方提前停止迭代时不会执行到这里，不完整的运行不会写入缓存
+        self._store(question, {"messages": collector.messages}, config)
+
+    async def astream(
+        self, inputs: Any, config: Optional[RunnableConfig] = None, *, stream_mode: Any = None, **kwargs
+    ) -> Any:
+        """stream 的异步版本。"""
+        collector = _StreamCollector(self.graph, stream_mode, kwargs)
+        if not collector.supported:
+            async for chunk in self.graph.astream(inputs, config, stream_mode=stream_mode, **kwargs):
+                yield chunk
+            return
+        question, cached = self._lookup(inputs, config)
+        if cached is not None:
+            for chunk in collector.cached_chunks(cached):
+                yield chunk
+            return
+        async for chunk in self.graph.astream(inputs, config, stream_mode=stream_mode, **kwargs):
+            collector.collect(chunk)
+            yield chunk
+        self._store(question, {"messages": collector.messages}, config)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.graph, name)
+
+
+def _create_answer_cache() -> AnswerCache:
+    settings = get_settings().answer_cache
+    return AnswerCache(threshold=settings.threshold, ttl=settings.ttl, max_entries=settings.max_entries)
+
+
+# 全局答案缓存实例（延迟初始化）
+_answer_cache = LazySingleton(_create_answer_cache, name="answer_cache")
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """获取全局答案缓存（单例模式）。
+
+    根据环境变量创建缓存；语义缓存会改变运行的行为，因此只有 ANSWER_CACHE_ENABLED 为 true 时才启用，
+    否则返回 None。
+
+    Returns:
+        Optional[AnswerCache]: 全局答案缓存实例，未启用时为 None
+    """
+    cache = _answer_cache.peek()
+    if cache is None and get_settings().answer_cache.enabled:
+        cache = _answer_cache.get()
+    return cache
+
+
+def set_answer_cache(cache: Optional[AnswerCache]) -> None:
+    """替换全局答案缓存。
+
+    传入 None 时清除当前缓存，下次调用 get_answer_cache() 时会根据环境变量重新创建。
+
+    Args:
+        cache: 新的答案缓存实例，或 None
+    """
+    _answer_cache.set(cache)
@@ -0,0 +1,327 @@
+"""单次运行的预算模块。
+
+一个 reflexion 运行的耗时、LLM token 和搜索次数默认都没有上限，一次缓慢的模型响应就可能
+无限期占用一个工作线程。RunBudget 通过运行配置传入，由每个节点检查和扣减：
+
+    budget = RunBudget(deadline_seconds=60, max_tokens=20000, max_searches=12)
+    result = graph.invoke(inputs, {"configurable": {"budget": budget}})
+    result["budget_usage"]  # {"elapsed_seconds": ..., "tokens_used": ..., "exhausted": "deadline" | None, ...}
+
+预算耗尽时不会抛出异常：LLM 调用在截止时间到达时放弃等待，剩余的搜索被跳过，
+revise 沿用目前最好的答案，路由函数随后结束循环。预算对象记录单个运行的消耗，
+每个运行都需要使用新的 RunBudget。
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.runnables import RunnableConfig
+
+from reflexion_agent.infra.compaction import count_message_tokens
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleton import LazySingleton
+
+# 预算耗尽原因
+EXHAUSTED_DEADLINE = "deadline"
+EXHAUSTED_TOKENS = "tokens"
+EXHAUSTED_SEARCHES = "searches"
+
+
+class DeadlineExceeded(TimeoutError):
+    """运行截止时间已到，LLM 调用被放弃。"""
+
+
+class RunBudget:
+    """单个运行的耗时、token 和搜索次数预算。
+
+    计时从第一次检查（通常是 draft 节点开始时）算起。所有扣减操作都加锁，
+    同一个预算可以被并发执行的搜索任务共享。
+    """
+
+    def __init__(
+        self,
+        deadline_seconds: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        max_searches: Optional[int] = None,
+    ):
+        """初始化预算，各项为 None 表示不限制。
+
+        Args:
+            deadline_seconds: 运行的最长耗时（秒）
+            max_tokens: LLM 调用的 token 总数上限（提示词 + 生成）
+            max_searches: 搜索查询次数上限
+        """
+        self.deadline_seconds = deadline_seconds
+        self.max_tokens = max_tokens
+        self.max_searches = max_searches
+        self.tokens_used = 0
+        self.searches_used = 0
+        self._started_at: Optional[float] = None
+        self._exhausted: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """开始计时（只有第一次调用生效）。"""
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+
+    def elapsed_seconds(self) -> float:
+        """已经过的时间（秒）。"""
+        return 0.0 if self._started_at is None else time.monotonic() - self._started_at
+
+    def remaining_seconds(self) -> Optional[float]:
+        """距离截止时间的剩余秒数，没有截止时间时返回 None。"""
+        if self.deadline_seconds is None:
+            return None
+        self.start()
+        return max(0.0, self.deadline_seconds - self.elapsed_seconds())
+
+    def add_tokens(self, tokens: int) -> None:
+        """扣减 token。"""
+        with self._lock:
+            self.tokens_used += tokens
+
+    def reserve_searches(self, requested: int) -> int:
+        """为即将执行的搜索预留次数。
+
+        Args:
+            requested: 请求执行的查询数
+
+        Returns:
+            int: 实际允许执行的查询数（已计入 searches_used）
+        """
+        if self.remaining_seconds() == 0.0:
+            return 0
+        with self._lock:
+            allowed = requested
+            if self.max_searches is not None:
+                allowed = max(0, min(requested, self.max_searches - self.searches_used))
+            self.searches_used += allowed
+            return allowed
+
+    def mark_exhausted(self, reason: str) -> None:
+        """记录预算耗尽（用于 LLM 调用等待超时，只保留第一个原因）。"""
+        with self._lock:
+            self._exhausted = self._exhausted or reason
+
+    def check(self, include_searches: bool = True) -> Optional[str]:
+        """检查预算是否已经耗尽。
+
+        token 上限在每次 LLM 调用之前检查，最后一次调用可能使用量超出上限。
+
+        Args:
+            include_searches: 是否检查搜索次数。LLM 节点传入 False：搜索次数用完后，
+                revise 仍然可以使用已经取回的搜索结果
+
+        Returns:
+            Optional[str]: 耗尽原因（"deadline"、"tokens" 或 "searches"），未耗尽时返回 None
+        """
+        if self._exhausted is not None:
+            return self._exhausted
+        if self.remaining_seconds() == 0.0:
+            return EXHAUSTED_DEADLINE
+        if self.max_tokens is not None and self.tokens_used >= self.max_tokens:
+            return EXHAUSTED_TOKENS
+        if include_searches and self.max_searches is not None and self.searches_used >= self.max_searches:
+            return EXHAUSTED_SEARCHES
+        return None
+
+    def usage(self) -> dict:
+        """预算消耗报告。
+
+        Returns:
+            dict: 已用时间、token 和搜索次数，对应的上限，以及耗尽原因 exhausted
+        """
+        return {
+            "elapsed_seconds": self.elapsed_seconds(),
+            "tokens_used": self.tokens_used,
+            "searches_used": self.searches_used,
+            "deadline_seconds": self.deadline_seconds,
+            "max_tokens": self.max_tokens,
+            "max_searches": self.max_searches,
+            "exhausted": self.check(),
+        }
+
+
+def get_run_budget(config: Optional[RunnableConfig]) -> Optional[RunBudget]:
+    """从运行配置 config["configurable"]["budget"] 中读取预算。"""
+    budget = ((config or {}).get("configurable") or {}).get("budget")
+    if budget is not None:
+        budget.start()
+    return budget
+
+
+class _DeadlineRunner:
+    """执行有截止时间的同步调用。
+
+    调用优先在复用的线程池中执行；池中线程都在忙时（包括已被放弃、仍在后台运行的调用），
+    改用专用线程执行，而不是在线程池中排队：排队时间会计入截止时间，
+    并发运行数超过线程池大小时，调用会在开始之前就超时。
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="reflexion-deadline",
+        )
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[], Any]) -> concurrent.futures.Future:
+        """在复制的上下文中开始执行 fn，LangGraph 的流写入器和回调在工作线程中仍然可用。"""
+        context = contextvars.copy_context()
+        with self._lock:
+            pooled = self._busy < self.workers
+            if pooled:
+                self._busy += 1
+        if pooled:
+            return self._executor.submit(self._run_pooled, context, fn)
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        threading.Thread(
+            target=self._run_dedicated, args=(future, context, fn), name="reflexion-deadline-overflow", daemon=True
+        ).start()
+        return future
+
+    def _run_pooled(self, context: contextvars.Context, fn: Callable[[], Any]) -> Any:
+        try:
+            return context.run(fn)
+        finally:
+            with self._lock:
+                self._busy -= 1
+
+    @staticmethod
+    def _run_dedicated(
+        future: concurrent.futures.Future, context: contextvars.Context, fn: Callable[[], Any]
+    ) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = context.run(fn)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+
+def _create_deadline_runner() -> _DeadlineRunner:
+    return _DeadlineRunner(get_settings().budget.deadline_workers)
+
+
+# 有截止时间的同步 LLM 调用使用的执行器（延迟初始化）
+_deadline_runner = LazySingleton(_create_deadline_runner, name="deadline_runner")
+
+
+def _get_deadline_runner() -> _DeadlineRunner:
+    return _deadline_runner.get()
+
+
+def call_with_deadline(budget: Optional[RunBudget], fn: Callable[[], Any]) -> Any:
+    """在预算的剩余时间内执行 fn。
+
+    没有截止时间时直接调用；否则在工作线程中立即开始执行（不排队）并最多等待剩余时间。
+    超时后放弃等待（正在进行的请求会在后台结束），并把预算标记为耗尽。
+
+    Args:
+        budget: 运行预算，可以为 None
+        fn: 无参函数
+
+    Returns:
+        Any: fn 的返回值
+
+    Raises:
+        DeadlineExceeded: 截止时间已到或等待超时
+    """
+    remaining = budget.remaining_seconds() if budget is not None else None
+    if remaining is None:
+        return fn()
+    if remaining <= 0:
+        budget.mark_exhausted(EXHAUSTED_DEADLINE)
+        raise DeadlineExceeded("Run deadline exceeded")
+    future = _get_deadline_runner().submit(fn)
+    try:
+        return future.result(timeout=remaining)
+    except concurrent.futures.TimeoutError:
+        if future.done():
+            # fn 自身抛出的超时异常，原样传播
+            raise
+        budget.mark_exhausted(EXHAUSTED_DEADLINE)
+        raise DeadlineExceeded("Run deadline exceeded") from None
+
+
+async def acall_with_deadline(budget: Optional[RunBudget], fn: Callable[[], Awaitable[Any]]) -> Any:
+    """call_with_deadline 的异步版本，超时时取消协程。"""
+    remaining = budget.remaining_seconds() if budget is not None else None
+    if remaining is None:
+        return await fn()
+    if remaining <= 0:
+        budget.mark_exhausted(EXHAUSTED_DEADLINE)
+        raise DeadlineExceeded("Run deadline exceeded")
+    try:
+        return await asyncio.wait_for(fn(), remaining)
+    except asyncio.TimeoutError:
+        budget.mark_exhausted(EXHAUSTED_DEADLINE)
+        raise DeadlineExceeded("Run deadline exceeded") from None
+
+
+def charge_llm_tokens(budget: Optional[RunBudget], prompt: list[BaseMessage], response: list[BaseMessage]) -> None:
+    """按模型返回的 usage_metadata 扣减 token；没有用量信息时按确定性估算扣减。
+
+    Args:
+        budget: 运行预算，可以为 None
+        prompt: 发送给模型的消息
+        response: 模型返回的消息
+    """
+    if budget is None:
+        return
+    total = 0
+    for message in response:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            total += usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    if not total:
+        total = count_message_tokens(prompt) + count_message_tokens(response)
+    budget.add_tokens(total)
+
+
+def best_answer_message(messages: list[BaseMessage], reason: str) -> list[BaseMessage]:
+    """预算耗尽时沿用目前最好的答案。
+
+    复制最后一条带答案的 AIMessage（使用新的消息 ID 和工具调用 ID），使运行以一条答案消息结束；
+    还没有任何答案时返回一条说明预算耗尽的消息。
+
+    Args:
+        messages: 当前消息历史
+        reason: 预算耗尽原因
+
+    Returns:
+        list[BaseMessage]: 要追加到消息历史中的消息
+    """
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and message.tool_calls:
+            tool_call = message.tool_calls[0]
+            return [
+                AIMessage(
+                    content=message.content,
+                    tool_calls=[
+                        {
+                            "name": tool_call["name"],
+                            "args": tool_call["args"],
+                            "id": f"{tool_call['id']}-budget",
+                        }
+                    ],
+                    response_metadata={"budget_exhausted": reason},
+                )
+            ]
+    return [
+        AIMessage(
+            content=f"Run budget exhausted ({reason}) before an answer was produced.",
+            response_metadata={"budget_exhausted": reason},
+        )
+    ]
@@ -0,0 +1,662 @@
+"""本地 SQLite 检查点模块。
+
+为长时间运行的 reflexion 线程提供崩溃恢复和回放能力，同时控制写放大：
+- 每一步只保存版本发生变化的通道（LangGraph 通过 new_versions 告知）
+- 列表类型的通道（messages）按增量保存：只记录相对上一版本新增/替换的尾部消息，
+  而不是每一步都保存完整的消息列表
+- 每隔 keyframe_interval 个增量保存一次完整快照，限制恢复时的重建链长度
+- 可配置每个线程保留的检查点数量，定期压缩（删除旧检查点，并把仍被引用的增量物化为完整快照）
+
+用法：
+    checkpointer = SqliteDeltaCheckpointer("checkpoints.sqlite")
+    graph = create_reflexion_graph(checkpointer=checkpointer)
+    config = {"configurable": {"thread_id": "run-1"}}
+    graph.invoke({"messages": [...]}, config)
+    # 进程崩溃后，使用同一个 thread_id 从最后一个检查点继续
+    graph.invoke(None, config)
+"""
+
+import asyncio
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from pathlib import Path
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    base_version TEXT,
+    keep INTEGER,
+    depth INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# blobs.type 的特殊取值
+_EMPTY = "empty"  # 通道在该版本为空
+_DELTA = "delta"  # 增量：value 为序列化后的尾部列表，base_version/keep 指向基准版本
+
+
+def _common_prefix_len(base: list, new: list) -> int:
+    """计算两个列表的公共前缀长度（先比较对象身份，再比较相等性）。"""
+    limit = min(len(base), len(new))
+    i = 0
+    while i < limit and (base[i] is new[i] or base[i] == new[i]):
+        i += 1
+    return i
+
+
+class SqliteDeltaCheckpointer(BaseCheckpointSaver[str]):
+    """以增量方式保存消息历史的 SQLite 检查点存储。
+
+    单个 SQLite 连接在线程间共享，所有访问由同一把锁串行化；
+    异步接口在默认线程池中执行同步实现，不会阻塞事件循环。
+    """
+
+    def __init__(
+        self,
+        path: str = "checkpoints.sqlite",
+        *,
+        keyframe_interval: int = 20,
+        max_checkpoints_per_thread: Optional[int] = None,
+        compact_every: int = 50,
+        cache_size: int = 256,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        """初始化检查点存储。
+
+        Args:
+            path: SQLite 文件路径，":memory:" 表示只保存在内存中
+            keyframe_interval: 连续增量的最大数量，超过后保存一次完整快照
+            max_checkpoints_per_thread: 每个线程（及命名空间）保留的检查点数量；
+                为 None 时保留全部检查点
+            compact_every: 每个线程每写入多少个检查点自动压缩一次（仅在设置了保留数量时生效）
+            cache_size: 重建后的通道值在内存中缓存的条目数
+            serde: 序列化器，默认使用 LangGraph 的 JsonPlusSerializer
+        """
+        super().__init__(serde=serde)
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.compact_every = max(1, compact_every)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.RLock()
+        # (thread_id, checkpoint_ns, channel, version) -> (通道值, 增量深度)
+        self._cache: "OrderedDict[tuple, tuple[Any, int]]" = OrderedDict()
+        self._cache_size = cache_size
+        # (thread_id, checkpoint_ns, channel) -> 最近写入的版本，作为下一次增量的基准
+        self._latest_versions: dict[tuple[str, str, str], str] = {}
+        # (thread_id, checkpoint_ns) -> 自上次压缩以来写入的检查点数
+        self._puts_since_compact: dict[tuple[str, str], int] = {}
+
+    # ------------------------------------------------------------------
+    # 通道值的增量编码与重建
+    # ------------------------------------------------------------------
+
+    def _cache_put(self, key: tuple, value: Any, depth: int) -> None:
+        self._cache[key] = (value, depth)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def _load_value(self, thread_id: str, checkpoint_ns: str, channel: str, version: str) -> tuple[Any, int]:
+        """读取并重建某个通道版本的完整值（调用方需持有锁）。
+
+        Returns:
+            tuple: (通道值, 增量深度)；通道为空时值为 _EMPTY
+
+        Raises:
+            ValueError: 增量引用的基准版本不存在或为空（数据库已损坏）
+        """
+        key = (thread_id, checkpoint_ns, channel, version)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        row = self._conn.execute(
+            "SELECT type, value, base_version, keep, depth FROM blobs "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return _EMPTY, 0
+        type_, value, base_version, keep, depth = row
+        if type_ == _EMPTY:
+            return _EMPTY, 0
+        if type_ == _DELTA:
+            base, _ = self._load_value(thread_id, checkpoint_ns, channel, base_version)
+            if not isinstance(base, list):
+                # 增量只会以列表为基准写入；基准缺失时继续拼接会把 _EMPTY 字符串拆成字符，
+                # 得到一个看似正常、实际错误的消息列表
+                raise ValueError(
+                    f"Corrupted checkpoint: delta {version!r} of channel {channel!r} in thread "
+                    f"{thread_id!r} references missing base version {base_version!r}"
+                )
+            tail_type, tail_bytes = value.split(b"\x00", 1)
+            tail = self.serde.loads_typed((tail_type.decode(), tail_bytes))
+            result = list(base[:keep]) + list(tail)
+        else:
+            result = self.serde.loads_typed((type_, value))
+        self._cache_put(key, result, depth)
+        return result, depth
+
+    def _write_blob(
+        self, thread_id: str, checkpoint_ns: str, channel: str, version: str, value: Any
+    ) -> None:
+        """写入一个通道版本；列表值在条件允许时按增量保存（调用方需持有锁）。"""
+        key = (thread_id, checkpoint_ns, channel, version)
+        base_version = self._latest_versions.get((thread_id, checkpoint_ns, channel))
+        row: tuple
+
+        if isinstance(value, list) and base_version is not None and base_version != version:
+            base, base_depth = self._load_value(thread_id, checkpoint_ns, channel, base_version)
+            if isinstance(base, list) and base_depth + 1 < self.keyframe_interval:
+                keep = _common_prefix_len(base, value)
+                tail_type, tail_bytes = self.serde.dumps_typed(value[keep:])
+                row = (
+                    _DELTA,
+                    tail_type.encode() + b"\x00" + tail_bytes,
+                    base_version,
+                    keep,
+                    base_depth + 1,
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", key + row
+                )
+                self._cache_put(key, list(value), base_depth + 1)
+                self._latest_versions[key[:3]] = version
+                return
+
+        # 完整快照（非列表值、没有可用基准，或增量链已达到 keyframe_interval）
+        type_, data = self.serde.dumps_typed(value)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, 0)",
+            key + (type_, data),
+        )
+        if isinstance(value, list):
+            self._cache_put(key, list(value), 0)
+        self._latest_versions[key[:3]] = version
+
+    def _load_channel_values(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> dict[str, Any]:
+        """按检查点中的通道版本加载所有通道值（调用方需持有锁）。"""
+        values = {}
+        for channel, version in versions.items():
+            value, _ = self._load_value(thread_id, checkpoint_ns, channel, str(version))
+            if value is not _EMPTY:
+                # 返回浅拷贝，避免调用方修改缓存中的列表
+                values[channel] = list(value) if isinstance(value, list) else value
+        return values
+
+    # ------------------------------------------------------------------
+    # BaseCheckpointSaver 接口
+    # ------------------------------------------------------------------
+
+    def _make_tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        row: tuple,
+        config: Optional[RunnableConfig] = None,
+    ) -> CheckpointTuple:
+        """将 checkpoints 表的一行转换为 CheckpointTuple（调用方需持有锁）。"""
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint_bytes, metadata_type, metadata_bytes = row
+        checkpoint: Checkpoint = self.serde.loads_typed((type_, checkpoint_bytes))
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config=config
+            or {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_channel_values(
+                    thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_bytes)),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((w_type, w_value)))
+                for task_id, channel, w_type, w_value in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """获取检查点。
+
+        config 中包含 checkpoint_id 时返回对应的检查点，否则返回该线程最新的检查点。
+
+        Args:
+            config: 包含 thread_id（以及可选的 checkpoint_ns、checkpoint_id）的配置
+
+        Returns:
+            Optional[CheckpointTuple]: 检查点，不存在时返回 None
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+                return self._make_tuple(thread_id, checkpoint_ns, row, config) if row else None
+            row = self._conn.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+            return self._make_tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """按检查点 ID 倒序列出检查点。
+
+        Args:
+            config: 基础配置（thread_id、可选的 checkpoint_ns/checkpoint_id）；为 None 时列出所有线程
+            filter: 元数据过滤条件
+            before: 只列出在该检查点之前创建的检查点
+            limit: 最多返回的数量
+
+        Yields:
+            CheckpointTuple: 匹配的检查点
+        """
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, "
+                f"checkpoint, metadata_type, metadata FROM checkpoints {where} "
+                "ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            with self._lock:
+                item = self._make_tuple(thread_id, checkpoint_ns, tuple(row))
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """保存检查点。
+
+        只有 new_versions 中列出的通道会被写入，列表通道按增量保存。
+
+        Args:
+            config: 父检查点的配置
+            checkpoint: 要保存的检查点
+            metadata: 检查点元数据
+            new_versions: 本次写入中版本发生变化的通道
+
+        Returns:
+            RunnableConfig: 指向新检查点的配置
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values: dict[str, Any] = stored.pop("channel_values")  # type: ignore[misc]
+        type_, checkpoint_bytes = self.serde.dumps_typed(stored)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+
+        with self._lock:
+            for channel, version in new_versions.items():
+                if channel in values:
+                    self._write_blob(thread_id, checkpoint_ns, channel, str(version), values[channel])
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, NULL, NULL, NULL, 0)",
+                        (thread_id, checkpoint_ns, channel, str(version), _EMPTY),
+                    )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    checkpoint_bytes,
+                    metadata_type,
+                    metadata_bytes,
+                ),
+            )
+            self._conn.commit()
+
+            if self.max_checkpoints_per_thread is not None:
+                count = self._puts_since_compact.get((thread_id, checkpoint_ns), 0) + 1
+                self._puts_since_compact[(thread_id, checkpoint_ns)] = count
+                if count >= self.compact_every:
+                    self.compact(thread_id, checkpoint_ns)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """保存某个任务在检查点上的中间写入（pending writes）。
+
+        Args:
+            config: 检查点配置
+            writes: (通道, 值) 列表
+            task_id: 产生写入的任务 ID
+            task_path: 产生写入的任务路径
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                type_, data = self.serde.dumps_typed(value)
+                # 普通写入只保存第一次（重试不会覆盖），特殊写入（错误、中断等）总是覆盖
+                verb = "INSERT OR REPLACE" if write_idx < 0 else "INSERT OR IGNORE"
+                self._conn.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, data, task_path),
+                )
+            self._conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """删除某个线程的所有检查点、通道值和中间写入。
+
+        Args:
+            thread_id: 线程 ID
+        """
+        with self._lock:
+            for table in ("checkpoints", "blobs", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+            self._cache = OrderedDict((k, v) for k, v in self._cache.items() if k[0] != thread_id)
+            self._latest_versions = {k: v for k, v in self._latest_versions.items() if k[0] != thread_id}
+
+    def get_next_version(self, current: Optional[str], channel: None = None) -> str:
+        """生成通道的下一个版本号。
+
+        版本号带随机后缀，从同一个父检查点分叉（回放）出的不同分支不会产生相同的版本号。
+        """
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ------------------------------------------------------------------
+    # 保留与压缩
+    # ------------------------------------------------------------------
+
+    def compact(self, thread_id: Optional[str] = None, checkpoint_ns: Optional[str] = None) -> int:
+        """压缩旧检查点。
+
+        每个 (线程, 命名空间) 只保留最新的 max_checkpoints_per_thread 个检查点，
+        删除更早的检查点及其中间写入；仍被保留检查点引用、但其增量基准将被删除的
+        通道值会先物化为完整快照，最后删除不再被引用的通道值。
+
+        Args:
+            thread_id: 只压缩该线程；为 None 时压缩所有线程
+            checkpoint_ns: 只压缩该命名空间；为 None 时压缩所有命名空间
+
+        Returns:
+            int: 删除的检查点数量
+        """
+        if self.max_checkpoints_per_thread is None:
+            return 0
+        with self._lock:
+            clauses, params = [], []
+            if thread_id is not None:
+                clauses.append("thread_id = ?")
+                params.append(thread_id)
+            if checkpoint_ns is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            groups = self._conn.execute(
+                f"SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints {where}", params
+            ).fetchall()
+
+            deleted = 0
+            for group in groups:
+                deleted += self._compact_group(*group)
+                self._puts_since_compact[group] = 0
+            self._conn.commit()
+            return deleted
+
+    def _compact_group(self, thread_id: str, checkpoint_ns: str) -> int:
+        """压缩单个 (线程, 命名空间)（调用方需持有锁）。"""
+        rows = self._conn.execute(
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+            (thread_id, checkpoint_ns),
+        ).fetchall()
+        kept, dropped = rows[: self.max_checkpoints_per_thread], rows[self.max_checkpoints_per_thread:]
+        if not dropped:
+            return 0
+
+        # 保留的检查点引用的通道版本
+        referenced: set[tuple[str, str]] = set()
+        for _, type_, checkpoint_bytes in kept:
+            checkpoint = self.serde.loads_typed((type_, checkpoint_bytes))
+            referenced.update(
+                (channel, str(version)) for channel, version in checkpoint["channel_versions"].items()
+            )
+
+        # 基准不在保留集合中的增量需要先物化为完整快照
+        to_materialize = []
+        for channel, version in referenced:
+            row = self._conn.execute(
+                "SELECT type, base_version FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, version),
+            ).fetchone()
+            if row and row[0] == _DELTA and (channel, row[1]) not in referenced:
+                value, _ = self._load_value(thread_id, checkpoint_ns, channel, version)
+                to_materialize.append((channel, version, value))
+        for channel, version, value in to_materialize:
+            type_, data = self.serde.dumps_typed(value)
+            self._conn.execute(
+                "UPDATE blobs SET type = ?, value = ?, base_version = NULL, keep = NULL, depth = 0 "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (type_, data, thread_id, checkpoint_ns, channel, version),
+            )
+            self._cache.pop((thread_id, checkpoint_ns, channel, version), None)
+
+        # 删除旧检查点、它们的中间写入，以及不再被引用的通道值
+        dropped_ids = [(thread_id, checkpoint_ns, row[0]) for row in dropped]
+        self._conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            dropped_ids,
+        )
+        self._conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            dropped_ids,
+        )
+        latest = {
+            (channel, version)
+            for (t, ns, channel), version in self._latest_versions.items()
+            if t == thread_id and ns == checkpoint_ns
+        }
+        for channel, version in self._conn.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ).fetchall():
+            # 最近写入的版本也保留：它是下一次增量的基准
+            if (channel, version) not in referenced and (channel, version) not in latest:
+                self._conn.execute(
+                    "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                    (thread_id, checkpoint_ns, channel, version),
+                )
+                self._cache.pop((thread_id, checkpoint_ns, channel, version), None)
+        return len(dropped)
+
+    def close(self) -> None:
+        """关闭 SQLite 连接。"""
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # 异步接口：在线程池中执行同步实现
+    # ------------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """get_tuple 的异步版本。"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """list 的异步版本。"""
+        items = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """put 的异步版本。"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """put_writes 的异步版本。"""
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.put_writes, config, writes, task_id, task_path
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """delete_thread 的异步版本。"""
+        await asyncio.get_running_loop().run_in_executor(None, self.delete_thread, thread_id)
@@ -0,0 +1,262 @@
+"""上下文压缩模块。
+
+revise 节点每一轮都会把完整的消息历史（原始问题、所有历史草稿、所有原始搜索结果）
+发送给 LLM，提示词长度随迭代次数增长。本模块提供一个可插拔的压缩阶段，
+在调用 revisor 链之前对消息列表进行压缩：
+- 只保留最新一轮的答案/反思（最后一条带工具调用的 AIMessage）及其搜索结果
+- 更早轮次的搜索结果汇总为每个查询 top-k 条摘要片段
+- 按可配置的 token 预算逐级裁剪
+
+token 计数使用确定性的正则分词近似，不依赖具体模型的 tokenizer，便于离线测试预算。
+
+压缩相关环境变量：
+- REFLEXION_COMPACTION_ENABLED: 是否默认启用压缩，默认为 true
+- REFLEXION_PROMPT_TOKEN_BUDGET: 提示词 token 预算，默认为 6000
+- REFLEXION_SNIPPETS_TOP_K: 每个查询保留的结果数，默认为 3
+- REFLEXION_SNIPPET_CHARS: 每条摘要片段的最大字符数，默认为 500
+"""
+
+import json
+import re
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleton import LazySingleton
+
+# 单词（含中文等 Unicode 字符）或单个标点视为一个 token
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# 消息压缩器：接收消息列表，返回压缩后的消息列表
+Compactor = Callable[[list[BaseMessage]], list[BaseMessage]]
+
+# 摘要片段的最小字符数，预算裁剪不会低于这个长度
+_MIN_SNIPPET_CHARS = 50
+
+
+def count_tokens(text: str) -> int:
+    """确定性地估算文本的 token 数。
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: token 数
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """按 count_tokens 的计数方式把文本截断到最多 max_tokens 个 token。
+
+    Args:
+        text: 文本
+        max_tokens: 最大 token 数
+
+    Returns:
+        str: 截断后的文本（未超出时原样返回）
+    """
+    for i, match in enumerate(_TOKEN_PATTERN.finditer(text)):
+        if i == max_tokens:
+            return text[: match.start()].rstrip()
+    return text
+
+
+def count_message_tokens(
+    messages: list[BaseMessage], token_counter: Callable[[str], int] = count_tokens
+) -> int:
+    """估算消息列表的 token 数（包括消息内容和工具调用参数）。
+
+    Args:
+        messages: 消息列表
+        token_counter: 文本 token 计数函数
+
+    Returns:
+        int: token 数
+    """
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        total += token_counter(content)
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            total += token_counter(json.dumps(tool_call["args"], ensure_ascii=False))
+    return total
+
+
+def _trim_results(results: list, top_k: int, snippet_chars: int) -> list:
+    """将单个查询的结果裁剪为 top-k 条摘要片段。"""
+    ranked = sorted(
+        (r for r in results if isinstance(r, dict)),
+        key=lambda r: r.get("score") or 0,
+        reverse=True,
+    )
+    return [
+        {"url": r.get("url"), "content": (r.get("content") or "")[:snippet_chars]}
+        for r in ranked[:top_k]
+    ]
+
+
+def trim_search_content(content: str, top_k: int, snippet_chars: int) -> str:
+    """裁剪 ToolMessage 中的搜索结果内容。
+
+    内容是 JSON 序列化的列表，每个元素对应一个查询的结果（结果列表或错误字符串）。
+    无法解析时直接按字符截断。
+
+    Args:
+        content: ToolMessage 内容
+        top_k: 每个查询保留的结果数
+        snippet_chars: 每条摘要片段的最大字符数
+
+    Returns:
+        str: 裁剪后的内容
+    """
+    try:
+        per_query = json.loads(content)
+    except (TypeError, ValueError):
+        return content[: top_k * snippet_chars]
+    if not isinstance(per_query, list):
+        return content[: top_k * snippet_chars]
+    trimmed = [
+        _trim_results(results, top_k, snippet_chars) if isinstance(results, list) else results
+        for results in per_query
+    ]
+    return json.dumps(trimmed, ensure_ascii=False)
+
+
+class MessageCompactor:
+    """默认的消息压缩器。
+
+    压缩后的消息结构：
+    1. 第一条 AIMessage 之前的消息（用户问题）原样保留
+    2. 更早轮次的搜索结果汇总为一条 HumanMessage（按 URL 去重的 top-k 摘要片段）
+    3. 最新一轮的 AIMessage 及其 ToolMessage
+
+    超出 token 预算时依次：裁剪最新一轮的搜索结果为 top-k 摘要 -> 丢弃更早轮次的摘要
+    -> 逐次减半摘要片段长度，直到满足预算或达到最小片段长度。
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        top_k: int = 3,
+        snippet_chars: int = 500,
+        token_counter: Callable[[str], int] = count_tokens,
+    ):
+        """初始化压缩器。
+
+        Args:
+            token_budget: 提示词 token 预算
+            top_k: 每个查询保留的结果数
+            snippet_chars: 每条摘要片段的最大字符数
+            token_counter: 文本 token 计数函数，默认为确定性的 count_tokens
+        """
+        self.token_budget = token_budget
+        self.top_k = top_k
+        self.snippet_chars = snippet_chars
+        self.token_counter = token_counter
+
+    def _earlier_notes(self, messages: list[BaseMessage]) -> Optional[HumanMessage]:
+        """将更早轮次的搜索结果汇总为一条消息，没有可汇总的结果时返回 None。"""
+        lines = []
+        seen_urls = set()
+        for message in messages:
+            if not isinstance(message, ToolMessage):
+                continue
+            try:
+                per_query = json.loads(message.content)
+            except (TypeError, ValueError):
+                continue
+            for results in per_query if isinstance(per_query, list) else []:
+                if not isinstance(results, list):
+                    continue
+                for result in _trim_results(results, self.top_k, self.snippet_chars):
+                    if result["url"] in seen_urls:
+                        continue
+                    seen_urls.add(result["url"])
+                    lines.append(f"- {result['url']}: {result['content']}")
+        if not lines:
+            return None
+        return HumanMessage(content="Earlier search results (summarized):\n" + "\n".join(lines))
+
+    def _count(self, messages: list[BaseMessage]) -> int:
+        return count_message_tokens(messages, self.token_counter)
+
+    def __call__(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        """压缩消息列表。
+
+        Args:
+            messages: 完整的消息历史
+
+        Returns:
+            list[BaseMessage]: 压缩后的消息列表
+        """
+        ai_indexes = [
+            i for i, m in enumerate(messages) if isinstance(m, AIMessage) and m.tool_calls
+        ]
+        if not ai_indexes:
+            return list(messages)
+
+        first_ai, latest_ai = ai_indexes[0], ai_indexes[-1]
+        head = list(messages[:first_ai])
+        tail = list(messages[latest_ai:])
+        notes = self._earlier_notes(messages[first_ai:latest_ai])
+        compacted = head + ([notes] if notes else []) + tail
+        if self._count(compacted) <= self.token_budget:
+            return compacted
+
+        # 逐级裁剪：先裁剪最新一轮的搜索结果，再丢弃更早轮次的摘要，最后缩短片段
+        snippet_chars = self.snippet_chars
+        while True:
+            trimmed_tail = [
+                m.model_copy(
+                    update={"content": trim_search_content(m.content, self.top_k, snippet_chars)}
+                )
+                if isinstance(m, ToolMessage) and isinstance(m.content, str)
+                else m
+                for m in tail
+            ]
+            compacted = head + trimmed_tail
+            if notes and self._count(compacted + [notes]) <= self.token_budget:
+                return head + [notes] + trimmed_tail
+            if self._count(compacted) <= self.token_budget or snippet_chars <= _MIN_SNIPPET_CHARS:
+                return compacted
+            snippet_chars = max(_MIN_SNIPPET_CHARS, snippet_chars // 2)
+
+
+def _create_default_compactor() -> Compactor:
+    settings = get_settings().compaction
+    return MessageCompactor(
+        token_budget=settings.prompt_token_budget,
+        top_k=settings.snippets_top_k,
+        snippet_chars=settings.snippet_chars,
+    )
+
+
+# 全局默认压缩器（延迟初始化）
+_default_compactor = LazySingleton(_create_default_compactor, name="compactor")
+
+
+def get_default_compactor() -> Optional[Compactor]:
+    """获取默认的消息压缩器。
+
+    根据环境变量创建 MessageCompactor；如果 REFLEXION_COMPACTION_ENABLED 为 false，返回 None。
+
+    Returns:
+        Optional[Compactor]: 默认压缩器，未启用时为 None
+    """
+    compactor = _default_compactor.peek()
+    if compactor is None and get_settings().compaction.enabled:
+        compactor = _default_compactor.get()
+    return compactor
+
+
+def set_default_compactor(compactor: Optional[Compactor]) -> None:
+    """替换默认的消息压缩器。
+
+    传入 None 时清除当前压缩器，下次调用 get_default_compactor() 时会根据环境变量重新创建。
+
+    Args:
+        compactor: 任意接收并返回消息列表的可调用对象，或 None
+    """
+    _default_compactor.set(compactor)
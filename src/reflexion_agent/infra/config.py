@@ -5,14 +5,15 @@
 - Azure OpenAI 设置
 - 配置检查
 - 部署名称获取
+
+配置的读取统一通过 infra.settings.get_settings()：.env 只在第一次解析配置时加载，
+is_azure_openai_configured() 和 get_deployment_name() 返回缓存配置中的值。
 """
 
 import os
 from pathlib import Path
 from typing import Optional
 
-from dotenv import load_dotenv
-
 
 def load_env_file(env_path: Optional[str] = None) -> None:
     """从 .env 文件加载环境变量。
@@ -31,8 +32,10 @@ def load_env_file(env_path: Optional[str] = None) -> None:
     else:
         env_path = Path(env_path)
     
-    # 如果 .env 文件存在，加载它
+    # 如果 .env 文件存在，加载它（python-dotenv 只在这里才导入）
     if env_path.exists():
+        from dotenv import load_dotenv
+
         load_dotenv(dotenv_path=env_path)
 
 
@@ -53,14 +56,16 @@ def setup_azure_openai(
         api_key: Azure OpenAI API 密钥。如果未提供，从环境变量 AZURE_OPENAI_API_KEY 读取。
         endpoint: Azure OpenAI 端点 URL。如果未提供，从环境变量 AZURE_OPENAI_ENDPOINT 读取。
         api_version: Azure OpenAI API 版本。如果未提供，默认为 "2024-02-15-preview"。
-        load_env: 是否首先加载 .env 文件。默认为 True。
+        load_env: 是否首先加载 .env 文件（通过 get_settings()，只在第一次解析配置时读取）。默认为 True。
         
     Raises:
         ValueError: 如果缺少必需的 API 密钥或端点配置。
     """
-    # 如果需要，先加载 .env 文件
+    from reflexion_agent.infra.settings import get_settings, reload_settings
+
+    # 如果需要，先加载 .env 文件（解析配置时加载，已经解析过则不再读取文件）
     if load_env:
-        load_env_file()
+        get_settings()
     
     # 设置 API 密钥
     if api_key:
@@ -95,32 +100,31 @@ def setup_azure_openai(
         os.environ["AZURE_OPENAI_API_VERSION"] = default_version
         os.environ["OPENAI_API_VERSION"] = default_version
 
+    # 显式传入的参数改变了环境变量，重新解析缓存的配置
+    if api_key or endpoint or api_version:
+        reload_settings()
+
 
 def is_azure_openai_configured() -> bool:
     """检查是否已配置 Azure OpenAI。
     
-    检查必需的环境变量（API 密钥和端点）是否已设置。
+    检查必需的配置（API 密钥和端点）是否已设置。
     
     Returns:
-        bool: 如果 Azure OpenAI 环境变量已设置返回 True，否则返回 False。
+        bool: 如果 Azure OpenAI 已配置返回 True，否则返回 False。
     """
-    # 先尝试加载 .env 文件
-    load_env_file()
-    # 检查必需的环境变量是否存在
-    return (
-        "AZURE_OPENAI_API_KEY" in os.environ
-        and "AZURE_OPENAI_ENDPOINT" in os.environ
-    )
+    from reflexion_agent.infra.settings import get_settings
+
+    return get_settings().azure.configured
 
 
 def get_deployment_name() -> str:
-    """从环境变量获取 Azure OpenAI 部署名称。
+    """获取 Azure OpenAI 部署名称（AZURE_OPENAI_DEPLOYMENT_NAME）。
     
     Returns:
         str: 部署名称，如果未设置则默认为 "gpt-4"。
     """
-    # 加载环境变量
-    load_env_file()
-    # 从环境变量获取部署名称，如果没有则使用默认值 "gpt-4"
-    return os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
+    from reflexion_agent.infra.settings import get_settings
+
+    return get_settings().azure.deployment_name
 
@@ -2,37 +2,49 @@
 
 本模块负责初始化和管理 LLM 实例，支持：
 - Azure OpenAI
+- 多个 Azure OpenAI 部署之间的路由（AZURE_OPENAI_DEPLOYMENTS，见 infra.llm_router）
 - 标准 OpenAI
 
-根据环境变量自动选择合适的 LLM 配置。
+根据运行配置（infra.settings）自动选择合适的 LLM 配置。
 """
 
-import os
-
-from dotenv import load_dotenv
-
-# 加载环境变量
-load_dotenv()
-
-from langchain.chat_models import init_chat_model
-
 from reflexion_agent.infra.config import (
     get_deployment_name,
     is_azure_openai_configured,
     setup_azure_openai,
 )
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleton import LazySingleton
 
 
 def get_llm():
     """获取配置好的 LLM 实例。
     
     根据环境变量配置选择合适的 LLM：
+    - 如果设置了 AZURE_OPENAI_DEPLOYMENTS，返回在这些部署之间路由的模型
     - 如果配置了 Azure OpenAI，使用 Azure OpenAI
     - 否则使用标准 OpenAI
     
     Returns:
-        ChatModel: 配置好的 LLM 实例（通过 init_chat_model 创建）
+        ChatModel: 配置好的 LLM 实例（通过 init_chat_model 创建，或 RoutedChatModel）
     """
+    # .env 在第一次解析配置时（而不是导入时）加载，import reflexion_agent 不读取文件
+    router_settings = get_settings().llm_router
+    # 配置了多个部署时，在部署之间做负载均衡（路由模块在这里才导入）
+    from reflexion_agent.infra.llm_router import create_llm_router, load_deployments_from_env
+
+    deployments = load_deployments_from_env()
+    if deployments:
+        return create_llm_router(
+            deployments,
+            failure_threshold=router_settings.failure_threshold,
+            cooldown_seconds=router_settings.cooldown_seconds,
+            max_queue_seconds=router_settings.max_queue_seconds,
+        )
+    
+    # init_chat_model 会导入 langchain 的模型注册表，只在真正创建模型时才导入
+    from langchain.chat_models import init_chat_model
+
     # 根据环境变量配置选择合适的 LLM
     # 如果配置了 Azure OpenAI，使用 Azure OpenAI；否则使用标准 OpenAI
     if is_azure_openai_configured():
@@ -58,21 +70,39 @@ def get_llm():
     return llm
 
 
-# 全局 LLM 实例（延迟初始化）
-_llm_instance = None
+# 全局 LLM 实例（延迟初始化，并发冷启动时只创建一次）
+_llm_instance = LazySingleton(get_llm, name="llm")
 
 
 def get_llm_instance():
     """获取全局 LLM 实例（单例模式）。
     
     首次调用时初始化 LLM，后续调用返回同一个实例。
-    这样可以避免重复初始化，提高性能。
+    这样可以避免重复初始化，提高性能。多个线程同时首次调用时只会创建一个实例。
     
     Returns:
         ChatModel: 全局 LLM 实例（通过 init_chat_model 创建）
     """
-    global _llm_instance
-    if _llm_instance is None:
-        _llm_instance = get_llm()
-    return _llm_instance
+    return _llm_instance.get()
+
 
+async def aget_llm_instance():
+    """异步获取全局 LLM 实例，首次创建在线程中执行，不阻塞事件循环。
+    
+    Returns:
+        ChatModel: 全局 LLM 实例
+    """
+    return await _llm_instance.aget()
+
+
+def set_llm_instance(llm) -> None:
+    """替换全局 LLM 实例。
+
+    可用于注入自定义配置的模型（或离线基准测试使用的替身模型）。
+    注意：draft/revise 节点的链在首次使用（或 warmup()）时绑定 LLM，需要在此之前调用；
+    传入 None 时清除当前实例，下次调用 get_llm_instance() 时会重新创建。
+
+    Args:
+        llm: 新的 ChatModel 实例，或 None
+    """
+    _llm_instance.set(llm)
@@ -0,0 +1,387 @@
+"""多租户 LLM 实例池模块。
+
+get_llm_instance() 只有一个全局模型，draft / revise 的链也绑定在这个模型上，同一个进程无法
+按请求使用不同的模型、温度或 API 密钥。本模块按 LLMSpec（提供方、部署/模型名、调用参数、凭据）
+缓存模型实例及绑定在其上的链：
+- 同一个 LLMSpec 的请求复用同一个模型客户端（及其 HTTP 连接池）和同一条链
+- 池的大小有上限，超过时淘汰最久未使用的条目；空闲超过 idle_ttl 的条目在下次访问池时淘汰
+- 并发冷启动同一个 LLMSpec 时只创建一次客户端（单飞合并），不同的 LLMSpec 互不阻塞
+
+运行通过 config["configurable"]["llm"] 选择模型，未设置时使用全局模型（get_llm_instance）：
+
+    graph.invoke(
+        {"messages": [HumanMessage(content=question)]},
+        {"configurable": {"llm": LLMSpec.of("gpt-4o-mini", temperature=0, api_key=tenant_key)}},
+    )
+
+configurable["llm"] 也可以是字典（{"model": ..., "provider": ..., "api_key": ..., "temperature": ...}）
+或模型名字符串。LLMSpec 的 repr 不包含 API 密钥。
+
+池相关环境变量（通过 infra.settings 读取）：
+- LLM_POOL_MAX_SIZE: 池中最多保留的模型数，默认为 16
+- LLM_POOL_IDLE_TTL: 空闲模型的保留时间（秒），默认为 1800，0 表示不按空闲时间淘汰
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Union
+
+from langchain_core.runnables import RunnableConfig
+
+from reflexion_agent.infra.metrics import get_metrics_registry, metrics_enabled
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleflight import SingleFlight
+from reflexion_agent.infra.singleton import LazySingleton
+
+# LLMSpec 以外的字段名，其余字段都视为调用参数
+_SPEC_FIELDS = ("provider", "api_key", "endpoint", "api_version")
+
+
+def _freeze(value: Any) -> Any:
+    """把列表和字典转换为可哈希的元组，使调用参数可以作为池的键。"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True)
+class LLMSpec:
+    """一个模型客户端的完整描述，也是池的键。
+
+    Attributes:
+        model: 模型名；Azure OpenAI 为部署名
+        provider: init_chat_model 的 model_provider；为 None 时配置了 Azure OpenAI 则使用
+            "azure_openai"，否则使用 "openai"
+        params: 调用参数（temperature、max_tokens 等），按名称排序的 (名称, 值) 元组
+        api_key: API 密钥；为 None 时使用运行配置中的密钥
+        endpoint: 端点（Azure 的 azure_endpoint，其他提供方的 base_url）
+        api_version: Azure OpenAI API 版本
+    """
+
+    model: str
+    provider: Optional[str] = None
+    params: tuple[tuple[str, Any], ...] = ()
+    api_key: Optional[str] = field(default=None, repr=False)
+    endpoint: Optional[str] = None
+    api_version: Optional[str] = None
+
+    @classmethod
+    def of(
+        cls,
+        model: str,
+        provider: Optional[str] = None,
+        *,
+        api_key: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        api_version: Optional[str] = None,
+        **params: Any,
+    ) -> "LLMSpec":
+        """用关键字参数创建 LLMSpec，其余关键字参数作为调用参数。
+
+        Args:
+            model: 模型名或 Azure 部署名
+            provider: 模型提供方
+            api_key: API 密钥
+            endpoint: 端点
+            api_version: Azure OpenAI API 版本
+            **params: 调用参数，例如 temperature=0
+
+        Returns:
+            LLMSpec: 模型描述
+        """
+        return cls(
+            model=model,
+            provider=provider,
+            params=_freeze(params),
+            api_key=api_key,
+            endpoint=endpoint,
+            api_version=api_version,
+        )
+
+    @classmethod
+    def coerce(cls, value: Union["LLMSpec", dict, str]) -> "LLMSpec":
+        """把 configurable["llm"] 的值转换为 LLMSpec。
+
+        Args:
+            value: LLMSpec、字典（model 或 deployment 为模型名，其余非凭据字段为调用参数）或模型名
+
+        Returns:
+            LLMSpec: 模型描述
+
+        Raises:
+            ValueError: 字典中缺少模型名，或值的类型不受支持
+        """
+        if isinstance(value, LLMSpec):
+            return value
+        if isinstance(value, str):
+            return cls(model=value)
+        if isinstance(value, dict):
+            options = dict(value)
+            model = options.pop("model", None) or options.pop("deployment", None)
+            if not model:
+                raise ValueError(f"LLM spec needs a model or deployment name: {sorted(value)!r}")
+            spec_fields = {name: options.pop(name) for name in _SPEC_FIELDS if name in options}
+            return cls.of(model, **spec_fields, **options)
+        raise ValueError(f"Unsupported LLM spec: {type(value).__name__}")
+
+    def kwargs(self) -> dict:
+        """init_chat_model 的参数（凭据缺省时使用运行配置中的值）。"""
+        azure = get_settings().azure
+        provider = self.provider or ("azure_openai" if azure.configured else "openai")
+        kwargs: dict[str, Any] = {"model": self.model, "model_provider": provider, **dict(self.params)}
+        if provider == "azure_openai":
+            kwargs["azure_endpoint"] = self.endpoint or azure.endpoint
+            kwargs["api_key"] = self.api_key or azure.api_key
+            kwargs["api_version"] = self.api_version or azure.api_version
+        else:
+            if self.api_key:
+                kwargs["api_key"] = self.api_key
+            if self.endpoint:
+                kwargs["base_url"] = self.endpoint
+        return kwargs
+
+
+def build_llm(spec: LLMSpec):
+    """按 LLMSpec 创建模型实例（池的默认工厂）。
+
+    Args:
+        spec: 模型描述
+
+    Returns:
+        ChatModel: 通过 init_chat_model 创建的模型
+    """
+    from langchain.chat_models import init_chat_model
+
+    return init_chat_model(**spec.kwargs())
+
+
+class _Entry:
+    """池中的一个模型及绑定在其上的链。"""
+
+    __slots__ = ("llm", "chains", "last_used")
+
+    def __init__(self, llm):
+        self.llm = llm
+        # 链名 -> 链（例如 "first_responder"、"revisor"）
+        self.chains: dict[str, Any] = {}
+        self.last_used = time.monotonic()
+
+
+class LLMPool:
+    """按 LLMSpec 缓存模型实例和链的 LRU 池（线程安全）。"""
+
+    def __init__(
+        self,
+        max_size: int = 16,
+        idle_ttl: Optional[float] = 1800.0,
+        factory: Optional[Callable[[LLMSpec], Any]] = None,
+    ):
+        """初始化池。
+
+        Args:
+            max_size: 最多保留的模型数
+            idle_ttl: 空闲模型的保留时间（秒），None 或 0 表示不按空闲时间淘汰
+            factory: 按 LLMSpec 创建模型的函数，默认为 build_llm
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl or None
+        self._factory = factory or build_llm
+        self._entries: "OrderedDict[LLMSpec, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 并发冷启动同一个 LLMSpec 时只创建一次模型
+        self._flight = SingleFlight()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _evict_idle(self, now: float) -> None:
+        """淘汰空闲过久的条目（持有锁时调用）。条目按最近使用排序，从最旧的开始检查。"""
+        if self.idle_ttl is None:
+            return
+        while self._entries:
+            spec, entry = next(iter(self._entries.items()))
+            if now - entry.last_used <= self.idle_ttl:
+                break
+            del self._entries[spec]
+            self._record_eviction("idle")
+
+    def _record_eviction(self, reason: str) -> None:
+        self._evictions += 1
+        if metrics_enabled():
+            get_metrics_registry().inc("reflexion_llm_pool_evictions_total", reason=reason)
+
+    def _touch(self, spec: LLMSpec, entry: _Entry, now: float) -> None:
+        """把命中的条目标记为最近使用（持有锁时调用）。"""
+        self._entries.move_to_end(spec)
+        entry.last_used = now
+        self._hits += 1
+
+    def _record_hit(self) -> None:
+        if metrics_enabled():
+            get_metrics_registry().inc("reflexion_llm_pool_lookups_total", outcome="hit")
+
+    def _entry(self, spec: LLMSpec) -> _Entry:
+        """获取 LLMSpec 对应的条目，不存在时创建模型。"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(spec)
+            if entry is not None:
+                self._touch(spec, entry, now)
+        if entry is not None:
+            self._record_hit()
+            return entry
+
+        def create() -> _Entry:
+            # 单飞的 leader 再检查一次：可能在等待期间已经由其他调用创建
+            with self._lock:
+                existing = self._entries.get(spec)
+            if existing is not None:
+                return existing
+            # 创建客户端不持有池的锁，其他 LLMSpec 的请求不受影响
+            created = _Entry(self._factory(spec))
+            with self._lock:
+                self._misses += 1
+                self._entries[spec] = created
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self._record_eviction("capacity")
+            if metrics_enabled():
+                get_metrics_registry().inc("reflexion_llm_pool_lookups_total", outcome="miss")
+            return created
+
+        return self._flight.do(spec, create)
+
+    def get_llm(self, spec: LLMSpec):
+        """获取 LLMSpec 对应的模型实例。
+
+        Args:
+            spec: 模型描述
+
+        Returns:
+            ChatModel: 模型实例
+        """
+        return self._entry(spec).llm
+
+    def get_chain(self, spec: LLMSpec, name: str, build: Callable[[Any], Any]):
+        """获取绑定在 LLMSpec 对应模型上的链，不存在时用 build(llm) 创建。
+
+        Args:
+            spec: 模型描述
+            name: 链名
+            build: 接收模型实例、返回链的函数
+
+        Returns:
+            Runnable: 链
+        """
+        entry = self._entry(spec)
+        chain = entry.chains.get(name)
+        if chain is None:
+            # 并发创建时保留先写入的链，链本身无状态，多创建一次没有副作用
+            chain = entry.chains.setdefault(name, build(entry.llm))
+        return chain
+
+    async def aget_chain(self, spec: LLMSpec, name: str, build: Callable[[Any], Any]):
+        """异步获取链：已经创建时直接返回，否则在线程中创建模型和链，不阻塞事件循环。
+
+        Args:
+            spec: 模型描述
+            name: 链名
+            build: 接收模型实例、返回链的函数
+
+        Returns:
+            Runnable: 链
+        """
+        now = time.monotonic()
+        # 与 get_chain 一样在锁内查找：条目可能正被其他线程淘汰或插入
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(spec)
+            chain = entry.chains.get(name) if entry is not None else None
+            if chain is not None:
+                self._touch(spec, entry, now)
+        if chain is not None:
+            self._record_hit()
+            return chain
+        import asyncio
+
+        return await asyncio.to_thread(self.get_chain, spec, name, build)
+
+    def evict(self, spec: LLMSpec) -> bool:
+        """移除一个条目（例如租户的凭据已轮换）。
+
+        Returns:
+            bool: 条目是否存在
+        """
+        with self._lock:
+            return self._entries.pop(spec, None) is not None
+
+    def clear(self) -> None:
+        """移除所有条目。"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        """池的统计信息。"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "models": [repr(spec) for spec in self._entries],
+            }
+
+
+def llm_spec_from_config(config: Optional[RunnableConfig]) -> Optional[LLMSpec]:
+    """读取运行配置中 configurable["llm"] 指定的模型。
+
+    Args:
+        config: 运行配置
+
+    Returns:
+        Optional[LLMSpec]: 模型描述，未指定时为 None（使用全局模型）
+    """
+    value = (config or {}).get("configurable", {}).get("llm")
+    return None if value is None else LLMSpec.coerce(value)
+
+
+def _create_llm_pool() -> LLMPool:
+    settings = get_settings().llm_pool
+    return LLMPool(max_size=settings.max_size, idle_ttl=settings.idle_ttl)
+
+
+# 全局模型池（延迟初始化）
+_llm_pool = LazySingleton(_create_llm_pool, name="llm_pool")
+
+
+def get_llm_pool() -> LLMPool:
+    """获取全局模型池（单例模式），根据运行配置创建。
+
+    Returns:
+        LLMPool: 全局模型池
+    """
+    return _llm_pool.get()
+
+
+def set_llm_pool(pool: Optional[LLMPool]) -> None:
+    """替换全局模型池。
+
+    可用于注入自定义工厂的池（或离线基准测试使用的替身模型）。
+    传入 None 时清除当前池，下次调用 get_llm_pool() 时会重新创建。
+
+    Args:
+        pool: 新的模型池，或 None
+    """
+    _llm_pool.set(pool)
@@ -0,0 +1,507 @@
+"""多部署 LLM 路由模块。
+
+get_llm 默认只使用一个部署，吞吐量受限于单个部署的配额。本模块把多个部署（不同的 Azure
+部署或区域）组合成一个聊天模型（RoutedChatModel），每次请求按以下规则选择部署：
+- 跳过熔断中的部署：429 立即熔断（优先使用 Retry-After），连续的 5xx / 超时 / 连接错误达到阈值后熔断；
+  冷却结束后放行一个探测请求，成功即恢复
+- 跳过本分钟内请求数（RPM）或 token 数（TPM）已达上限的部署
+- 在剩余部署中选择 EWMA 延迟 × (进行中的请求数 + 1) 最小的部署
+- 可重试的错误自动切换到其他部署；所有部署都不可用时排队等待，超过 max_queue_seconds 后抛出异常
+
+TPM 在请求开始时按提示词估算预留，完成后按 usage_metadata 修正。
+
+通过环境变量 AZURE_OPENAI_DEPLOYMENTS（JSON 数组）启用，get_llm 会返回路由模型：
+
+    AZURE_OPENAI_DEPLOYMENTS='[
+        {"deployment": "gpt4o-eastus", "rpm": 300, "tpm": 60000},
+        {"deployment": "gpt4o-westeu", "endpoint": "https://westeu.openai.azure.com/",
+         "api_key": "...", "rpm": 300, "tpm": 60000}
+    ]'
+
+未指定 endpoint、api_key、api_version 的部署使用 AZURE_OPENAI_ENDPOINT、AZURE_OPENAI_API_KEY 和
+OPENAI_API_VERSION；name 默认为部署名，用于指标标签和 stats()。
+
+路由相关环境变量（由 get_llm 读取）：
+- LLM_ROUTER_FAILURE_THRESHOLD: 连续失败多少次后熔断，默认为 3
+- LLM_ROUTER_COOLDOWN_SECONDS: 熔断持续时间（秒），默认为 30
+- LLM_ROUTER_MAX_QUEUE_SECONDS: 所有部署都不可用时最多排队等待的时间（秒），默认为 60
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Collection, Iterator, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from reflexion_agent.infra.compaction import count_message_tokens
+from reflexion_agent.infra.metrics import get_metrics_registry, metrics_enabled
+from reflexion_agent.infra.rate_limit import error_status, usage_tokens
+from reflexion_agent.infra.settings import get_settings
+
+# RPM / TPM 的统计窗口（秒）
+_WINDOW_SECONDS = 60.0
+
+
+@dataclass
+class Deployment:
+    """一个 LLM 部署。"""
+
+    name: str
+    llm: Any
+    # 每分钟请求数上限，None 表示不限制
+    rpm: Optional[int] = None
+    # 每分钟 token 数上限，None 表示不限制
+    tpm: Optional[int] = None
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """429、5xx、超时和连接错误可以切换到其他部署重试。"""
+    status = error_status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # openai.APITimeoutError / APIConnectionError 不带状态码
+    return any(name in type(error).__name__ for name in ("Timeout", "Connection"))
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """读取 429 响应的 Retry-After 头（秒）。"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _DeploymentState:
+    """单个部署的路由状态（由 LLMRouter 的锁保护）。"""
+
+    def __init__(self, deployment: Deployment, initial_latency: float):
+        self.deployment = deployment
+        self.ewma_latency = initial_latency
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        # 熔断截止时间；大于 0 且已过期表示半开状态
+        self.open_until = 0.0
+        self.requests: deque = deque()  # 请求开始时间
+        self.tokens: deque = deque()  # [开始时间, token 数]
+
+    def trim(self, now: float) -> None:
+        while self.requests and now - self.requests[0] >= _WINDOW_SECONDS:
+            self.requests.popleft()
+        while self.tokens and now - self.tokens[0][0] >= _WINDOW_SECONDS:
+            self.tokens.popleft()
+
+    def capacity_wait(self, now: float, tokens: int) -> float:
+        """距离 RPM / TPM 有余量还需要等待的秒数，0 表示可以立即发出请求。"""
+        self.trim(now)
+        wait = 0.0
+        rpm, tpm = self.deployment.rpm, self.deployment.tpm
+        if rpm is not None and len(self.requests) >= rpm:
+            wait = max(wait, self.requests[0] + _WINDOW_SECONDS - now)
+        if tpm is not None and self.tokens:
+            used = sum(entry[1] for entry in self.tokens)
+            # 单个请求超过 TPM 时只要求窗口为空，避免永远无法发出
+            if used + tokens > tpm:
+                wait = max(wait, self.tokens[0][0] + _WINDOW_SECONDS - now)
+        return wait
+
+    def stats(self, now: float) -> dict:
+        self.trim(now)
+        if self.open_until > now:
+            breaker = "open"
+        elif self.open_until:
+            breaker = "half_open"
+        else:
+            breaker = "closed"
+        return {
+            "name": self.deployment.name,
+            "ewma_latency_seconds": self.ewma_latency,
+            "in_flight": self.in_flight,
+            "breaker": breaker,
+            "consecutive_failures": self.consecutive_failures,
+            "requests_last_minute": len(self.requests),
+            "tokens_last_minute": sum(entry[1] for entry in self.tokens),
+        }
+
+
+class LLMRouter:
+    """在多个部署之间做延迟感知的负载均衡，带熔断和 RPM / TPM 限制。"""
+
+    def __init__(
+        self,
+        deployments: list[Deployment],
+        ewma_alpha: float = 0.3,
+        initial_latency: float = 1.0,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        max_queue_seconds: float = 60.0,
+    ):
+        """初始化路由器。
+
+        Args:
+            deployments: 部署列表，至少一个
+            ewma_alpha: 延迟 EWMA 的平滑系数
+            initial_latency: 尚无观测时假定的延迟（秒）
+            failure_threshold: 连续多少次 5xx / 超时 / 连接错误后熔断
+            cooldown_seconds: 熔断持续时间（秒）
+            max_queue_seconds: 所有部署都不可用时最多排队等待的时间（秒）
+
+        Raises:
+            ValueError: 部署列表为空
+        """
+        if not deployments:
+            raise ValueError("LLMRouter requires at least one deployment")
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_queue_seconds = max_queue_seconds
+        self._states = [_DeploymentState(d, initial_latency) for d in deployments]
+        self._lock = threading.Lock()
+        # 绑定工具：tools_id -> (tools, tool_choice, kwargs)；(部署序号, tools_id) -> 绑定后的 Runnable
+        self._tool_bindings: dict[int, tuple] = {}
+        self._bound: dict[tuple[int, Optional[int]], Any] = {}
+
+    def register_tools(self, tools: list, tool_choice: Optional[str], kwargs: dict) -> int:
+        """登记一组工具绑定，返回在调用参数中传递的 tools_id。"""
+        with self._lock:
+            tools_id = len(self._tool_bindings)
+            self._tool_bindings[tools_id] = (tools, tool_choice, kwargs)
+            return tools_id
+
+    def _runnable(self, state: _DeploymentState, tools_id: Optional[int]):
+        """部署模型（绑定工具后）的 Runnable，按 (部署, 工具绑定) 缓存。"""
+        key = (self._states.index(state), tools_id)
+        runnable = self._bound.get(key)
+        if runnable is None:
+            llm = state.deployment.llm
+            if tools_id is None:
+                runnable = llm
+            else:
+                tools, tool_choice, kwargs = self._tool_bindings[tools_id]
+                runnable = llm.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+            self._bound[key] = runnable
+        return runnable
+
+    def _try_acquire(
+        self, tokens: int, tried: Collection[_DeploymentState] = ()
+    ) -> tuple[Optional[_DeploymentState], float, Optional[list]]:
+        """尝试选择一个部署并登记请求。
+
+        Args:
+            tokens: 请求预估的 token 数
+            tried: 本次调用中已经失败过的部署，不再选择
+
+        Returns:
+            tuple: (选中的部署, 需要等待的秒数, TPM 窗口中的条目)；没有可用部署时部署为 None
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates, wait = [], float("inf")
+            for state in self._states:
+                if state in tried:
+                    # 5xx 未达到熔断阈值时熔断器仍是闭合的，需要显式跳过，才能切换到其他部署
+                    continue
+                if state.open_until > now:
+                    wait = min(wait, state.open_until - now)
+                    continue
+                if state.open_until and state.in_flight:
+                    # 半开状态同时只放行一个探测请求
+                    continue
+                capacity_wait = state.capacity_wait(now, tokens)
+                if capacity_wait > 0:
+                    wait = min(wait, capacity_wait)
+                    continue
+                candidates.append(state)
+            if not candidates:
+                return None, wait if wait != float("inf") else 0.05, None
+            best = min(candidates, key=lambda s: s.ewma_latency * (s.in_flight + 1))
+            best.in_flight += 1
+            best.requests.append(now)
+            entry = [now, tokens]
+            best.tokens.append(entry)
+            return best, 0.0, entry
+
+    def _release(
+        self,
+        state: _DeploymentState,
+        entry: list,
+        latency: float,
+        tokens: Optional[int],
+        error: Optional[BaseException] = None,
+        cancelled: bool = False,
+    ) -> None:
+        """请求结束：更新延迟、TPM 用量和熔断状态。
+
+        请求被取消时（cancelled=True）只减少进行中的请求数，延迟和熔断状态保持不变。
+        """
+        outcome = "ok"
+        with self._lock:
+            state.in_flight -= 1
+            if tokens is not None:
+                entry[1] = tokens
+            if cancelled:
+                outcome = "cancelled"
+            elif error is None:
+                state.ewma_latency += self.ewma_alpha * (latency - state.ewma_latency)
+                state.consecutive_failures = 0
+                state.open_until = 0.0
+            elif _is_retryable(error):
+                outcome = "retryable_error"
+                state.consecutive_failures += 1
+                status = error_status(error)
+                if (
+                    status == 429
+                    or state.open_until
+                    or state.consecutive_failures >= self.failure_threshold
+                ):
+                    cooldown = (_retry_after(error) if status == 429 else None) or self.cooldown_seconds
+                    state.open_until = time.monotonic() + cooldown
+                    outcome = "breaker_open"
+            else:
+                outcome = "error"
+        if metrics_enabled():
+            get_metrics_registry().inc(
+                "reflexion_llm_requests_total", deployment=state.deployment.name, outcome=outcome
+            )
+
+    def _acquire(
+        self, tokens: int, tried: Collection[_DeploymentState] = ()
+    ) -> tuple[_DeploymentState, list]:
+        deadline = time.monotonic() + self.max_queue_seconds
+        while True:
+            state, wait, entry = self._try_acquire(tokens, tried)
+            if state is not None:
+                return state, entry
+            if time.monotonic() + wait > deadline:
+                raise RuntimeError(f"No LLM deployment available within {self.max_queue_seconds}s")
+            time.sleep(wait)
+
+    async def _aacquire(
+        self, tokens: int, tried: Collection[_DeploymentState] = ()
+    ) -> tuple[_DeploymentState, list]:
+        deadline = time.monotonic() + self.max_queue_seconds
+        while True:
+            state, wait, entry = self._try_acquire(tokens, tried)
+            if state is not None:
+                return state, entry
+            if time.monotonic() + wait > deadline:
+                raise RuntimeError(f"No LLM deployment available within {self.max_queue_seconds}s")
+            await asyncio.sleep(wait)
+
+    def invoke(self, messages: list[BaseMessage], stop: Optional[list[str]], tools_id: Optional[int]) -> BaseMessage:
+        """选择部署执行一次请求，可重试的错误切换到其他部署。
+
+        Raises:
+            Exception: 不可重试的错误，或所有尝试都失败时的最后一个错误
+        """
+        estimate = count_message_tokens(messages)
+        last_error: Optional[BaseException] = None
+        tried: set[_DeploymentState] = set()
+        for _ in range(len(self._states)):
+            state, entry = self._acquire(estimate, tried)
+            tried.add(state)
+            started = time.monotonic()
+            try:
+                message = self._runnable(state, tools_id).invoke(messages, stop=stop)
+            except Exception as e:
+                self._release(state, entry, time.monotonic() - started, None, e)
+                if not _is_retryable(e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                # 取消（asyncio.wait_for 超时）、关闭流（GeneratorExit）等：只归还部署，
+                # 不计入延迟和熔断，半开状态的部署可以重新放行探测请求
+                self._release(state, entry, time.monotonic() - started, None, cancelled=True)
+                raise
+            self._release(state, entry, time.monotonic() - started, usage_tokens([message]))
+            return message
+        raise last_error
+
+    async def ainvoke(
+        self, messages: list[BaseMessage], stop: Optional[list[str]], tools_id: Optional[int]
+    ) -> BaseMessage:
+        """invoke 的异步版本。"""
+        estimate = count_message_tokens(messages)
+        last_error: Optional[BaseException] = None
+        tried: set[_DeploymentState] = set()
+        for _ in range(len(self._states)):
+            state, entry = await self._aacquire(estimate, tried)
+            tried.add(state)
+            started = time.monotonic()
+            try:
+                message = await self._runnable(state, tools_id).ainvoke(messages, stop=stop)
+            except Exception as e:
+                self._release(state, entry, time.monotonic() - started, None, e)
+                if not _is_retryable(e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                # 取消（asyncio.wait_for 超时）、关闭流（GeneratorExit）等：只归还部署，
+                # 不计入延迟和熔断，半开状态的部署可以重新放行探测请求
+                self._release(state, entry, time.monotonic() - started, None, cancelled=True)
+                raise
+            self._release(state, entry, time.monotonic() - started, usage_tokens([message]))
+            return message
+        raise last_error
+
+    def stream(
+        self, messages: list[BaseMessage], stop: Optional[list[str]], tools_id: Optional[int]
+    ) -> Iterator[BaseMessage]:
+        """流式请求。只有在收到第一个片段之前的可重试错误才会切换部署。"""
+        estimate = count_message_tokens(messages)
+        last_error: Optional[BaseException] = None
+        tried: set[_DeploymentState] = set()
+        for _ in range(len(self._states)):
+            state, entry = self._acquire(estimate, tried)
+            tried.add(state)
+            started = time.monotonic()
+            chunks = []
+            try:
+                for chunk in self._runnable(state, tools_id).stream(messages, stop=stop):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                self._release(state, entry, time.monotonic() - started, None, e)
+                if chunks or not _is_retryable(e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                # 取消（asyncio.wait_for 超时）、关闭流（GeneratorExit）等：只归还部署，
+                # 不计入延迟和熔断，半开状态的部署可以重新放行探测请求
+                self._release(state, entry, time.monotonic() - started, None, cancelled=True)
+                raise
+            self._release(state, entry, time.monotonic() - started, usage_tokens(chunks))
+            return
+        raise last_error
+
+    async def astream(
+        self, messages: list[BaseMessage], stop: Optional[list[str]], tools_id: Optional[int]
+    ) -> AsyncIterator[BaseMessage]:
+        """stream 的异步版本。"""
+        estimate = count_message_tokens(messages)
+        last_error: Optional[BaseException] = None
+        tried: set[_DeploymentState] = set()
+        for _ in range(len(self._states)):
+            state, entry = await self._aacquire(estimate, tried)
+            tried.add(state)
+            started = time.monotonic()
+            chunks = []
+            try:
+                async for chunk in self._runnable(state, tools_id).astream(messages, stop=stop):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                self._release(state, entry, time.monotonic() - started, None, e)
+                if chunks or not _is_retryable(e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                # 取消（asyncio.wait_for 超时）、关闭流（GeneratorExit）等：只归还部署，
+                # 不计入延迟和熔断，半开状态的部署可以重新放行探测请求
+                self._release(state, entry, time.monotonic() - started, None, cancelled=True)
+                raise
+            self._release(state, entry, time.monotonic() - started, usage_tokens(chunks))
+            return
+        raise last_error
+
+    def stats(self) -> list[dict]:
+        """各部署的路由状态快照：EWMA 延迟、进行中的请求、熔断状态和本分钟的用量。"""
+        with self._lock:
+            now = time.monotonic()
+            return [state.stats(now) for state in self._states]
+
+
+class RoutedChatModel(BaseChatModel):
+    """把 LLMRouter 包装成普通的聊天模型，可以直接用于 draft / revise 链。"""
+
+    router: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "reflexion-router"
+
+    def bind_tools(self, tools, *, tool_choice: Optional[str] = None, **kwargs):
+        """登记工具绑定；实际请求时由选中的部署模型执行 bind_tools。"""
+        return self.bind(tools_id=self.router.register_tools(list(tools), tool_choice, kwargs))
+
+    def _generate(self, messages, stop=None, run_manager=None, tools_id=None, **kwargs) -> ChatResult:
+        message = self.router.invoke(messages, stop, tools_id)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools_id=None, **kwargs) -> ChatResult:
+        message = await self.router.ainvoke(messages, stop, tools_id)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, tools_id=None, **kwargs):
+        for chunk in self.router.stream(messages, stop, tools_id):
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, tools_id=None, **kwargs):
+        async for chunk in self.router.astream(messages, stop, tools_id):
+            yield ChatGenerationChunk(message=chunk)
+
+
+def create_llm_router(deployments: list[Deployment], **kwargs) -> RoutedChatModel:
+    """用一组部署创建路由聊天模型。
+
+    Args:
+        deployments: 部署列表
+        **kwargs: 传给 LLMRouter 的参数（ewma_alpha、failure_threshold、cooldown_seconds 等）
+
+    Returns:
+        RoutedChatModel: 路由聊天模型，router 属性可用于查看 stats()
+    """
+    return RoutedChatModel(router=LLMRouter(deployments, **kwargs))
+
+
+def load_deployments_from_env() -> list[Deployment]:
+    """根据 AZURE_OPENAI_DEPLOYMENTS（JSON 数组）创建部署列表。
+
+    Returns:
+        list[Deployment]: 部署列表；环境变量未设置时为空列表
+
+    Raises:
+        ValueError: JSON 格式错误或缺少 deployment 字段
+    """
+    azure = get_settings().azure
+    raw = azure.deployments_json
+    if not raw:
+        return []
+    from langchain.chat_models import init_chat_model
+
+    try:
+        specs = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"AZURE_OPENAI_DEPLOYMENTS is not valid JSON: {e}") from e
+    deployments = []
+    for spec in specs:
+        if not isinstance(spec, dict) or not spec.get("deployment"):
+            raise ValueError(f"Each AZURE_OPENAI_DEPLOYMENTS entry needs a deployment name: {spec!r}")
+        llm = init_chat_model(
+            model=spec["deployment"],
+            model_provider="azure_openai",
+            azure_endpoint=spec.get("endpoint") or azure.endpoint,
+            api_key=spec.get("api_key") or azure.api_key,
+            api_version=spec.get("api_version") or azure.api_version,
+        )
+        deployments.append(
+            Deployment(
+                name=spec.get("name") or spec["deployment"],
+                llm=llm,
+                rpm=spec.get("rpm"),
+                tpm=spec.get("tpm"),
+            )
+        )
+    return deployments
@@ -0,0 +1,543 @@
+"""运行指标与追踪模块。
+
+为 draft / execute_tools / revise 节点和路由函数提供内置的插桩，按节点（以及按运行）记录：
+- wall time: 节点执行耗时
+- wait time: 同一运行中上一个节点结束到本节点开始之间的等待（调度、检查点写入等），
+  以及搜索查询在并发窗口中排队的时间
+- prompt/completion tokens: 来自模型返回的 usage_metadata
+- 搜索查询数、上游搜索请求数、搜索缓存命中数
+- payload bytes: 节点输出消息的内容和工具调用参数的字节数
+
+指标汇总在进程内的 MetricsRegistry 中，可以导出为 Prometheus 文本格式（可选 HTTP 端点），
+每个运行的节点明细（trace）可以导出为 JSON。运行通过 config["configurable"] 中的 run_id 或
+thread_id 区分，两者都没有时只汇总到注册表，不记录单个运行的 trace。
+
+插桩默认关闭，关闭时每个节点调用只多一次布尔判断，节点内部的 record() 只多一次
+ContextVar 读取。
+
+指标相关环境变量：
+- REFLEXION_METRICS_ENABLED: 是否启用插桩，默认为 false
+- REFLEXION_METRICS_MAX_TRACES: 内存中保留的最近运行 trace 数，默认为 1000
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from reflexion_agent.infra.settings import get_settings
+
+# 延迟直方图的默认桶边界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 指标说明，用于 Prometheus 的 HELP 行
+_HELP = {
+    "reflexion_node_calls_total": "Number of node executions.",
+    "reflexion_node_errors_total": "Number of node executions that raised.",
+    "reflexion_node_duration_seconds": "Node wall time.",
+    "reflexion_node_wait_seconds": "Time between the previous node of the same run finishing and this node starting.",
+    "reflexion_prompt_tokens_total": "Prompt tokens reported by the model.",
+    "reflexion_completion_tokens_total": "Completion tokens reported by the model.",
+    "reflexion_payload_bytes_total": "Bytes of message content and tool call arguments produced by nodes.",
+    "reflexion_search_queries_total": "Unique search queries executed by tool steps.",
+    "reflexion_search_requests_total": "Upstream search requests (after cache and single-flight).",
+    "reflexion_search_cache_hits_total": "Search cache hits.",
+    "reflexion_search_prefetched_total": "Search queries started speculatively while the draft was generating.",
+    "reflexion_search_prefetch_hits_total": "Tool-step queries served by an in-flight speculative search.",
+    "reflexion_llm_requests_total": "LLM requests per routed deployment by outcome (ok, error, retryable_error, breaker_open, cancelled).",
+    "reflexion_search_results_deduped_total": "Search results dropped because their URL was already returned in the run.",
+    "reflexion_search_queue_wait_seconds_total": "Time search queries spent waiting for a concurrency slot.",
+    "reflexion_answer_cache_lookups_total": "Semantic answer cache lookups by outcome (hit, miss).",
+    "reflexion_llm_pool_lookups_total": "Per-run LLM pool lookups by outcome (hit, miss).",
+    "reflexion_llm_pool_evictions_total": "LLM clients evicted from the pool, by reason (capacity, idle).",
+    "reflexion_rate_limit_wait_seconds": "Time requests spent queued by a client-side rate limiter, by limiter (llm, search).",
+    "reflexion_rate_limit_wait_seconds_total": "Time node requests spent queued by client-side rate limiters.",
+    "reflexion_rate_limited_total": "Requests that received a 429 response, by limiter.",
+    "reflexion_router_decisions_total": "Routing decisions by destination.",
+    "reflexion_router_duration_seconds": "Router function wall time, including the stopping policy.",
+    "reflexion_early_stops_total": "Reflexion loops ended early by the stopping policy, by reason.",
+}
+
+
+# None 表示尚未从配置（REFLEXION_METRICS_ENABLED）解析，见 metrics_enabled()
+_enabled: Optional[bool] = None
+
+
+def enable_metrics(enabled: bool = True) -> None:
+    """启用或关闭插桩。
+
+    Args:
+        enabled: 是否启用
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def metrics_enabled() -> bool:
+    """插桩当前是否启用。
+
+    第一次调用时从运行配置读取 REFLEXION_METRICS_ENABLED，之后以 enable_metrics() 的设置为准。
+    """
+    global _enabled
+    if _enabled is None:
+        _enabled = get_settings().metrics.enabled
+    return _enabled
+
+
+class _Histogram:
+    """Prometheus 风格的累积直方图。"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key: tuple, extra: Optional[tuple] = None) -> str:
+    items = list(label_key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class MetricsRegistry:
+    """进程内的指标注册表（计数器和直方图），所有操作由同一把锁保护。"""
+
+    def __init__(self):
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, _Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        """增加计数器。
+
+        Args:
+            name: 指标名
+            value: 增量
+            **labels: 标签
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """向直方图记录一个观测值。
+
+        Args:
+            name: 指标名
+            value: 观测值
+            **labels: 标签
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """导出所有指标的快照。
+
+        Returns:
+            dict: {"counters": {name: [{"labels", "value"}]}, "histograms": {name: [{"labels", "count", "sum", "buckets"}]}}
+        """
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(key),
+                            "count": h.count,
+                            "sum": h.sum,
+                            "buckets": dict(zip(h.buckets, h.counts)),
+                        }
+                        for key, h in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式（0.0.4）导出所有指标。
+
+        Returns:
+            str: Prometheus 文本
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in _HELP:
+                    lines.append(f"# HELP {name} {_HELP[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in _HELP:
+                    lines.append(f"# HELP {name} {_HELP[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    for bound, count in zip(h.buckets, h.counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', bound))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """清空所有指标。"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class NodeSpan:
+    """一次节点执行的记录。
+
+    节点内部通过 record() 累加的计数（搜索查询数、缓存命中等）保存在 counters 中；
+    搜索查询可能在线程池中执行，因此累加需要加锁。
+    """
+
+    __slots__ = ("node", "run_id", "started_at", "wall_seconds", "wait_seconds", "error", "counters", "_lock")
+
+    def __init__(self, node: str, run_id: Optional[str]):
+        self.node = node
+        self.run_id = run_id
+        self.started_at = time.time()
+        self.wall_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.error = False
+        self.counters: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            "node": self.node,
+            "started_at": self.started_at,
+            "wall_seconds": self.wall_seconds,
+            "wait_seconds": self.wait_seconds,
+            "error": self.error,
+            **self.counters,
+        }
+
+
+class TraceStore:
+    """保存最近若干个运行的节点明细。"""
+
+    def __init__(self, max_runs: Optional[int] = None):
+        # None 表示使用运行配置中的 REFLEXION_METRICS_MAX_TRACES（第一次记录时解析）
+        self.max_runs = max_runs
+        # run_id -> {"spans": [...], "last_end": 上一个节点结束的时间}
+        self._runs: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def wait_since_last(self, run_id: str, now: float) -> float:
+        """返回同一运行中上一个节点结束到 now 的时间，运行的第一个节点返回 0。"""
+        with self._lock:
+            run = self._runs.get(run_id)
+            return max(0.0, now - run["last_end"]) if run and run["last_end"] else 0.0
+
+    def add(self, span: NodeSpan, ended_at: float) -> None:
+        with self._lock:
+            run = self._runs.get(span.run_id)
+            if run is None:
+                run = self._runs[span.run_id] = {"spans": [], "last_end": 0.0}
+                if self.max_runs is None:
+                    self.max_runs = get_settings().metrics.max_traces
+                while len(self._runs) > self.max_runs:
+                    self._runs.popitem(last=False)
+            self._runs.move_to_end(span.run_id)
+            run["spans"].append(span.to_dict())
+            run["last_end"] = ended_at
+
+    def get(self, run_id: str) -> Optional[list[dict]]:
+        with self._lock:
+            run = self._runs.get(run_id)
+            return list(run["spans"]) if run else None
+
+    def dump(self) -> list[dict]:
+        with self._lock:
+            return [{"run_id": run_id, "spans": list(run["spans"])} for run_id, run in self._runs.items()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._runs.clear()
+
+
+_registry = MetricsRegistry()
+_traces = TraceStore()
+_current_span: contextvars.ContextVar[Optional[NodeSpan]] = contextvars.ContextVar(
+    "reflexion_current_span", default=None
+)
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取进程内的指标注册表。"""
+    return _registry
+
+
+def record(key: str, value: float = 1) -> None:
+    """在当前节点的记录上累加一个计数，插桩关闭或不在节点内时什么也不做。
+
+    计数会同时汇总到注册表的 reflexion_<key>_total 指标。
+
+    Args:
+        key: 计数名，例如 "search_cache_hits"
+        value: 增量
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.add(key, value)
+
+
+def _run_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    configurable = (config or {}).get("configurable") or {}
+    run_id = configurable.get("run_id") or configurable.get("thread_id")
+    return str(run_id) if run_id is not None else None
+
+
+def _message_stats(result: Any) -> dict:
+    """统计节点输出中的 token 用量和负载字节数。"""
+    stats = {"prompt_tokens": 0, "completion_tokens": 0, "payload_bytes": 0}
+    messages = result.get("messages") if isinstance(result, dict) else None
+    for message in messages or []:
+        content = getattr(message, "content", "")
+        if isinstance(content, str):
+            stats["payload_bytes"] += len(content.encode("utf-8"))
+        else:
+            stats["payload_bytes"] += len(json.dumps(content, ensure_ascii=False).encode("utf-8"))
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            stats["payload_bytes"] += len(json.dumps(tool_call["args"], ensure_ascii=False).encode("utf-8"))
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            stats["prompt_tokens"] += usage.get("input_tokens", 0)
+            stats["completion_tokens"] += usage.get("output_tokens", 0)
+    return stats
+
+
+def _start_span(node: str, config: Optional[RunnableConfig]) -> NodeSpan:
+    span = NodeSpan(node, _run_id(config))
+    if span.run_id is not None:
+        span.wait_seconds = _traces.wait_since_last(span.run_id, time.monotonic())
+    return span
+
+
+def _finish_span(span: NodeSpan, started: float, result: Any) -> None:
+    ended = time.monotonic()
+    span.wall_seconds = ended - started
+    for key, value in _message_stats(result).items():
+        if value:
+            span.add(key, value)
+
+    node = span.node
+    _registry.inc("reflexion_node_calls_total", node=node)
+    if span.error:
+        _registry.inc("reflexion_node_errors_total", node=node)
+    _registry.observe("reflexion_node_duration_seconds", span.wall_seconds, node=node)
+    if span.run_id is not None:
+        _registry.observe("reflexion_node_wait_seconds", span.wait_seconds, node=node)
+        _traces.add(span, ended)
+    for key, value in span.counters.items():
+        _registry.inc(f"reflexion_{key}_total", value, node=node)
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """为图节点函数添加插桩。
+
+    返回的包装函数总是接收 (state, config)，并按原函数的签名决定是否把 config 传下去；
+    插桩关闭时直接调用原函数。同步和异步节点都支持。
+
+    Args:
+        name: 节点名（用作指标标签）
+        fn: 节点函数
+
+    Returns:
+        Callable: 包装后的节点函数
+    """
+    takes_config = len(inspect.signature(fn).parameters) > 1
+    # 在构建图时解析一次开关，节点调用时只读取模块变量
+    metrics_enabled()
+
+    if inspect.iscoroutinefunction(fn):
+
+        async def async_wrapper(state: dict, config: RunnableConfig):
+            if not _enabled:
+                return await (fn(state, config) if takes_config else fn(state))
+            span = _start_span(name, config)
+            started = time.monotonic()
+            token = _current_span.set(span)
+            result = None
+            try:
+                result = await (fn(state, config) if takes_config else fn(state))
+                return result
+            except BaseException:
+                span.error = True
+                raise
+            finally:
+                _current_span.reset(token)
+                _finish_span(span, started, result)
+
+        wrapper = async_wrapper
+    else:
+
+        def sync_wrapper(state: dict, config: RunnableConfig):
+            if not _enabled:
+                return fn(state, config) if takes_config else fn(state)
+            span = _start_span(name, config)
+            started = time.monotonic()
+            token = _current_span.set(span)
+            result = None
+            try:
+                result = fn(state, config) if takes_config else fn(state)
+                return result
+            except BaseException:
+                span.error = True
+                raise
+            finally:
+                _current_span.reset(token)
+                _finish_span(span, started, result)
+
+        wrapper = sync_wrapper
+
+    # 不设置 __wrapped__：LangGraph 按包装函数自身的签名传入 config
+    wrapper.__name__ = getattr(fn, "__name__", name)
+    wrapper.__qualname__ = getattr(fn, "__qualname__", name)
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+def instrument_router(fn: Callable[[dict], str], name: Optional[str] = None) -> Callable[[dict], str]:
+    """为路由函数添加插桩，按目标节点统计路由决策次数，并记录路由函数的耗时。
+
+    与 instrument_node 相同，插桩关闭时直接调用原函数。路由函数中的停止策略等逻辑
+    每一轮都会执行，耗时记录为直方图 reflexion_router_duration_seconds{router}。
+
+    Args:
+        fn: 路由函数
+        name: 路由名（用作指标标签），默认为函数名
+
+    Returns:
+        Callable: 包装后的路由函数
+    """
+    router_name = name or getattr(fn, "__name__", "router")
+    # 在构建图时解析一次开关，路由调用时只读取模块变量
+    metrics_enabled()
+
+    @functools.wraps(fn)
+    def router(state: dict) -> str:
+        if not _enabled:
+            return fn(state)
+        started = time.monotonic()
+        try:
+            destination = fn(state)
+        finally:
+            _registry.observe("reflexion_router_duration_seconds", time.monotonic() - started, router=router_name)
+        _registry.inc("reflexion_router_decisions_total", destination=str(destination))
+        return destination
+
+    return router
+
+
+def get_run_trace(run_id: str) -> Optional[list[dict]]:
+    """获取某个运行的节点明细。
+
+    Args:
+        run_id: config["configurable"] 中的 run_id 或 thread_id
+
+    Returns:
+        Optional[list[dict]]: 按执行顺序排列的节点记录，运行不存在时返回 None
+    """
+    return _traces.get(str(run_id))
+
+
+def dump_traces(path: Optional[str] = None) -> list[dict]:
+    """导出最近运行的节点明细，可选写入 JSON 文件。
+
+    Args:
+        path: JSON 文件路径，为 None 时只返回数据
+
+    Returns:
+        list[dict]: [{"run_id": ..., "spans": [...]}, ...]
+    """
+    traces = _traces.dump()
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(traces, f, ensure_ascii=False, indent=2)
+    return traces
+
+
+def reset_metrics() -> None:
+    """清空注册表中的指标和保存的运行明细。"""
+    _registry.reset()
+    _traces.clear()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """提供 /metrics（Prometheus 文本）和 /traces（JSON）的 HTTP 处理器。"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body = _registry.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?")[0] == "/traces":
+            body = json.dumps(_traces.dump(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不在标准错误输出中打印每次抓取
+        pass
+
+
+def start_metrics_server(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """在后台线程中启动指标 HTTP 端点，同时启用插桩。
+
+    Args:
+        port: 监听端口，传入 0 时由系统分配
+        host: 监听地址
+
+    Returns:
+        ThreadingHTTPServer: 服务器实例，调用 shutdown() 停止
+    """
+    enable_metrics(True)
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="reflexion-metrics", daemon=True)
+    thread.start()
+    return server
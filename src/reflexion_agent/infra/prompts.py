@@ -1,15 +1,57 @@
 """提示模板模块。
 
 本模块定义了用于 Reflexion Agent 的提示模板，
-包括通用的演员提示模板和修订指令。
+包括通用的演员提示模板和修订指令，以及检查提示前缀稳定性的辅助函数。
 """
 
 import datetime
+import os
+import time
+from typing import Optional
 
+from langchain_core.messages import BaseMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+from reflexion_agent.infra.settings import get_settings
 
-def create_actor_prompt_template() -> ChatPromptTemplate:
+# 提示模板布局
+# - legacy: 原始布局，当前时间（微秒精度）位于系统提示的第二行
+# - cache_friendly: 静态指令放在最前面且逐字节不变，易变字段（当前时间）移到末尾，
+#   时间按粒度取整，使提供方的提示前缀缓存（prompt prefix caching）能够命中
+LAYOUT_LEGACY = "legacy"
+LAYOUT_CACHE_FRIENDLY = "cache_friendly"
+
+# 静态指令：cache_friendly 布局中位于提示最前面，不包含任何易变字段
+_STATIC_INSTRUCTIONS = """You are expert researcher.
+
+1. {first_instruction}
+2. Reflect and critique your answer. Be severe to maximize improvement.
+3. Recommend search queries to research information and improve your answer."""
+
+# 格式要求提示
+_FORMAT_INSTRUCTION = "Answer the user's question above using the required format."
+
+
+def rounded_now(granularity_seconds: int) -> str:
+    """返回按粒度向下取整后的当前时间（ISO 格式，精确到秒）。
+    
+    同一粒度窗口内的所有调用得到完全相同的时间字符串。
+    
+    Args:
+        granularity_seconds: 取整粒度（秒），例如 3600 表示按小时取整
+        
+    Returns:
+        str: 取整后的时间字符串
+    """
+    granularity_seconds = max(1, granularity_seconds)
+    timestamp = int(time.time()) // granularity_seconds * granularity_seconds
+    return datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")
+
+
+def create_actor_prompt_template(
+    layout: Optional[str] = None,
+    time_granularity: Optional[int] = None,
+) -> ChatPromptTemplate:
     """创建通用的演员提示模板。
     
     这个模板用于指导 LLM 作为专家研究员工作，包括：
@@ -17,33 +59,117 @@ def create_actor_prompt_template() -> ChatPromptTemplate:
     - 消息历史占位符
     - 格式要求
     
+    Args:
+        layout: 提示布局，"cache_friendly"（默认）或 "legacy"。
+            未指定时读取环境变量 REFLEXION_PROMPT_LAYOUT。
+        time_granularity: cache_friendly 布局中当前时间的取整粒度（秒）。
+            未指定时读取环境变量 REFLEXION_TIME_GRANULARITY，默认为 3600。
+    
     Returns:
         ChatPromptTemplate: 配置好的提示模板
+        
+    Raises:
+        ValueError: 如果 layout 不是支持的布局。
     """
-    template = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """You are expert researcher.
+    settings = get_settings().prompts
+    layout = layout or settings.layout
+    
+    if layout == LAYOUT_LEGACY:
+        template = ChatPromptTemplate.from_messages(
+            [
+                (
+                    "system",
+                    """You are expert researcher.
 Current time: {time}
 
 1. {first_instruction}
 2. Reflect and critique your answer. Be severe to maximize improvement.
 3. Recommend search queries to research information and improve your answer.""",
-            ),
+                ),
+                # 消息历史占位符，用于插入对话历史
+                MessagesPlaceholder(variable_name="messages"),
+                # 格式要求提示
+                ("system", _FORMAT_INSTRUCTION),
+            ]
+        ).partial(
+            # 动态注入当前时间
+            time=lambda: datetime.datetime.now().isoformat(),
+        )
+        return template
+    
+    if layout != LAYOUT_CACHE_FRIENDLY:
+        raise ValueError(
+            f"Unknown prompt layout: {layout!r}. Expected {LAYOUT_CACHE_FRIENDLY!r} or {LAYOUT_LEGACY!r}."
+        )
+    
+    if time_granularity is None:
+        time_granularity = settings.time_granularity
+    
+    template = ChatPromptTemplate.from_messages(
+        [
+            # 静态指令放在最前面，同一条链的每次调用都逐字节相同
+            ("system", _STATIC_INSTRUCTIONS),
             # 消息历史占位符，用于插入对话历史
             MessagesPlaceholder(variable_name="messages"),
-            # 格式要求提示
-            ("system", "Answer the user's question above using the required format."),
+            # 格式要求和易变的当前时间放在末尾
+            ("system", _FORMAT_INSTRUCTION + "\nCurrent time: {time}"),
         ]
     ).partial(
-        # 动态注入当前时间
-        time=lambda: datetime.datetime.now().isoformat(),
+        # 动态注入按粒度取整后的当前时间
+        time=lambda: rounded_now(time_granularity),
     )
     
     return template
 
 
+def _serialize_messages(messages: list[BaseMessage]) -> str:
+    """将渲染后的消息序列化为字符串，近似提供方看到的请求前缀。"""
+    return "".join(f"<{message.type}>{message.content}</{message.type}>" for message in messages)
+
+
+def check_prefix_stability(
+    template: ChatPromptTemplate,
+    calls: int = 3,
+    interval: float = 0.0,
+    **variables,
+) -> int:
+    """检查提示模板在多次调用之间的前缀稳定性。
+    
+    多次渲染同一个模板（同样的输入），计算所有渲染结果的公共前缀，并检查
+    公共前缀完整覆盖第一条消息（静态指令），即提供方的前缀缓存可以命中。
+    可在测试中直接调用，也可用于排查缓存命中率下降的问题。
+    
+    Args:
+        template: 要检查的提示模板
+        calls: 渲染次数
+        interval: 每次渲染之间的间隔（秒），用于覆盖时间变化的情况
+        **variables: 渲染模板所需的变量，例如 messages、first_instruction
+        
+    Returns:
+        int: 公共前缀的字符数
+        
+    Raises:
+        AssertionError: 如果第一条消息在多次调用之间不稳定。
+    """
+    rendered = []
+    first_message = None
+    for i in range(calls):
+        if i and interval:
+            time.sleep(interval)
+        messages = template.format_messages(**variables)
+        first_message = _serialize_messages(messages[:1])
+        rendered.append(_serialize_messages(messages))
+    
+    prefix = os.path.commonprefix(rendered)
+    # 显式抛出而不是使用 assert 语句，python -O 下检查同样生效
+    if len(prefix) < len(first_message):
+        raise AssertionError(
+            f"Prompt prefix is not stable across calls: common prefix covers {len(prefix)} chars, "
+            f"static instructions need {len(first_message)} chars."
+        )
+    return len(prefix)
+
+
 # 修订指令：指导 LLM 如何基于新信息和批评修订答案
 REVISE_INSTRUCTIONS = """Revise your previous answer using the new information.
     - You should use the previous critique to add important information to your answer.
@@ -0,0 +1,434 @@
+"""客户端限流与自适应并发模块。
+
+大量运行并发时，LLM（Azure OpenAI）和 Tavily 都会返回 429，随后的重试风暴进一步放大负载。
+本模块在客户端主动限流，LLM 调用（draft / revise 链）和上游搜索请求各自共享一个 RateLimiter：
+- 令牌桶：请求数（每分钟）和 token 数（每分钟）两个维度，允许短时突发（每分钟额度的十分之一）。
+  token 在请求开始时按估算预留，完成后按实际用量修正
+- 自适应并发（AIMD）：同时进行的请求数上限每次成功加 1/上限（每个并发窗口约加 1），
+  遇到 429 或延迟超过目标时乘以 backoff（默认减半，每秒最多减一次）
+- 排队等待时间记录为直方图 reflexion_rate_limit_wait_seconds{limiter}，
+  并计入当前节点的 rate_limit_wait_seconds 计数器（见 infra.metrics）
+
+未配置任何限制时 get_rate_limiter 返回 None，调用路径上没有额外开销。
+
+限流相关环境变量（KIND 为 LLM 或 SEARCH）：
+- {KIND}_RATE_LIMIT_RPM: 每分钟请求数上限
+- {KIND}_RATE_LIMIT_TPM: 每分钟 token 数上限（只对 LLM 有意义）
+- {KIND}_MAX_INFLIGHT: 自适应并发的上限（同时也是初始值），设置后启用 AIMD
+- {KIND}_MIN_INFLIGHT: 自适应并发的下限，默认为 1
+- {KIND}_LATENCY_TARGET: 延迟目标（秒），超过时按 429 同样处理，默认不启用
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+from langchain_core.messages import BaseMessage
+
+from reflexion_agent.infra.compaction import count_message_tokens
+from reflexion_agent.infra.metrics import get_metrics_registry, metrics_enabled, record
+from reflexion_agent.infra.settings import get_settings
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """提取异常中的 HTTP 状态码（openai / httpx 异常都带有 status_code 或 response.status_code）。"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def usage_tokens(result) -> Optional[int]:
+    """从消息（或消息列表）的 usage_metadata 读取实际 token 数，没有用量信息时返回 None。"""
+    messages = result if isinstance(result, list) else [result]
+    total = 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            total += usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    return total or None
+
+
+class TokenBucket:
+    """允许透支的令牌桶。
+
+    reserve 立即扣除令牌并返回需要等待的时间，余额为负时按到达顺序排队，
+    单次请求超过桶容量也不会永远阻塞。
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """初始化令牌桶。
+
+        Args:
+            per_minute: 每分钟补充的令牌数
+            capacity: 桶容量（允许的突发量），默认为每分钟额度的十分之一
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, per_minute / 10.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """预留令牌。
+
+        Args:
+            amount: 令牌数
+
+        Returns:
+            float: 需要等待的秒数，0 表示可以立即执行
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """修正已经预留的令牌数（正数表示多用，负数表示归还）。"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    """在等待者所属的事件循环中唤醒它（已经被取消的等待者忽略）。"""
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveConcurrency:
+    """AIMD 自适应并发上限。
+
+    同步调用方在 threading.Condition 上等待；异步调用方各自在所属事件循环上创建一个 future
+    排队，release 释放槽位时通过 call_soon_threadsafe 唤醒与空闲槽位数相同的等待者，
+    不需要轮询。
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        backoff: float = 0.5,
+        latency_target: Optional[float] = None,
+        decrease_interval: float = 1.0,
+    ):
+        """初始化并发上限。
+
+        Args:
+            max_limit: 上限的最大值（也是初始值）
+            min_limit: 上限的最小值
+            backoff: 每次减小时乘以的系数
+            latency_target: 延迟目标（秒），超过时减小上限
+            decrease_interval: 两次减小之间的最短间隔（秒），避免一批同时失败的请求把上限压到最低
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.backoff = backoff
+        self.latency_target = latency_target
+        self.decrease_interval = decrease_interval
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        # 异步等待者：(事件循环, future)，按到达顺序唤醒
+        self._waiters: deque = deque()
+
+    def try_acquire(self) -> bool:
+        """不阻塞地尝试占用一个并发槽位。"""
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        """占用一个并发槽位，必要时阻塞等待。"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        """占用一个并发槽位（异步版本，等待期间不阻塞事件循环）。
+
+        没有空闲槽位时排队等待 release 唤醒。被唤醒后重新竞争槽位，没有抢到时重新排队。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                # 检查和排队在同一把锁内完成，不会错过两者之间的 release
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            except BaseException:
+                with self._cond:
+                    try:
+                        self._waiters.remove((loop, waiter))
+                    except ValueError:
+                        # 已经被唤醒：把这次唤醒转交给下一个等待者
+                        self._wake_waiters()
+                raise
+
+    def _wake_waiters(self) -> None:
+        """按空闲槽位数唤醒异步等待者（调用方需持有锁）。"""
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            loop, waiter = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # 事件循环已经关闭，等待者不会再运行
+                continue
+            free -= 1
+
+    def release(self, latency: float, rate_limited: bool) -> None:
+        """释放槽位并按结果调整上限。
+
+        Args:
+            latency: 请求耗时（秒）
+            rate_limited: 是否收到了 429
+        """
+        with self._cond:
+            self.in_flight -= 1
+            overloaded = rate_limited or (
+                self.latency_target is not None and latency > self.latency_target
+            )
+            now = time.monotonic()
+            if overloaded:
+                if now - self._last_decrease >= self.decrease_interval:
+                    self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+            self._wake_waiters()
+
+
+class Permit:
+    """一次限流许可：请求完成后可修正 token 用量或标记收到了 429。"""
+
+    def __init__(self, tokens: float = 0):
+        self.tokens = tokens
+        self.actual_tokens: Optional[float] = None
+        self.rate_limited = False
+
+    def set_tokens(self, tokens: Optional[float]) -> None:
+        """记录实际 token 用量（None 表示沿用估算值）。"""
+        if tokens is not None:
+            self.actual_tokens = tokens
+
+    def mark_rate_limited(self) -> None:
+        """标记本次请求收到了 429（用于以返回值而不是异常报告错误的客户端）。"""
+        self.rate_limited = True
+
+
+class RateLimiter:
+    """请求数 / token 数令牌桶 + AIMD 自适应并发。"""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+    ):
+        """初始化限流器。
+
+        Args:
+            name: 名称，用于指标标签
+            requests_per_minute: 每分钟请求数上限，None 表示不限制
+            tokens_per_minute: 每分钟 token 数上限，None 表示不限制
+            concurrency: 自适应并发上限，None 表示不限制并发
+        """
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = concurrency
+        self._rate_limited = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        wait = self.requests.reserve(1) if self.requests is not None else 0.0
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def _record_wait(self, wait: float) -> None:
+        record("rate_limit_wait_seconds", wait)
+        if metrics_enabled():
+            get_metrics_registry().observe("reflexion_rate_limit_wait_seconds", wait, limiter=self.name)
+
+    def _finish(self, permit: Permit, started: float, error: Optional[BaseException]) -> None:
+        if error is not None and error_status(error) == 429:
+            permit.rate_limited = True
+        if self.tokens is not None and permit.actual_tokens is not None:
+            self.tokens.adjust(permit.actual_tokens - permit.tokens)
+        if self.concurrency is not None:
+            self.concurrency.release(time.monotonic() - started, permit.rate_limited)
+        if permit.rate_limited:
+            with self._lock:
+                self._rate_limited += 1
+            if metrics_enabled():
+                get_metrics_registry().inc("reflexion_rate_limited_total", limiter=self.name)
+
+    @contextmanager
+    def limit(self, tokens: float = 0) -> Iterator[Permit]:
+        """在限流许可内执行一个请求。
+
+        Args:
+            tokens: 预计使用的 token 数
+
+        Yields:
+            Permit: 本次请求的许可
+        """
+        queued_at = time.monotonic()
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        if self.concurrency is not None:
+            self.concurrency.acquire()
+        started = time.monotonic()
+        self._record_wait(started - queued_at)
+        permit = Permit(tokens)
+        try:
+            yield permit
+        except BaseException as e:
+            self._finish(permit, started, e)
+            raise
+        self._finish(permit, started, None)
+
+    @asynccontextmanager
+    async def alimit(self, tokens: float = 0) -> AsyncIterator[Permit]:
+        """limit 的异步版本。"""
+        queued_at = time.monotonic()
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+        if self.concurrency is not None:
+            await self.concurrency.aacquire()
+        started = time.monotonic()
+        self._record_wait(started - queued_at)
+        permit = Permit(tokens)
+        try:
+            yield permit
+        except BaseException as e:
+            self._finish(permit, started, e)
+            raise
+        self._finish(permit, started, None)
+
+    def stats(self) -> dict:
+        """限流器状态快照：当前并发上限、进行中的请求数和收到的 429 次数。"""
+        return {
+            "name": self.name,
+            "concurrency_limit": self.concurrency.limit if self.concurrency else None,
+            "in_flight": self.concurrency.in_flight if self.concurrency else None,
+            "rate_limited": self._rate_limited,
+        }
+
+
+def _limiter_from_env(kind: str) -> Optional[RateLimiter]:
+    """根据运行配置中的 {KIND}_* 限流设置创建限流器，没有配置任何限制时返回 None。"""
+    settings = get_settings().rate_limit(kind)
+    if not settings.enabled:
+        return None
+    concurrency = None
+    if settings.max_inflight:
+        concurrency = AdaptiveConcurrency(
+            max_limit=settings.max_inflight,
+            min_limit=settings.min_inflight,
+            latency_target=settings.latency_target,
+        )
+    return RateLimiter(
+        kind, settings.requests_per_minute or None, settings.tokens_per_minute or None, concurrency
+    )
+
+
+# 全局限流器：kind（"llm" / "search"）-> 限流器或 None（延迟初始化）。未配置限制时缓存的 None
+# 表示不限流，按 kind 分别解析，因此不使用 LazySingleton（它不缓存 None），而是在同一把锁内双重检查
+_limiters: dict[str, Optional[RateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(kind: str) -> Optional[RateLimiter]:
+    """获取全局限流器（单例模式），根据环境变量创建。
+
+    Args:
+        kind: "llm" 或 "search"
+
+    Returns:
+        Optional[RateLimiter]: 限流器，未配置任何限制时为 None
+    """
+    if kind not in _limiters:
+        with _limiters_lock:
+            if kind not in _limiters:
+                _limiters[kind] = _limiter_from_env(kind)
+    return _limiters[kind]
+
+
+def set_rate_limiter(kind: str, limiter: Optional[RateLimiter]) -> None:
+    """替换全局限流器。
+
+    Args:
+        kind: "llm" 或 "search"
+        limiter: 新的限流器；传入 None 表示不限流
+    """
+    with _limiters_lock:
+        _limiters[kind] = limiter
+
+
+def rate_limited(kind: str, tokens: float = 0):
+    """获取限流上下文管理器，没有限流器时返回空操作。
+
+    用法：
+        with rate_limited("search") as permit:
+            result = client.search(query)
+    """
+    limiter = get_rate_limiter(kind)
+    return limiter.limit(tokens) if limiter is not None else nullcontext(Permit(tokens))
+
+
+def arate_limited(kind: str, tokens: float = 0):
+    """rate_limited 的异步版本（async with）。"""
+    limiter = get_rate_limiter(kind)
+    return limiter.alimit(tokens) if limiter is not None else _anull(Permit(tokens))
+
+
+@asynccontextmanager
+async def _anull(permit: Permit) -> AsyncIterator[Permit]:
+    yield permit
+
+
+def call_llm_limited(fn: Callable[[], Any], messages: list[BaseMessage]) -> Any:
+    """在 LLM 限流器的许可内执行一次链调用，按 usage_metadata 修正 token 用量。
+
+    Args:
+        fn: 无参函数，返回模型消息
+        messages: 发送给模型的消息，用于估算 token
+
+    Returns:
+        Any: fn 的返回值
+    """
+    if get_rate_limiter("llm") is None:
+        return fn()
+    with rate_limited("llm", count_message_tokens(messages)) as permit:
+        result = fn()
+        permit.set_tokens(usage_tokens(result))
+        return result
+
+
+async def acall_llm_limited(fn: Callable[[], Awaitable[Any]], messages: list[BaseMessage]) -> Any:
+    """call_llm_limited 的异步版本。"""
+    if get_rate_limiter("llm") is None:
+        return await fn()
+    async with arate_limited("llm", count_message_tokens(messages)) as permit:
+        result = await fn()
+        permit.set_tokens(usage_tokens(result))
+        return result
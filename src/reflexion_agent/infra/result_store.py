@@ -0,0 +1,322 @@
+"""搜索结果整形与内容寻址存储模块。
+
+Tavily 每个查询返回 5 条带完整正文和评分的结果，每轮最多 3 个查询。原样序列化进 ToolMessage
+时，这些结果会留在状态中、写入检查点，并在之后的每一轮重新发送给 LLM。
+工具步骤在生成 ToolMessage 之前先经过整形阶段（ResultShaper）：
+- 按 URL 去重：同一步骤内的多个查询之间、以及与之前轮次已经返回过的结果之间
+- 正文按可配置的字符数 / token 数上限截断为摘要片段
+- 完整结果写入内容寻址的存储（ResultStore，键为规范化 JSON 的 SHA-256），
+  状态中只保留 {"url", "title", "score", "content"（片段）, "ref"}
+
+需要完整正文时通过 get_result_store().get(ref) 取回。存储与搜索缓存一样分为内存 LRU 层
+和可选的 SQLite 磁盘层；只启用内存层时，被淘汰的条目无法再取回。
+
+整形相关环境变量：
+- REFLEXION_RESULT_SHAPING_ENABLED: 是否默认启用结果整形，默认为 true
+- REFLEXION_RESULT_CONTENT_CHARS: 每条结果保留的最大字符数，默认为 800
+- REFLEXION_RESULT_CONTENT_TOKENS: 每条结果保留的最大 token 数，默认为 0（不限制）
+- RESULT_STORE_MAX_ENTRIES: 存储内存层最大条目数，默认为 4096
+- RESULT_STORE_PATH: 存储的 SQLite 文件路径，未设置时只使用内存层
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from reflexion_agent.infra.compaction import truncate_tokens
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleton import LazySingleton
+
+# 结果整形器：接收每个查询的结果（结果列表或错误字符串）和已经出现过的 URL 集合，返回整形后的结果
+Shaper = Callable[[list, set], list]
+
+
+def content_ref(payload) -> str:
+    """计算内容寻址的引用：规范化 JSON 的 SHA-256（前 32 位十六进制）。
+
+    Args:
+        payload: 可 JSON 序列化的内容
+
+    Returns:
+        str: 形如 "sha256:<hex>" 的引用
+    """
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return "sha256:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class ResultStore:
+    """内容寻址的搜索结果存储（内存 LRU + 可选 SQLite）。
+
+    相同内容总是得到相同的引用，重复写入不会产生新的条目。
+    所有操作都由同一把锁保护，可以在多个线程之间共享。
+    """
+
+    def __init__(self, max_entries: int = 4096, db_path: Optional[str] = None):
+        """初始化存储。
+
+        Args:
+            max_entries: 内存层最大条目数
+            db_path: SQLite 文件路径。为 None 时只使用内存层。
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+        # 内存层：ref -> 内容，OrderedDict 的顺序即 LRU 顺序
+        self._memory: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            # 连接在多个线程间共享，访问由 self._lock 串行化
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_blobs (ref TEXT PRIMARY KEY, payload TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+    def put(self, payload) -> str:
+        """写入内容。
+
+        Args:
+            payload: 可 JSON 序列化的内容
+
+        Returns:
+            str: 内容的引用
+        """
+        ref = content_ref(payload)
+        with self._lock:
+            if ref in self._memory:
+                self._memory.move_to_end(ref)
+                return ref
+            self._put_memory(ref, payload)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO result_blobs (ref, payload) VALUES (?, ?)",
+                    (ref, json.dumps(payload, ensure_ascii=False)),
+                )
+                self._conn.commit()
+        return ref
+
+    def get(self, ref: str):
+        """按引用取回内容。
+
+        Args:
+            ref: put 返回的引用
+
+        Returns:
+            内容；不存在（或已从内存层淘汰且没有磁盘层）时返回 None
+        """
+        with self._lock:
+            if ref in self._memory:
+                self._memory.move_to_end(ref)
+                return self._memory[ref]
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT payload FROM result_blobs WHERE ref = ?", (ref,)
+                ).fetchone()
+                if row is not None:
+                    payload = json.loads(row[0])
+                    self._put_memory(ref, payload)
+                    return payload
+        return None
+
+    def _put_memory(self, ref: str, payload) -> None:
+        """写入内存层并按 LRU 淘汰超出容量的条目（调用方需持有锁）。"""
+        self._memory[ref] = payload
+        self._memory.move_to_end(ref)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层。"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM result_blobs")
+                self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory)
+
+
+def _create_result_store() -> ResultStore:
+    settings = get_settings().results
+    return ResultStore(max_entries=settings.store_max_entries, db_path=settings.store_path)
+
+
+# 全局结果存储实例（延迟初始化）
+_result_store = LazySingleton(_create_result_store, name="result_store")
+
+
+def get_result_store() -> ResultStore:
+    """获取全局结果存储（单例模式），根据环境变量创建。
+
+    Returns:
+        ResultStore: 全局结果存储实例
+    """
+    return _result_store.get()
+
+
+def set_result_store(store: Optional[ResultStore]) -> None:
+    """替换全局结果存储。
+
+    传入 None 时清除当前存储，下次调用 get_result_store() 时会根据环境变量重新创建。
+
+    Args:
+        store: 新的结果存储实例，或 None
+    """
+    _result_store.set(store)
+
+
+class ResultShaper:
+    """默认的搜索结果整形器。
+
+    对每个查询的结果列表：丢弃 URL 已经出现过的结果，完整结果写入结果存储，
+    只保留 url、title、score、截断后的 content 和 ref。错误字符串原样保留。
+    """
+
+    def __init__(
+        self,
+        content_chars: int = 800,
+        content_tokens: int = 0,
+        store: Optional[ResultStore] = None,
+    ):
+        """初始化整形器。
+
+        Args:
+            content_chars: 每条结果保留的最大字符数
+            content_tokens: 每条结果保留的最大 token 数，0 表示不限制
+            store: 结果存储，为 None 时使用全局存储
+        """
+        self.content_chars = content_chars
+        self.content_tokens = content_tokens
+        self.store = store
+
+    def _snippet(self, content: str) -> str:
+        snippet = content[: self.content_chars]
+        if self.content_tokens:
+            snippet = truncate_tokens(snippet, self.content_tokens)
+        return snippet
+
+    def __call__(self, per_query: list, seen_urls: set) -> list:
+        """整形一个工具调用的搜索结果。
+
+        Args:
+            per_query: 每个查询的结果（结果列表或错误字符串）
+            seen_urls: 已经出现过的 URL，会被更新
+
+        Returns:
+            list: 整形后的结果，结构与输入相同
+        """
+        store = self.store if self.store is not None else get_result_store()
+        shaped = []
+        for results in per_query:
+            if not isinstance(results, list):
+                shaped.append(results)
+                continue
+            compact = []
+            for result in results:
+                if not isinstance(result, dict):
+                    continue
+                url = result.get("url")
+                if url in seen_urls:
+                    continue
+                if url:
+                    seen_urls.add(url)
+                compact.append(
+                    {
+                        "url": url,
+                        "title": result.get("title"),
+                        "score": result.get("score"),
+                        "content": self._snippet(result.get("content") or ""),
+                        "ref": store.put(result),
+                    }
+                )
+            shaped.append(compact)
+        return shaped
+
+
+def track_result_urls(left: Optional[frozenset], right: Optional[Iterable[str]]) -> frozenset:
+    """result_urls 的 reducer：把本步骤新返回的结果 URL 合并到已经出现过的集合中。
+
+    工具步骤只写入本步骤新增的 URL，下一步骤直接读取合并后的集合，
+    不必重新解析消息历史中的每一条 ToolMessage。
+
+    Args:
+        left: 之前步骤已经返回过的 URL
+        right: 本步骤新返回的 URL
+
+    Returns:
+        frozenset: 合并后的 URL 集合
+    """
+    left = left or frozenset()
+    if not right:
+        return left
+    return left | frozenset(right)
+
+
+def seen_result_urls(messages: Iterable[BaseMessage]) -> set:
+    """收集之前轮次的 ToolMessage 中已经返回过的结果 URL。
+
+    状态中没有 result_urls（例如在只有 messages 的自定义图中使用）时的回退实现。
+
+    Args:
+        messages: 消息历史
+
+    Returns:
+        set: URL 集合
+    """
+    urls = set()
+    for message in messages:
+        if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+            continue
+        try:
+            per_query = json.loads(message.content)
+        except ValueError:
+            continue
+        for results in per_query if isinstance(per_query, list) else []:
+            for result in results if isinstance(results, list) else []:
+                if isinstance(result, dict) and result.get("url"):
+                    urls.add(result["url"])
+    return urls
+
+
+def _create_default_result_shaper() -> Shaper:
+    settings = get_settings().results
+    return ResultShaper(content_chars=settings.content_chars, content_tokens=settings.content_tokens)
+
+
+# 全局默认整形器（延迟初始化）
+_default_shaper = LazySingleton(_create_default_result_shaper, name="result_shaper")
+
+
+def get_default_result_shaper() -> Optional[Shaper]:
+    """获取默认的搜索结果整形器。
+
+    根据环境变量创建 ResultShaper；如果 REFLEXION_RESULT_SHAPING_ENABLED 为 false，返回 None。
+
+    Returns:
+        Optional[Shaper]: 默认整形器，未启用时为 None
+    """
+    shaper = _default_shaper.peek()
+    if shaper is None and get_settings().results.shaping_enabled:
+        shaper = _default_shaper.get()
+    return shaper
+
+
+def set_default_result_shaper(shaper: Optional[Shaper]) -> None:
+    """替换默认的搜索结果整形器。
+
+    传入 None 时清除当前整形器，下次调用 get_default_result_shaper() 时会根据环境变量重新创建。
+
+    Args:
+        shaper: 任意符合 Shaper 签名的可调用对象，或 None
+    """
+    _default_shaper.set(shaper)
@@ -0,0 +1,265 @@
+"""Tavily 搜索客户端模块。
+
+本模块提供进程级共享的 Tavily 搜索客户端，替代每次搜索都重新构建
+TavilySearchAPIWrapper / TavilySearchResults 的做法：
+- 同步请求共享一个带连接池的 httpx.Client（线程安全）
+- 异步请求为每个事件循环维护一个带连接池的 httpx.AsyncClient
+- 连接保持 keep-alive，连接数上限可通过环境变量配置
+
+连接池相关环境变量（通过 infra.settings 读取）：
+- TAVILY_MAX_CONNECTIONS: 每个连接池（即每个主机）的最大连接数，默认为 20
+- TAVILY_MAX_KEEPALIVE_CONNECTIONS: 最大空闲 keep-alive 连接数，默认为 10
+- TAVILY_KEEPALIVE_EXPIRY: 空闲连接保活时间（秒），默认为 30
+- TAVILY_TIMEOUT: 单次请求超时时间（秒），默认为 30
+"""
+
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+
+import httpx
+
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleton import LazySingleton
+
+# Tavily 搜索 API 地址
+TAVILY_API_URL = "https://api.tavily.com"
+
+# 搜索结果：成功时为结果字典列表，失败时为错误描述字符串（与 TavilySearchResults 保持一致）
+SearchResult = Union[list[dict], str]
+
+
+class TavilySearchClient:
+    """可在线程和异步任务之间共享的 Tavily 搜索客户端。
+
+    所有请求复用同一个连接池，避免每次搜索都重新建立 HTTP 会话和 TLS 握手。
+    由于只访问 api.tavily.com 一个主机，连接数上限即为每主机连接数上限。
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_results: int = 5,
+        search_depth: str = "advanced",
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ):
+        """初始化搜索客户端。
+
+        Args:
+            api_key: Tavily API 密钥。如果未提供，从环境变量 TAVILY_API_KEY 读取。
+            max_results: 每个查询默认返回的最大结果数，默认为 5
+            search_depth: 搜索深度，"basic" 或 "advanced"
+            max_connections: 每主机最大连接数，默认读取 TAVILY_MAX_CONNECTIONS
+            max_keepalive_connections: 最大空闲连接数，默认读取 TAVILY_MAX_KEEPALIVE_CONNECTIONS
+            keepalive_expiry: 空闲连接保活时间（秒），默认读取 TAVILY_KEEPALIVE_EXPIRY
+            timeout: 请求超时时间（秒），默认读取 TAVILY_TIMEOUT
+
+        Raises:
+            ValueError: 如果缺少 Tavily API 密钥。
+        """
+        tavily = get_settings().tavily
+        api_key = api_key or tavily.api_key
+        if not api_key:
+            raise ValueError(
+                "Tavily API key not found. Please set TAVILY_API_KEY environment variable or pass api_key parameter."
+            )
+        self._api_key = api_key
+        self.max_results = max_results
+        self.search_depth = search_depth
+        self.max_connections = max_connections or tavily.max_connections
+        self._limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=max_keepalive_connections or tavily.max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry or tavily.keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(timeout or tavily.timeout)
+
+        # 同步客户端：httpx.Client 是线程安全的，所有线程共享同一个连接池
+        self._client = httpx.Client(
+            base_url=TAVILY_API_URL, limits=self._limits, timeout=self._timeout
+        )
+        # 异步客户端：httpx.AsyncClient 绑定到创建它的事件循环，因此按事件循环分别缓存
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _payload(self, query: str, max_results: Optional[int]) -> dict:
+        """构建 Tavily 搜索请求体。"""
+        return {
+            "api_key": self._api_key,
+            "query": query,
+            "max_results": max_results or self.max_results,
+            "search_depth": self.search_depth,
+            "include_answer": False,
+            "include_raw_content": False,
+            "include_images": False,
+        }
+
+    @staticmethod
+    def _clean_results(raw_results: dict) -> list[dict]:
+        """提取结果中的关键字段（与 TavilySearchAPIWrapper.clean_results 保持一致）。"""
+        return [
+            {
+                "title": result.get("title"),
+                "url": result["url"],
+                "content": result["content"],
+                "score": result.get("score"),
+            }
+            for result in raw_results.get("results", [])
+        ]
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环对应的异步客户端，不存在时创建。"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(loop)
+                if client is None:
+                    client = httpx.AsyncClient(
+                        base_url=TAVILY_API_URL, limits=self._limits, timeout=self._timeout
+                    )
+                    self._async_clients[loop] = client
+        return client
+
+    def search(self, query: str, max_results: Optional[int] = None) -> SearchResult:
+        """执行单个搜索查询。
+
+        Args:
+            query: 搜索查询
+            max_results: 最大结果数，默认使用客户端配置
+
+        Returns:
+            SearchResult: 结果字典列表；请求失败时返回错误描述字符串
+        """
+        try:
+            response = self._client.post("/search", json=self._payload(query, max_results))
+            response.raise_for_status()
+            return self._clean_results(response.json())
+        except Exception as e:
+            # 与 TavilySearchResults 行为一致：错误以字符串形式返回给 LLM，而不是中断整个图
+            return repr(e)
+
+    async def asearch(self, query: str, max_results: Optional[int] = None) -> SearchResult:
+        """执行单个搜索查询（异步版本）。
+
+        Args:
+            query: 搜索查询
+            max_results: 最大结果数，默认使用客户端配置
+
+        Returns:
+            SearchResult: 结果字典列表；请求失败时返回错误描述字符串
+        """
+        try:
+            client = self._get_async_client()
+            response = await client.post("/search", json=self._payload(query, max_results))
+            response.raise_for_status()
+            return self._clean_results(response.json())
+        except Exception as e:
+            return repr(e)
+
+    def batch(self, queries: list[str], max_results: Optional[int] = None) -> list[SearchResult]:
+        """并发执行多个搜索查询。
+
+        Args:
+            queries: 搜索查询列表
+            max_results: 最大结果数，默认使用客户端配置
+
+        Returns:
+            list[SearchResult]: 搜索结果列表，顺序与 queries 一致
+        """
+        if len(queries) <= 1:
+            return [self.search(query, max_results) for query in queries]
+        # 线程池只在本次调用期间存在，客户端不持有需要关闭的线程；图中的搜索由
+        # execute_tools 的共享线程池调度，不经过这里
+        workers = min(len(queries), self.max_connections)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tavily-search") as executor:
+            return list(executor.map(lambda query: self.search(query, max_results), queries))
+
+    async def abatch(self, queries: list[str], max_results: Optional[int] = None) -> list[SearchResult]:
+        """并发执行多个搜索查询（异步版本）。
+
+        Args:
+            queries: 搜索查询列表
+            max_results: 最大结果数，默认使用客户端配置
+
+        Returns:
+            list[SearchResult]: 搜索结果列表，顺序与 queries 一致
+        """
+        return list(await asyncio.gather(*(self.asearch(query, max_results) for query in queries)))
+
+    def close(self) -> None:
+        """关闭同步连接池和所有事件循环的异步连接池。
+
+        异步客户端只能在创建它的事件循环中关闭：事件循环正在运行时把关闭提交到该循环
+        （不等待完成），尚未运行时直接在该循环上执行关闭，已经关闭的循环的连接随循环一起释放。
+        """
+        self._client.close()
+        with self._lock:
+            clients = list(self._async_clients.items())
+            self._async_clients.clear()
+        for loop, client in clients:
+            _close_async_client(loop, client)
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环对应的异步连接池。"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+def _close_async_client(loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> None:
+    """在异步客户端所属的事件循环中关闭它。"""
+    if loop.is_closed():
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if loop is running:
+        loop.create_task(client.aclose())
+    elif loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    elif running is None:
+        loop.run_until_complete(client.aclose())
+    # 其余情况（当前线程正在运行另一个事件循环，目标循环已停止）无法安全地关闭，
+    # 连接在目标循环关闭时释放
+
+
+# 全局搜索客户端实例（延迟初始化）。TAVILY_API_KEY 和连接池设置来自运行配置
+# （可能来自 .env，不在导入时加载）
+_search_client = LazySingleton(TavilySearchClient, name="search_client")
+
+
+def get_search_client() -> TavilySearchClient:
+    """获取进程级共享的搜索客户端（单例模式）。
+
+    首次调用时创建客户端，后续调用返回同一个实例，所有节点、线程和异步任务
+    共享同一个连接池。
+
+    Returns:
+        TavilySearchClient: 全局搜索客户端实例
+    """
+    return _search_client.get()
+
+
+def set_search_client(client: Optional[TavilySearchClient]) -> None:
+    """替换全局搜索客户端。
+
+    可用于注入自定义配置的客户端（或测试用的替身）。被替换的旧客户端会被关闭；
+    传入 None 时清除当前客户端，下次调用 get_search_client() 时会重新创建。
+
+    Args:
+        client: 新的搜索客户端实例，或 None
+    """
+    previous = _search_client.set(client)
+    if previous is not None and previous is not client:
+        previous.close()
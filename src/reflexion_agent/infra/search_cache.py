@@ -0,0 +1,268 @@
+"""搜索结果缓存模块。
+
+本模块为 Tavily 搜索结果提供两级缓存，减少相似研究主题的重复搜索：
+- 内存 LRU 层：进程内快速命中，超出容量时淘汰最久未使用的条目
+- SQLite 磁盘层（可选）：跨进程、跨重启持久化
+
+缓存键由规范化后的查询字符串（大小写折叠、空白合并）和 max_results 组成，
+条目的新鲜度由 TTL 控制。
+
+缓存相关环境变量：
+- SEARCH_CACHE_ENABLED: 是否启用搜索缓存，默认为 true
+- SEARCH_CACHE_MAX_ENTRIES: 内存层最大条目数，默认为 1024
+- SEARCH_CACHE_TTL: 缓存有效期（秒），默认为 86400（一天）
+- SEARCH_CACHE_PATH: SQLite 缓存文件路径，未设置时只使用内存层
+- SEARCH_CACHE_MAX_DISK_ENTRIES: 磁盘层最大条目数，默认为 65536
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleton import LazySingleton
+
+# 磁盘层每写入这么多条目清理一次过期条目并裁剪到容量上限
+_SWEEP_EVERY_WRITES = 128
+
+
+def normalize_query(query: str) -> str:
+    """规范化搜索查询字符串。
+
+    大小写折叠并合并连续空白，使 "  AI  SOC" 与 "ai soc" 命中同一个缓存条目。
+
+    Args:
+        query: 原始查询字符串
+
+    Returns:
+        str: 规范化后的查询字符串
+    """
+    return " ".join(query.casefold().split())
+
+
+def make_cache_key(query: str, max_results: int) -> str:
+    """根据查询和最大结果数生成缓存键。
+
+    Args:
+        query: 原始查询字符串
+        max_results: 最大结果数
+
+    Returns:
+        str: 缓存键
+    """
+    return f"{max_results}:{normalize_query(query)}"
+
+
+class SearchCache:
+    """带 TTL 的两级（内存 LRU + 可选 SQLite）搜索结果缓存。
+
+    所有操作都由同一把锁保护，可以在多个线程（以及事件循环）之间共享。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 86400.0,
+        db_path: Optional[str] = None,
+        max_disk_entries: Optional[int] = 65536,
+    ):
+        """初始化搜索缓存。
+
+        Args:
+            max_entries: 内存层最大条目数
+            ttl: 缓存有效期（秒）
+            db_path: SQLite 缓存文件路径。为 None 时只使用内存层。
+            max_disk_entries: 磁盘层最大条目数，超出时定期清理最早写入的条目；
+                为 None 时不限制
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        # 内存层：key -> (写入时间, 结果)，OrderedDict 的顺序即 LRU 顺序
+        self._memory: "OrderedDict[str, tuple[float, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._disk_hits = 0
+        self._writes_since_sweep = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            # 连接在多个线程间共享，访问由 self._lock 串行化
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, results TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS search_cache_created_at ON search_cache (created_at)"
+            )
+            # 打开时先清理一次，上次进程遗留的过期条目不会一直占着磁盘
+            self._sweep_disk(time.time())
+            self._conn.commit()
+
+    def _is_fresh(self, created_at: float, now: float) -> bool:
+        """判断条目是否仍在有效期内。"""
+        return now - created_at < self.ttl
+
+    def get(self, query: str, max_results: int) -> Optional[list]:
+        """查询缓存。
+
+        先查内存层，未命中再查磁盘层；磁盘层命中的条目会被提升到内存层。
+
+        Args:
+            query: 搜索查询
+            max_results: 最大结果数
+
+        Returns:
+            Optional[list]: 缓存的搜索结果；未命中或已过期时返回 None
+        """
+        key = make_cache_key(query, max_results)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, results = entry
+                if self._is_fresh(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._hits += 1
+                    return results
+                # 过期条目直接删除
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT results, created_at FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    results_json, created_at = row
+                    if self._is_fresh(created_at, now):
+                        results = json.loads(results_json)
+                        self._put_memory(key, created_at, results)
+                        self._hits += 1
+                        self._disk_hits += 1
+                        return results
+                    self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+
+            self._misses += 1
+            return None
+
+    def set(self, query: str, max_results: int, results: list) -> None:
+        """写入缓存。
+
+        只缓存成功的搜索结果（列表），错误字符串不会被缓存。
+
+        Args:
+            query: 搜索查询
+            max_results: 最大结果数
+            results: 搜索结果
+        """
+        if not isinstance(results, list):
+            return
+        key = make_cache_key(query, max_results)
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, now, results)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, results, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(results, ensure_ascii=False), now),
+                )
+                self._writes_since_sweep += 1
+                if self._writes_since_sweep >= _SWEEP_EVERY_WRITES:
+                    self._sweep_disk(now)
+                self._conn.commit()
+
+    def _sweep_disk(self, now: float) -> None:
+        """删除磁盘层的过期条目，并裁剪到 max_disk_entries（调用方需持有锁并提交）。
+
+        过期条目在读取时也会被删除，但从不再被查询的条目只能靠这里清理。
+        """
+        self._writes_since_sweep = 0
+        self._conn.execute("DELETE FROM search_cache WHERE created_at < ?", (now - self.ttl,))
+        if self.max_disk_entries is not None:
+            # 保留最新写入的 max_disk_entries 条，其余按写入时间从早到晚删除
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                "SELECT key FROM search_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,),
+            )
+
+    def _put_memory(self, key: str, created_at: float, results: list) -> None:
+        """写入内存层并按 LRU 淘汰超出容量的条目（调用方需持有锁）。"""
+        self._memory[key] = (created_at, results)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层，并重置命中统计。"""
+        with self._lock:
+            self._memory.clear()
+            self._hits = self._misses = self._disk_hits = 0
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM search_cache")
+                self._conn.commit()
+
+    @property
+    def stats(self) -> dict:
+        """缓存命中统计。
+
+        Returns:
+            dict: 包含 hits、misses、disk_hits、hit_rate 和内存层条目数 size
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "disk_hits": self._disk_hits,
+                "hit_rate": self._hits / total if total else 0.0,
+                "size": len(self._memory),
+            }
+
+
+def _create_search_cache() -> SearchCache:
+    settings = get_settings().search
+    return SearchCache(
+        max_entries=settings.cache_max_entries,
+        ttl=settings.cache_ttl,
+        db_path=settings.cache_path,
+        max_disk_entries=settings.cache_max_disk_entries,
+    )
+
+
+# 全局搜索缓存实例（延迟初始化）
+_search_cache = LazySingleton(_create_search_cache, name="search_cache")
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """获取全局搜索缓存（单例模式）。
+
+    根据环境变量创建缓存；如果 SEARCH_CACHE_ENABLED 为 false，返回 None。
+
+    Returns:
+        Optional[SearchCache]: 全局搜索缓存实例，未启用时为 None
+    """
+    cache = _search_cache.peek()
+    if cache is None and get_settings().search.cache_enabled:
+        cache = _search_cache.get()
+    return cache
+
+
+def set_search_cache(cache: Optional[SearchCache]) -> None:
+    """替换全局搜索缓存。
+
+    传入 None 时清除当前缓存，下次调用 get_search_cache() 时会根据环境变量重新创建。
+
+    Args:
+        cache: 新的搜索缓存实例，或 None
+    """
+    _search_cache.set(cache)
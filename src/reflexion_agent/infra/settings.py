@@ -0,0 +1,360 @@
+"""类型化的运行配置模块。
+
+所有环境变量（以及项目根目录 .env 文件）只在第一次调用 get_settings() 时读取一次，
+解析为不可变的 Settings 对象并在进程生命周期内缓存。各模块通过 get_settings() 读取配置，
+热路径上的配置查询只是一次属性访问，不会再检查文件系统或重新解析 .env。
+
+    settings = get_settings()
+    settings.search.max_concurrency      # SEARCH_MAX_CONCURRENCY
+    settings.azure.configured            # 是否设置了 AZURE_OPENAI_API_KEY 和 AZURE_OPENAI_ENDPOINT
+
+修改环境变量或 .env 后调用 reload_settings() 重新解析。已经创建的共享组件（LLM 实例、
+搜索客户端、缓存、限流器等）不会自动重建，需要通过对应的 set_*(None) 清除后才会按新配置重新创建。
+
+测试或嵌入场景可以用 Settings.from_env({...}) 从任意映射构造配置，再通过 set_settings() 注入。
+各字段对应的环境变量见 .env.example。
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Mapping, Optional
+
+from reflexion_agent.infra.config import load_env_file
+
+# Azure OpenAI API 的默认版本
+DEFAULT_AZURE_API_VERSION = "2024-02-15-preview"
+
+
+def _str(env: Mapping[str, str], name: str, default: Optional[str] = None) -> Optional[str]:
+    value = env.get(name)
+    return value if value is not None else default
+
+
+def _int(env: Mapping[str, str], name: str, default: int) -> int:
+    value = env.get(name)
+    return int(value) if value else default
+
+
+def _float(env: Mapping[str, str], name: str, default: float) -> float:
+    value = env.get(name)
+    return float(value) if value else default
+
+
+def _optional_float(env: Mapping[str, str], name: str) -> Optional[float]:
+    value = env.get(name)
+    return float(value) if value else None
+
+
+def _bool(env: Mapping[str, str], name: str, default: bool) -> bool:
+    value = env.get(name)
+    if not value:
+        return default
+    return value.lower() not in ("0", "false", "no", "off")
+
+
+@dataclass(frozen=True)
+class AzureOpenAISettings:
+    """Azure OpenAI 配置。"""
+
+    api_key: Optional[str] = None
+    endpoint: Optional[str] = None
+    api_version: str = DEFAULT_AZURE_API_VERSION
+    deployment_name: str = "gpt-4"
+    # AZURE_OPENAI_DEPLOYMENTS 的原始 JSON（多部署路由，由 infra.llm_router 解析）
+    deployments_json: Optional[str] = None
+
+    @property
+    def configured(self) -> bool:
+        """是否设置了 API 密钥和端点。"""
+        return self.api_key is not None and self.endpoint is not None
+
+
+@dataclass(frozen=True)
+class OpenAISettings:
+    """标准 OpenAI 配置。"""
+
+    api_key: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class LLMRouterSettings:
+    """多部署路由配置（见 infra.llm_router）。"""
+
+    failure_threshold: int = 3
+    cooldown_seconds: float = 30.0
+    max_queue_seconds: float = 60.0
+
+
+@dataclass(frozen=True)
+class LLMPoolSettings:
+    """多租户模型池配置（见 infra.llm_pool）。"""
+
+    max_size: int = 16
+    idle_ttl: float = 1800.0
+
+
+@dataclass(frozen=True)
+class TavilySettings:
+    """Tavily 搜索客户端配置。"""
+
+    api_key: Optional[str] = None
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    timeout: float = 30.0
+
+
+@dataclass(frozen=True)
+class SearchSettings:
+    """搜索缓存和并发配置。"""
+
+    cache_enabled: bool = True
+    cache_max_entries: int = 1024
+    cache_ttl: float = 86400.0
+    cache_path: Optional[str] = None
+    cache_max_disk_entries: int = 65536
+    max_concurrency: int = 8
+    query_timeout: float = 30.0
+    executor_workers: int = 32
+
+
+@dataclass(frozen=True)
+class ResultSettings:
+    """搜索结果整形和结果存储配置（见 infra.result_store）。"""
+
+    shaping_enabled: bool = True
+    content_chars: int = 800
+    content_tokens: int = 0
+    store_max_entries: int = 4096
+    store_path: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class RateLimitSettings:
+    """一类请求的客户端限流配置（见 infra.rate_limit），0 表示不限制。"""
+
+    requests_per_minute: float = 0.0
+    tokens_per_minute: float = 0.0
+    max_inflight: int = 0
+    min_inflight: int = 1
+    latency_target: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        """是否配置了任何限制。"""
+        return bool(self.requests_per_minute or self.tokens_per_minute or self.max_inflight)
+
+
+@dataclass(frozen=True)
+class CompactionSettings:
+    """revise 阶段上下文压缩配置（见 infra.compaction）。"""
+
+    enabled: bool = True
+    prompt_token_budget: int = 6000
+    snippets_top_k: int = 3
+    snippet_chars: int = 500
+
+
+@dataclass(frozen=True)
+class PromptSettings:
+    """提示模板配置（见 infra.prompts）。"""
+
+    layout: str = "cache_friendly"
+    time_granularity: int = 3600
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    """节点插桩和指标配置（见 infra.metrics）。"""
+
+    enabled: bool = False
+    max_traces: int = 1000
+
+
+@dataclass(frozen=True)
+class AnswerCacheSettings:
+    """语义答案缓存配置（见 infra.answer_cache）。"""
+
+    enabled: bool = False
+    threshold: float = 0.85
+    ttl: float = 21600.0
+    max_entries: int = 1024
+
+
+@dataclass(frozen=True)
+class BudgetSettings:
+    """运行预算配置（见 infra.budget）。"""
+
+    # 复用的线程数；同时进行的调用更多时使用专用线程
+    deadline_workers: int = 32
+
+
+@dataclass(frozen=True)
+class Settings:
+    """一次解析得到的完整运行配置（不可变）。"""
+
+    azure: AzureOpenAISettings = field(default_factory=AzureOpenAISettings)
+    openai: OpenAISettings = field(default_factory=OpenAISettings)
+    llm_router: LLMRouterSettings = field(default_factory=LLMRouterSettings)
+    llm_pool: LLMPoolSettings = field(default_factory=LLMPoolSettings)
+    tavily: TavilySettings = field(default_factory=TavilySettings)
+    search: SearchSettings = field(default_factory=SearchSettings)
+    results: ResultSettings = field(default_factory=ResultSettings)
+    llm_rate_limit: RateLimitSettings = field(default_factory=RateLimitSettings)
+    search_rate_limit: RateLimitSettings = field(default_factory=RateLimitSettings)
+    compaction: CompactionSettings = field(default_factory=CompactionSettings)
+    prompts: PromptSettings = field(default_factory=PromptSettings)
+    metrics: MetricsSettings = field(default_factory=MetricsSettings)
+    answer_cache: AnswerCacheSettings = field(default_factory=AnswerCacheSettings)
+    budget: BudgetSettings = field(default_factory=BudgetSettings)
+
+    def rate_limit(self, kind: str) -> RateLimitSettings:
+        """按请求类型（"llm" 或 "search"）获取限流配置。"""
+        return self.llm_rate_limit if kind == "llm" else self.search_rate_limit
+
+    @classmethod
+    def from_env(cls, env: Optional[Mapping[str, str]] = None) -> "Settings":
+        """从环境变量映射解析配置。
+
+        Args:
+            env: 环境变量映射，为 None 时使用 os.environ（不会加载 .env，见 get_settings）
+
+        Returns:
+            Settings: 解析后的配置
+
+        Raises:
+            ValueError: 数值类型的变量无法解析
+        """
+        env = os.environ if env is None else env
+        return cls(
+            azure=AzureOpenAISettings(
+                api_key=_str(env, "AZURE_OPENAI_API_KEY"),
+                endpoint=_str(env, "AZURE_OPENAI_ENDPOINT"),
+                # LangChain 读取 OPENAI_API_VERSION，两者都设置时以它为准
+                api_version=env.get("OPENAI_API_VERSION")
+                or env.get("AZURE_OPENAI_API_VERSION")
+                or DEFAULT_AZURE_API_VERSION,
+                deployment_name=_str(env, "AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4"),
+                deployments_json=env.get("AZURE_OPENAI_DEPLOYMENTS") or None,
+            ),
+            openai=OpenAISettings(api_key=_str(env, "OPENAI_API_KEY")),
+            llm_router=LLMRouterSettings(
+                failure_threshold=_int(env, "LLM_ROUTER_FAILURE_THRESHOLD", 3),
+                cooldown_seconds=_float(env, "LLM_ROUTER_COOLDOWN_SECONDS", 30.0),
+                max_queue_seconds=_float(env, "LLM_ROUTER_MAX_QUEUE_SECONDS", 60.0),
+            ),
+            llm_pool=LLMPoolSettings(
+                max_size=_int(env, "LLM_POOL_MAX_SIZE", 16),
+                idle_ttl=_float(env, "LLM_POOL_IDLE_TTL", 1800.0),
+            ),
+            tavily=TavilySettings(
+                api_key=env.get("TAVILY_API_KEY") or None,
+                max_connections=_int(env, "TAVILY_MAX_CONNECTIONS", 20),
+                max_keepalive_connections=_int(env, "TAVILY_MAX_KEEPALIVE_CONNECTIONS", 10),
+                keepalive_expiry=_float(env, "TAVILY_KEEPALIVE_EXPIRY", 30.0),
+                timeout=_float(env, "TAVILY_TIMEOUT", 30.0),
+            ),
+            search=SearchSettings(
+                cache_enabled=_bool(env, "SEARCH_CACHE_ENABLED", True),
+                cache_max_entries=_int(env, "SEARCH_CACHE_MAX_ENTRIES", 1024),
+                cache_ttl=_float(env, "SEARCH_CACHE_TTL", 86400.0),
+                cache_path=env.get("SEARCH_CACHE_PATH") or None,
+                cache_max_disk_entries=_int(env, "SEARCH_CACHE_MAX_DISK_ENTRIES", 65536),
+                max_concurrency=_int(env, "SEARCH_MAX_CONCURRENCY", 8),
+                query_timeout=_float(env, "SEARCH_QUERY_TIMEOUT", 30.0),
+                executor_workers=_int(env, "SEARCH_EXECUTOR_WORKERS", 32),
+            ),
+            results=ResultSettings(
+                shaping_enabled=_bool(env, "REFLEXION_RESULT_SHAPING_ENABLED", True),
+                content_chars=_int(env, "REFLEXION_RESULT_CONTENT_CHARS", 800),
+                content_tokens=_int(env, "REFLEXION_RESULT_CONTENT_TOKENS", 0),
+                store_max_entries=_int(env, "RESULT_STORE_MAX_ENTRIES", 4096),
+                store_path=env.get("RESULT_STORE_PATH") or None,
+            ),
+            llm_rate_limit=_rate_limit_settings(env, "LLM"),
+            search_rate_limit=_rate_limit_settings(env, "SEARCH"),
+            compaction=CompactionSettings(
+                enabled=_bool(env, "REFLEXION_COMPACTION_ENABLED", True),
+                prompt_token_budget=_int(env, "REFLEXION_PROMPT_TOKEN_BUDGET", 6000),
+                snippets_top_k=_int(env, "REFLEXION_SNIPPETS_TOP_K", 3),
+                snippet_chars=_int(env, "REFLEXION_SNIPPET_CHARS", 500),
+            ),
+            prompts=PromptSettings(
+                layout=env.get("REFLEXION_PROMPT_LAYOUT") or "cache_friendly",
+                time_granularity=_int(env, "REFLEXION_TIME_GRANULARITY", 3600),
+            ),
+            metrics=MetricsSettings(
+                enabled=_bool(env, "REFLEXION_METRICS_ENABLED", False),
+                max_traces=_int(env, "REFLEXION_METRICS_MAX_TRACES", 1000),
+            ),
+            answer_cache=AnswerCacheSettings(
+                enabled=_bool(env, "ANSWER_CACHE_ENABLED", False),
+                threshold=_float(env, "ANSWER_CACHE_THRESHOLD", 0.85),
+                ttl=_float(env, "ANSWER_CACHE_TTL", 21600.0),
+                max_entries=_int(env, "ANSWER_CACHE_MAX_ENTRIES", 1024),
+            ),
+            budget=BudgetSettings(deadline_workers=_int(env, "REFLEXION_DEADLINE_WORKERS", 32)),
+        )
+
+
+def _rate_limit_settings(env: Mapping[str, str], prefix: str) -> RateLimitSettings:
+    """解析 {prefix}_RATE_LIMIT_RPM 等限流变量。"""
+    return RateLimitSettings(
+        requests_per_minute=_float(env, f"{prefix}_RATE_LIMIT_RPM", 0.0),
+        tokens_per_minute=_float(env, f"{prefix}_RATE_LIMIT_TPM", 0.0),
+        max_inflight=_int(env, f"{prefix}_MAX_INFLIGHT", 0),
+        min_inflight=_int(env, f"{prefix}_MIN_INFLIGHT", 1),
+        latency_target=_optional_float(env, f"{prefix}_LATENCY_TARGET"),
+    )
+
+
+# 全局配置（延迟初始化）
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """获取进程级的运行配置（单例模式）。
+
+    首次调用时加载项目根目录的 .env（不覆盖已经存在的环境变量）并解析环境变量，
+    之后的调用直接返回缓存的对象。
+
+    Returns:
+        Settings: 当前配置
+    """
+    settings = _settings
+    if settings is None:
+        with _settings_lock:
+            settings = _settings
+            if settings is None:
+                settings = reload_settings(_locked=True)
+    return settings
+
+
+def reload_settings(_locked: bool = False) -> Settings:
+    """重新加载 .env 并解析环境变量，替换缓存的配置。
+
+    Returns:
+        Settings: 新的配置
+    """
+    global _settings
+    if not _locked:
+        with _settings_lock:
+            return reload_settings(_locked=True)
+    load_env_file()
+    _settings = Settings.from_env()
+    return _settings
+
+
+def set_settings(settings: Optional[Settings]) -> None:
+    """替换缓存的配置。
+
+    传入 None 时清除当前配置，下次调用 get_settings() 时会重新解析。
+
+    Args:
+        settings: 新的配置，或 None
+    """
+    global _settings
+    with _settings_lock:
+        _settings = settings
@@ -0,0 +1,149 @@
+"""单飞（single-flight）请求合并模块。
+
+当多个并发运行同时发起相同的请求（例如同一个搜索查询）时，
+只让第一个调用者（leader）真正执行请求，其余调用者等待并共享同一个结果。
+这样可以在热门问题突发到达时削平对上游服务的请求尖峰。
+
+提供两种实现：
+- SingleFlight: 基于线程的实现，用于同步路径
+- AsyncSingleFlight: 基于 asyncio 的实现，用于异步路径
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    """一次正在进行中的请求，保存结果供所有等待者读取。"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """线程版单飞请求合并器。
+
+    同一个 key 同时只会有一个请求在执行；执行期间到达的相同 key 的调用
+    会阻塞等待，并得到同一个结果（或同一个异常）。请求完成后 key 即被释放，
+    之后的调用会重新执行（结果缓存由调用方负责）。
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """执行 fn，或等待相同 key 的进行中请求并共享其结果。
+
+        Args:
+            key: 请求的合并键
+            fn: 实际执行请求的无参函数
+
+        Returns:
+            Any: fn 的返回值
+
+        Raises:
+            BaseException: fn 抛出的异常会传递给所有等待者
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                # 已有相同请求在执行，成为等待者
+                call.waiters += 1
+                self._shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除 key 再唤醒等待者，保证之后的新调用会重新执行
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    @property
+    def stats(self) -> dict:
+        """合并统计：executed 为实际执行次数，shared 为共享结果的调用次数。"""
+        with self._lock:
+            return {
+                "executed": self._executed,
+                "shared": self._shared,
+                "in_flight": len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """asyncio 版单飞请求合并器。
+
+    进行中的请求以 Task 形式保存，等待者通过 asyncio.shield 等待同一个 Task，
+    因此某个等待者被取消不会影响 leader 和其他等待者。
+    Task 只能在创建它的事件循环中等待，所以请求按事件循环分别合并。
+    """
+
+    def __init__(self):
+        self._tasks: dict[tuple[int, Hashable], asyncio.Task] = {}
+        self._executed = 0
+        self._shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 fn()，或等待相同 key 的进行中请求并共享其结果。
+
+        Args:
+            key: 请求的合并键
+            fn: 返回协程的无参函数，只有 leader 会调用它
+
+        Returns:
+            Any: 协程的返回值
+
+        Raises:
+            BaseException: 协程抛出的异常会传递给所有等待者
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        task = self._tasks.get(flight_key)
+        if task is not None:
+            self._shared += 1
+        else:
+            # 同一事件循环内的检查和注册之间没有 await，不需要加锁
+            task = loop.create_task(fn())
+            self._tasks[flight_key] = task
+            self._executed += 1
+            task.add_done_callback(lambda done: self._release(flight_key, done))
+        return await asyncio.shield(task)
+
+    def _release(self, flight_key: tuple[int, Hashable], task: asyncio.Task) -> None:
+        """请求完成后释放 key（只移除对应的 Task）。"""
+        if self._tasks.get(flight_key) is task:
+            del self._tasks[flight_key]
+
+    @property
+    def stats(self) -> dict:
+        """合并统计：executed 为实际执行次数，shared 为共享结果的调用次数。"""
+        return {
+            "executed": self._executed,
+            "shared": self._shared,
+            "in_flight": len(self._tasks),
+        }
@@ -0,0 +1,104 @@
+"""线程安全的延迟初始化单例。
+
+LLM 实例、draft / revise 的链、ToolNode 和搜索线程池都在第一次使用时才创建。
+不加锁的 "if _x is None: _x = create()" 在多线程服务冷启动时会被多个线程同时执行，
+每个线程各自创建一份 LLM 客户端和 HTTP 连接池，最后只保留一份。LazySingleton 用双重检查锁保证
+工厂函数只执行一次，已经创建之后的读取只有一次属性访问，不加锁：
+
+    _tool_node = LazySingleton(_create_tool_node)
+    _tool_node.get()           # 同步路径
+    await _tool_node.aget()    # 异步路径：冷启动时在线程中创建，不阻塞事件循环
+
+aget() 在同一个事件循环中的并发冷启动只提交一次创建任务，其余协程等待同一个结果。
+"""
+
+import threading
+import weakref
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazySingleton(Generic[T]):
+    """延迟创建、只创建一次的进程级对象。"""
+
+    __slots__ = ("_factory", "_value", "_lock", "_pending", "name")
+
+    def __init__(self, factory: Callable[[], T], name: Optional[str] = None):
+        """初始化单例。
+
+        Args:
+            factory: 创建对象的无参函数，返回值不能为 None
+            name: 名称（用于 repr）
+        """
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+        # 事件循环 -> 进行中的创建任务（aget 的并发冷启动只提交一次）
+        self._pending: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.name = name or getattr(factory, "__name__", "singleton")
+
+    def get(self) -> T:
+        """获取对象，第一次调用时创建。
+
+        Returns:
+            T: 工厂函数创建的对象
+
+        Raises:
+            Exception: 工厂函数抛出的异常（不会缓存，下次调用会重试）
+        """
+        value = self._value
+        if value is None:
+            with self._lock:
+                value = self._value
+                if value is None:
+                    value = self._value = self._factory()
+        return value
+
+    async def aget(self) -> T:
+        """异步获取对象。
+
+        已经创建时直接返回；否则在线程中执行 get()，事件循环在创建期间可以继续处理其他请求。
+
+        Returns:
+            T: 工厂函数创建的对象
+        """
+        value = self._value
+        if value is not None:
+            return value
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._pending.get(loop)
+            if task is None:
+                task = self._pending[loop] = loop.create_task(asyncio.to_thread(self.get))
+                task.add_done_callback(lambda _: self._pending.pop(loop, None))
+        # shield：某个等待者被取消时，创建任务和其他等待者不受影响
+        return await asyncio.shield(task)
+
+    def set(self, value: Optional[T]) -> Optional[T]:
+        """替换对象，传入 None 时清除，下次 get() 会重新创建。
+
+        Args:
+            value: 新的对象，或 None
+
+        Returns:
+            Optional[T]: 被替换的对象
+        """
+        with self._lock:
+            previous, self._value = self._value, value
+        return previous
+
+    @property
+    def initialized(self) -> bool:
+        """对象是否已经创建。"""
+        return self._value is not None
+
+    def peek(self) -> Optional[T]:
+        """返回已经创建的对象，尚未创建时返回 None（不会触发创建）。"""
+        return self._value
+
+    def __repr__(self) -> str:
+        state = "initialized" if self._value is not None else "pending"
+        return f"LazySingleton({self.name!r}, {state})"
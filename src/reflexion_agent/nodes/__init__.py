@@ -3,21 +3,27 @@
 本模块提供 Reflexion Agent 图中使用的所有节点函数、条件函数和工具函数。
 """
 
-from reflexion_agent.nodes.draft import draft_node
-from reflexion_agent.nodes.event_loop import create_event_loop
-from reflexion_agent.nodes.execute_tools import (
-    answer_question_tool,
-    execute_tools_node,
-    revise_answer_tool,
-)
-from reflexion_agent.nodes.revise import revise_node
-
-__all__ = [
-    "draft_node",
-    "execute_tools_node",
-    "revise_node",
-    "create_event_loop",
-    "answer_question_tool",
-    "revise_answer_tool",
-]
+from reflexion_agent._lazy import lazy_exports
 
+# 子模块 -> 导出的名称。子模块在第一次访问其中某个名称时才会导入（见 reflexion_agent._lazy）
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    "draft": ("draft_node", "adraft_node"),
+    "event_loop": ("create_event_loop",),
+    "execute_tools": (
+        "execute_tools_node",
+        "aexecute_tools_node",
+        "answer_question_tool",
+        "revise_answer_tool",
+    ),
+    "revise": ("revise_node", "arevise_node"),
+    "stopping": (
+        "StoppingPolicy",
+        "answer_converged",
+        "empty_missing_critique",
+        "no_new_queries",
+        "any_of",
+        "default_stopping_policy",
+        "DEFAULT_STOPPING_POLICY",
+        "track_answers",
+    ),
+})
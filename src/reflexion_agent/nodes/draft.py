@@ -4,13 +4,37 @@
 该模块自包含所有需要的逻辑，不依赖其他链模块。
 """
 
+from typing import Optional
+
 from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
 
 from reflexion_agent.infra import create_actor_prompt_template, get_llm_instance
-from reflexion_agent.nodes.execute_tools import answer_question_tool
+from reflexion_agent.infra.budget import (
+    DeadlineExceeded,
+    acall_with_deadline,
+    best_answer_message,
+    call_with_deadline,
+    charge_llm_tokens,
+    get_run_budget,
+)
+from reflexion_agent.infra.llm_pool import get_llm_pool, llm_spec_from_config
+from reflexion_agent.infra.rate_limit import acall_llm_limited, call_llm_limited
+from reflexion_agent.infra.singleton import LazySingleton
+from reflexion_agent.nodes.execute_tools import (
+    answer_question_tool,
+    prefetch_search,
+    speculative_search_enabled,
+)
+from reflexion_agent.nodes.stopping import latest_answer
+from reflexion_agent.nodes.streaming import (
+    ainvoke_streaming_answer,
+    invoke_streaming_answer,
+    stream_answer_enabled,
+)
 
 
-def _create_first_responder_chain():
+def _create_first_responder_chain(llm=None):
     """创建初始响应生成链。
     
     这个链用于生成用户的初始答案，包括：
@@ -18,11 +42,14 @@ def _create_first_responder_chain():
     - 自我反思和批评
     - 用于改进的搜索查询建议
     
+    Args:
+        llm: 链绑定的模型，为 None 时使用全局 LLM 实例
+    
     Returns:
         Runnable: 配置好的链，可以处理消息并返回结构化答案
     """
     # 获取 LLM 实例
-    llm = get_llm_instance()
+    llm = llm or get_llm_instance()
     
     # 获取提示模板
     actor_prompt_template = create_actor_prompt_template()
@@ -37,23 +64,81 @@ def _create_first_responder_chain():
     return first_responder
 
 
-# 创建链实例（延迟初始化，避免在导入时创建）
-_first_responder_chain = None
+# 创建链实例（延迟初始化，避免在导入时创建；并发冷启动时只创建一次）
+_first_responder_chain = LazySingleton(_create_first_responder_chain, name="first_responder")
 
 
-def _get_first_responder_chain():
-    """获取 first_responder 链实例（单例模式）。
+def _get_first_responder_chain(config: Optional[RunnableConfig] = None):
+    """获取 first_responder 链实例。
+    
+    运行配置的 configurable 中指定了 llm（见 infra.llm_pool）时，返回模型池中绑定在该模型上的链；
+    否则返回绑定在全局 LLM 实例上的链（单例模式）。
+    
+    Args:
+        config: 运行配置
     
     Returns:
         Runnable: first_responder 链实例
     """
-    global _first_responder_chain
-    if _first_responder_chain is None:
-        _first_responder_chain = _create_first_responder_chain()
-    return _first_responder_chain
+    spec = llm_spec_from_config(config)
+    if spec is not None:
+        return get_llm_pool().get_chain(spec, "first_responder", _create_first_responder_chain)
+    return _first_responder_chain.get()
+
+
+async def _aget_first_responder_chain(config: Optional[RunnableConfig] = None):
+    """异步获取 first_responder 链实例，首次创建（LLM 客户端和链）在线程中执行，不阻塞事件循环。
+    
+    Args:
+        config: 运行配置
+    
+    Returns:
+        Runnable: first_responder 链实例
+    """
+    spec = llm_spec_from_config(config)
+    if spec is not None:
+        return await get_llm_pool().aget_chain(spec, "first_responder", _create_first_responder_chain)
+    return await _first_responder_chain.aget()
+
 
+def _normalize_response(response) -> list:
+    """将链的返回值规范化为消息对象列表。
+    
+    Args:
+        response: 链的 invoke/ainvoke 返回值
+        
+    Returns:
+        list: 消息对象列表
+    """
+    # 处理返回值：确保是消息对象列表
+    # 根据 LangChain 文档，链的 invoke 方法应该返回单个消息对象或消息列表
+    if isinstance(response, BaseMessage):
+        # 单个消息对象，直接包装在列表中
+        return [response]
+    if isinstance(response, list):
+        # 如果已经是列表，确保所有元素都是消息对象
+        messages = [msg for msg in response if isinstance(msg, BaseMessage)]
+        # 如果过滤后列表为空，说明列表中的元素不是消息对象，抛出错误
+        if not messages and response:
+            raise ValueError(f"Response list contains non-message objects: {[type(x).__name__ for x in response]}")
+        return messages
+    # 其他类型，尝试作为单个消息处理（可能不应该发生）
+    # 但为了兼容性，尝试转换
+    return [response]
 
-def draft_node(state: dict) -> dict:
+
+def _stream_options(config: Optional[RunnableConfig], budget) -> tuple:
+    """流式调用的选项：是否输出 answer_delta 事件，以及推测式预取搜索的回调。
+    
+    只有 draft 预取：它之后总是执行 execute_tools；revise 之后可能直接结束，预取的搜索会被浪费。
+    """
+    on_query = None
+    if speculative_search_enabled(config):
+        on_query = lambda tool_call_id, query: prefetch_search(tool_call_id, query, budget)
+    return stream_answer_enabled(config), on_query
+
+
+def draft_node(state: dict, config: Optional[RunnableConfig] = None) -> dict:
     """初始答案生成节点。
     
     这个节点使用 first_responder 链来生成用户的初始答案。
@@ -61,40 +146,95 @@ def draft_node(state: dict) -> dict:
     
     Args:
         state: 当前状态字典，包含 messages 键（消息列表）
+        config: 运行配置，configurable 中 stream_answer 为 True 时流式输出答案（见 nodes.streaming）；
+            speculative_search 为 True 时在生成过程中预取已经完整的搜索查询；
+            budget 为运行预算（见 infra.budget），LLM 调用最多等待预算的剩余时间；
+            llm 指定本次运行使用的模型（见 infra.llm_pool）
         
     Returns:
-        dict: 包含新消息的状态更新
+        dict: 包含新消息、节点计数增量和答案进度的状态更新；有预算时还包含 budget_usage
     """
     # 从状态中提取消息列表
     messages = state.get("messages", [])
+    budget = get_run_budget(config)
     
-    # 获取 first_responder 链
-    first_responder = _get_first_responder_chain()
+    # 获取 first_responder 链（按运行配置选择模型）
+    first_responder = _get_first_responder_chain(config)
     
     # first_responder 是一个 LangChain Runnable，可以直接调用
     # 它会处理消息列表并返回包含工具调用的消息
     # 注意：当使用 init_chat_model 时，invoke 返回的是单个 AIMessage 对象
-    response = first_responder.invoke(messages)
-    
-    # 确保返回的是消息对象列表
-    # response 应该是一个 AIMessage 对象，需要包装在列表中
-    from langchain_core.messages import BaseMessage
+    def invoke():
+        if stream_answer_enabled(config) or speculative_search_enabled(config):
+            return invoke_streaming_answer(
+                first_responder, messages, "draft", *_stream_options(config, budget)
+            )
+        return first_responder.invoke(messages)
     
-    # 处理返回值：确保是消息对象列表
-    # 根据 LangChain 文档，链的 invoke 方法应该返回单个消息对象或消息列表
-    if isinstance(response, BaseMessage):
-        # 单个消息对象，直接包装在列表中
-        messages = [response]
-    elif isinstance(response, list):
-        # 如果已经是列表，确保所有元素都是消息对象
-        messages = [msg for msg in response if isinstance(msg, BaseMessage)]
-        # 如果过滤后列表为空，说明列表中的元素不是消息对象，抛出错误
-        if not messages and response:
-            raise ValueError(f"Response list contains non-message objects: {[type(x).__name__ for x in response]}")
+    reason = budget.check(include_searches=False) if budget is not None else None
+    if reason:
+        new_messages = best_answer_message(messages, reason)
     else:
-        # 其他类型，尝试作为单个消息处理（可能不应该发生）
-        # 但为了兼容性，尝试转换
-        messages = [response]
+        try:
+            response = call_with_deadline(budget, lambda: call_llm_limited(invoke, messages))
+            new_messages = _normalize_response(response)
+            charge_llm_tokens(budget, messages, new_messages)
+        except DeadlineExceeded:
+            # 截止时间已到：不抛出异常，由后续节点和路由函数结束运行
+            new_messages = best_answer_message(messages, budget.check())
     
     # StateGraph 期望的返回值格式：{"messages": [Message, ...]}
-    return {"messages": messages}
+    # node_counts 是增量，由 ReflexionState 的 reducer 累加；
+    # answer_progress 是本轮的答案参数，由 reducer 合并为停止策略读取的进度摘要
+    update = {
+        "messages": new_messages,
+        "node_counts": {"draft": 1},
+        "answer_progress": latest_answer(new_messages),
+    }
+    if budget is not None:
+        update["budget_usage"] = budget.usage()
+    return update
+
+
+async def adraft_node(state: dict, config: Optional[RunnableConfig] = None) -> dict:
+    """初始答案生成节点（异步版本）。
+    
+    与 draft_node 逻辑相同，但通过 ainvoke 调用 first_responder 链，
+    等待 LLM 响应期间不会占用工作线程，适合在事件循环中并发运行大量任务。
+    
+    Args:
+        state: 当前状态字典，包含 messages 键（消息列表）
+        config: 运行配置
+        
+    Returns:
+        dict: 包含新消息、节点计数增量和答案进度的状态更新；有预算时还包含 budget_usage
+    """
+    messages = state.get("messages", [])
+    budget = get_run_budget(config)
+    first_responder = await _aget_first_responder_chain(config)
+    
+    async def ainvoke():
+        if stream_answer_enabled(config) or speculative_search_enabled(config):
+            return await ainvoke_streaming_answer(
+                first_responder, messages, "draft", *_stream_options(config, budget)
+            )
+        return await first_responder.ainvoke(messages)
+    
+    reason = budget.check(include_searches=False) if budget is not None else None
+    if reason:
+        new_messages = best_answer_message(messages, reason)
+    else:
+        try:
+            response = await acall_with_deadline(budget, lambda: acall_llm_limited(ainvoke, messages))
+            new_messages = _normalize_response(response)
+            charge_llm_tokens(budget, messages, new_messages)
+        except DeadlineExceeded:
+            new_messages = best_answer_message(messages, budget.check())
+    update = {
+        "messages": new_messages,
+        "node_counts": {"draft": 1},
+        "answer_progress": latest_answer(new_messages),
+    }
+    if budget is not None:
+        update["budget_usage"] = budget.usage()
+    return update
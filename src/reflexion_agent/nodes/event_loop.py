@@ -3,18 +3,25 @@
 本模块定义了事件循环条件函数，用于控制图的迭代执行。
 """
 
+from typing import Optional
+
 from langchain_core.messages import ToolMessage
 from langgraph.graph import END
 
+from reflexion_agent.infra.metrics import get_metrics_registry, metrics_enabled
+from reflexion_agent.nodes.stopping import StoppingPolicy
+
 
-def create_event_loop(max_iterations: int = 2):
+def create_event_loop(max_iterations: int = 2, stopping_policy: Optional[StoppingPolicy] = None):
     """创建事件循环条件函数。
     
     这个函数返回一个条件函数，用于判断是否继续执行工具调用。
-    它通过统计 ToolMessage 的数量来判断已经执行了多少次迭代。
+    它读取状态中由 reducer 维护的 iterations 计数器来判断已经执行了多少次迭代。
+    max_iterations 是硬上限；提供 stopping_policy 时，策略给出停止原因也会提前结束循环。
     
     Args:
         max_iterations: 最大迭代次数，默认为 2
+        stopping_policy: 提前终止策略（见 nodes.stopping），为 None 时固定执行 max_iterations 轮
         
     Returns:
         function: 条件函数，接收状态并返回下一个节点名称或 END
@@ -23,26 +30,43 @@ def create_event_loop(max_iterations: int = 2):
         """事件循环判断函数。
         
         根据当前状态中的工具调用次数决定下一步操作。
-        通过统计 ToolMessage 的数量来判断已经执行了多少次迭代。
+        优先读取 iterations 计数器（O(1)）；状态中没有该计数器时（例如在只有
+        messages 的自定义图中使用），退回到统计 ToolMessage 的数量。
         
         Args:
-            state: 当前状态字典，包含 messages 键（消息列表）
+            state: 当前状态字典，包含 iterations 计数器和 messages 键（消息列表）
             
         Returns:
             str: 下一步操作的节点名称（"execute_tools"），或 END 表示结束
         """
-        # 从状态中提取消息列表
-        messages = state.get("messages", [])
-        
-        # 统计状态中 ToolMessage 的数量
-        # ToolMessage 表示工具调用的结果，每执行一次工具就会产生一个 ToolMessage
-        # 因此统计 ToolMessage 的数量可以知道已经执行了多少轮工具调用
-        count_tool_visits = sum(isinstance(item, ToolMessage) for item in messages)
-        num_iterations = count_tool_visits
+        # execute_tools 节点每执行一次就把 iterations 加 1
+        num_iterations = state.get("iterations")
+        if num_iterations is None:
+            # 兼容没有计数器的状态：统计 ToolMessage 的数量
+            # ToolMessage 表示工具调用的结果，每执行一次工具就会产生一个 ToolMessage
+            messages = state.get("messages", [])
+            num_iterations = sum(isinstance(item, ToolMessage) for item in messages)
         
         # 如果超过最大迭代次数，结束流程
         if num_iterations > max_iterations:
             return END
+
+        # 运行预算已经耗尽时结束，revise 已经沿用了目前最好的答案
+        budget_usage = state.get("budget_usage")
+        if budget_usage and budget_usage.get("exhausted"):
+            if metrics_enabled():
+                get_metrics_registry().inc(
+                    "reflexion_early_stops_total", reason=f"budget_{budget_usage['exhausted']}"
+                )
+            return END
+
+        # 停止策略判断继续迭代不太可能带来改进时提前结束
+        if stopping_policy is not None:
+            reason = stopping_policy(state)
+            if reason:
+                if metrics_enabled():
+                    get_metrics_registry().inc("reflexion_early_stops_total", reason=reason)
+                return END
         
         # 否则继续执行工具（进入下一轮改进循环）
         return "execute_tools"
@@ -4,33 +4,407 @@
 该模块自包含所有需要的逻辑，不依赖其他工具模块。
 """
 
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
-from langchain_core.messages import BaseMessage
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import StructuredTool
-from langgraph.prebuilt import ToolNode
 
-from reflexion_agent.infra import AnswerQuestion, ReviseAnswer
+from reflexion_agent.infra import (
+    AnswerQuestion,
+    ReviseAnswer,
+    get_search_cache,
+    get_search_client,
+)
+from reflexion_agent.infra.budget import RunBudget, get_run_budget
+from reflexion_agent.infra.metrics import record
+from reflexion_agent.infra.rate_limit import arate_limited, rate_limited
+from reflexion_agent.infra.result_store import get_default_result_shaper, seen_result_urls
+from reflexion_agent.infra.search_cache import make_cache_key
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.infra.singleflight import AsyncSingleFlight, SingleFlight
+from reflexion_agent.infra.singleton import LazySingleton
+
+
+# 每个查询返回的最大结果数
+SEARCH_MAX_RESULTS = 5
+
+# 单飞请求合并器：并发运行中相同的查询只向 Tavily 发出一次请求
+_search_flight = SingleFlight()
+_async_search_flight = AsyncSingleFlight()
+
+def _create_search_executor() -> ThreadPoolExecutor:
+    """创建同步路径并发执行查询使用的线程池。
+    
+    线程池大小是整个进程同步搜索的并发上限，单个 execute_tools 步骤的并发另由
+    search_max_concurrency 控制。
+    """
+    return ThreadPoolExecutor(
+        max_workers=get_settings().search.executor_workers,
+        thread_name_prefix="search-query",
+    )
+
+
+# 同步路径并发执行查询使用的线程池（延迟初始化）
+_search_executor = LazySingleton(_create_search_executor, name="search_executor")
+
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    """获取同步搜索线程池（单例模式）。
+    
+    Returns:
+        ThreadPoolExecutor: 搜索线程池实例
+    """
+    return _search_executor.get()
+
+
+def _is_rate_limited_result(result) -> bool:
+    """搜索客户端以错误描述字符串报告失败，从中识别 429（用于自适应并发）。"""
+    return isinstance(result, str) and ("429" in result or "Too Many Requests" in result)
+
+
+def _search_query(query: str):
+    """执行单个搜索查询：缓存 -> 单飞合并 -> 搜索客户端。
+    
+    Args:
+        query: 搜索查询
+        
+    Returns:
+        搜索结果列表；请求失败时为错误描述字符串
+    """
+    cache = get_search_cache()
+    if cache is not None:
+        cached = cache.get(query, SEARCH_MAX_RESULTS)
+        if cached is not None:
+            record("search_cache_hits")
+            return cached
+    
+    def fetch():
+        record("search_requests")
+        with rate_limited("search") as permit:
+            result = get_search_client().search(query, max_results=SEARCH_MAX_RESULTS)
+            if _is_rate_limited_result(result):
+                permit.mark_rate_limited()
+        if cache is not None:
+            cache.set(query, SEARCH_MAX_RESULTS, result)
+        return result
+    
+    # 以规范化后的缓存键合并请求，"AI SOC" 与 "ai  soc" 共享同一次上游请求
+    return _search_flight.do(make_cache_key(query, SEARCH_MAX_RESULTS), fetch)
+
+
+async def _asearch_query(query: str):
+    """执行单个搜索查询（异步版本）：缓存 -> 单飞合并 -> 搜索客户端。
+    
+    Args:
+        query: 搜索查询
+        
+    Returns:
+        搜索结果列表；请求失败时为错误描述字符串
+    """
+    cache = get_search_cache()
+    if cache is not None:
+        cached = cache.get(query, SEARCH_MAX_RESULTS)
+        if cached is not None:
+            record("search_cache_hits")
+            return cached
+    
+    async def fetch():
+        record("search_requests")
+        async with arate_limited("search") as permit:
+            result = await get_search_client().asearch(query, max_results=SEARCH_MAX_RESULTS)
+            if _is_rate_limited_result(result):
+                permit.mark_rate_limited()
+        if cache is not None:
+            cache.set(query, SEARCH_MAX_RESULTS, result)
+        return result
+    
+    return await _async_search_flight.do(make_cache_key(query, SEARCH_MAX_RESULTS), fetch)
+
+
+def _search_query_from_queue(query: str, submitted_at: float, started: Optional[list] = None):
+    """线程池中执行的搜索任务：记录排队时间和开始时间后执行查询。
+
+    Args:
+        query: 搜索查询
+        submitted_at: 提交到线程池的时间
+        started: 开始执行时追加 time.monotonic() 的列表，调用方据此从开始执行起计算超时
+    """
+    now = time.monotonic()
+    if started is not None:
+        started.append(now)
+    record("search_queue_wait_seconds", now - submitted_at)
+    return _search_query(query)
+
+
+# 推测式预取的搜索：工具调用 ID -> {规范化缓存键: Future（同步）或 asyncio.Task（异步）}
+# 正常情况下紧随其后的 execute_tools 会取走对应条目；运行中途失败时留下的条目按 LRU 淘汰
+_prefetched: "OrderedDict[str, dict]" = OrderedDict()
+_prefetched_lock = threading.Lock()
+_PREFETCH_MAX_CALLS = 256
+
+
+def speculative_search_enabled(config: Optional[RunnableConfig]) -> bool:
+    """当前运行是否启用了推测式搜索预取（configurable 中的 speculative_search）。"""
+    return bool(((config or {}).get("configurable") or {}).get("speculative_search"))
+
+
+def prefetch_search(tool_call_id: str, query: str, budget: Optional[RunBudget] = None) -> None:
+    """在 LLM 仍在生成工具调用时提前开始一个搜索查询。
+    
+    由 draft 节点在流式解析出 search_queries 中一个完整的查询字符串后调用。
+    在事件循环中调用时创建 asyncio.Task，否则提交到共享搜索线程池；
+    随后的 execute_tools 按工具调用 ID 取走这些进行中的搜索，不再重复发出请求。
+    
+    Args:
+        tool_call_id: 生成该查询的工具调用 ID
+        query: 搜索查询
+        budget: 运行预算，预取的查询会预先计入搜索次数
+    """
+    key = make_cache_key(query, SEARCH_MAX_RESULTS)
+    with _prefetched_lock:
+        calls = _prefetched.get(tool_call_id, {})
+        if key in calls or (budget is not None and not budget.reserve_searches(1)):
+            return
+        # 预算检查通过后才登记，被拒绝的预取不会留下空条目
+        _prefetched[tool_call_id] = calls
+        _prefetched.move_to_end(tool_call_id)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            calls[key] = loop.create_task(_asearch_query(query))
+        else:
+            calls[key] = _get_search_executor().submit(
+                contextvars.copy_context().run, _search_query, query
+            )
+        while len(_prefetched) > _PREFETCH_MAX_CALLS:
+            _prefetched.popitem(last=False)
+    record("search_prefetched")
+
+
+def _take_prefetched(search_calls: list) -> dict:
+    """取走这些工具调用的预取搜索。
+    
+    Returns:
+        dict: 规范化缓存键 -> 进行中的 Future 或 asyncio.Task
+    """
+    prefetched = {}
+    with _prefetched_lock:
+        for tool_call in search_calls:
+            prefetched.update(_prefetched.pop(tool_call["id"], {}))
+    return prefetched
+
+
+def _get_search_limits(config: Optional[RunnableConfig] = None) -> tuple[int, float]:
+    """获取单个步骤的搜索并发上限和单查询超时时间。
+    
+    优先读取运行配置 config["configurable"] 中的 search_max_concurrency 和
+    search_timeout，否则读取环境变量 SEARCH_MAX_CONCURRENCY（默认 8）和
+    SEARCH_QUERY_TIMEOUT（默认 30 秒）。
+    
+    Args:
+        config: 运行配置
+        
+    Returns:
+        tuple[int, float]: (最大并发数, 单查询超时秒数)
+    """
+    configurable = (config or {}).get("configurable", {})
+    settings = get_settings().search
+    max_concurrency = configurable.get("search_max_concurrency") or settings.max_concurrency
+    timeout = configurable.get("search_timeout") or settings.query_timeout
+    return max(1, int(max_concurrency)), float(timeout)
+
+
+def _dedupe_queries(search_queries: list[str]) -> list[str]:
+    """按规范化后的查询去重，保留每个查询第一次出现时的原始写法。"""
+    unique = {}
+    for query in search_queries:
+        unique.setdefault(make_cache_key(query, SEARCH_MAX_RESULTS), query)
+    return list(unique.values())
+
+
+def _apply_budget(
+    queries: list[str],
+    timeout: float,
+    budget: Optional[RunBudget],
+    prefetched: Optional[dict] = None,
+) -> tuple[list[str], dict, float]:
+    """按运行预算裁剪本步骤的搜索。
+    
+    预算已经耗尽（截止时间已到或 token 用完）时跳过所有新的查询；否则只执行预算剩余次数内的
+    查询，其余查询记为跳过。预取的查询在开始时已经计入预算，总是保留。
+    单查询超时不超过预算的剩余时间。
+    
+    Args:
+        queries: 已去重的搜索查询列表
+        timeout: 单查询超时秒数
+        budget: 运行预算，可以为 None
+        prefetched: 规范化缓存键 -> 预取中的搜索
+        
+    Returns:
+        tuple: (要执行的查询, 规范化缓存键 -> 被跳过查询的说明, 单查询超时秒数)
+    """
+    if budget is None:
+        return queries, {}, timeout
+    prefetched = prefetched or {}
+    fresh = [q for q in queries if make_cache_key(q, SEARCH_MAX_RESULTS) not in prefetched]
+    # 搜索次数由 reserve_searches 按剩余次数裁剪，这里只检查时间和 token
+    exhausted = budget.check(include_searches=False)
+    allowed = set() if exhausted else set(fresh[: budget.reserve_searches(len(fresh))])
+    kept, skipped = [], {}
+    for query in queries:
+        key = make_cache_key(query, SEARCH_MAX_RESULTS)
+        if key in prefetched or query in allowed:
+            kept.append(query)
+        else:
+            skipped[key] = f"Search skipped: run budget exhausted ({query})"
+    remaining = budget.remaining_seconds()
+    if remaining is not None:
+        timeout = min(timeout, remaining)
+    return kept, skipped, timeout
+
+
+def _run_search_queries(
+    queries: list[str], max_concurrency: int, timeout: float, prefetched: Optional[dict] = None
+) -> dict:
+    """在共享线程池中以有界并发执行一组（已去重的）搜索查询。
+    
+    同时最多有 max_concurrency 个查询在执行；每个查询从开始执行起超过 timeout 秒
+    仍未返回时记为超时。线程池是进程级共享的，提交后可能还要排队等待工作线程，
+    排队时间不计入超时（与异步版本在获取信号量之后才计时一致）。
+    超时的查询仍会在后台完成并写入缓存，供之后的调用复用。
+    已经预取的查询直接等待进行中的 Future，不占用并发窗口。
+    
+    Args:
+        queries: 已去重的搜索查询列表
+        max_concurrency: 最大并发数
+        timeout: 单查询超时秒数
+        prefetched: 规范化缓存键 -> 预取中的 Future
+        
+    Returns:
+        dict: 规范化缓存键 -> 搜索结果（失败或超时时为错误描述字符串）
+    """
+    executor = _get_search_executor()
+    record("search_queries", len(queries))
+    # future -> (query, 开始执行时间的列表)；列表为空表示还在线程池中排队
+    in_flight: dict[Future, tuple[str, list]] = {}
+    results = {}
+    
+    pending = deque()
+    for query in queries:
+        future = (prefetched or {}).get(make_cache_key(query, SEARCH_MAX_RESULTS))
+        if isinstance(future, Future):
+            # 预取的查询早已提交，从现在起最多再等 timeout 秒
+            in_flight[future] = (query, [time.monotonic()])
+        else:
+            pending.append(query)
+    if in_flight:
+        record("search_prefetch_hits", len(in_flight))
+    
+    while pending or in_flight:
+        # 补足并发窗口
+        while pending and len(in_flight) < max_concurrency:
+            query = pending.popleft()
+            started = []
+            # 在复制的上下文中执行，节点插桩的 record() 才能在工作线程中生效
+            future = executor.submit(
+                contextvars.copy_context().run, _search_query_from_queue, query, time.monotonic(), started
+            )
+            in_flight[future] = (query, started)
+        
+        # 等待任一查询完成，或最近的一个查询超时；排队中的查询最早也要 timeout 秒后才会超时
+        now = time.monotonic()
+        next_deadline = min(
+            [started[0] + timeout for _, started in in_flight.values() if started] + [now + timeout]
+        )
+        done, _ = wait(
+            in_flight,
+            timeout=max(0.0, next_deadline - now),
+            return_when=FIRST_COMPLETED,
+        )
+        for future in done:
+            query, _ = in_flight.pop(future)
+            try:
+                results[make_cache_key(query, SEARCH_MAX_RESULTS)] = future.result()
+            except Exception as e:
+                results[make_cache_key(query, SEARCH_MAX_RESULTS)] = repr(e)
+        
+        now = time.monotonic()
+        for future, (query, started) in list(in_flight.items()):
+            if started and started[0] + timeout <= now:
+                del in_flight[future]
+                results[make_cache_key(query, SEARCH_MAX_RESULTS)] = repr(
+                    TimeoutError(f"Search query timed out after {timeout}s: {query}")
+                )
+    
+    return results
 
 
-def _create_search_tool():
-    """创建 Tavily 搜索工具。
+async def _arun_search_queries(
+    queries: list[str], max_concurrency: int, timeout: float, prefetched: Optional[dict] = None
+) -> dict:
+    """以有界并发执行一组（已去重的）搜索查询（异步版本）。
     
+    Args:
+        queries: 已去重的搜索查询列表
+        max_concurrency: 最大并发数
+        timeout: 单查询超时秒数
+        prefetched: 规范化缓存键 -> 预取中的 asyncio.Task
+        
     Returns:
-        TavilySearchResults: 配置好的搜索工具实例
+        dict: 规范化缓存键 -> 搜索结果（失败或超时时为错误描述字符串）
     """
-    # 初始化 Tavily 搜索 API 包装器
-    # Tavily 是一个专业的搜索 API，用于获取高质量的搜索结果
-    search = TavilySearchAPIWrapper()
-    # 创建 Tavily 搜索工具，限制最多返回 5 个结果
-    tavily_tool = TavilySearchResults(api_wrapper=search, max_results=5)
-    return tavily_tool
+    semaphore = asyncio.Semaphore(max_concurrency)
+    record("search_queries", len(queries))
+    prefetched = {
+        key: task for key, task in (prefetched or {}).items() if isinstance(task, asyncio.Future)
+    }
+    if prefetched:
+        record("search_prefetch_hits", len(prefetched))
+    
+    async def run(query: str):
+        task = prefetched.get(make_cache_key(query, SEARCH_MAX_RESULTS))
+        if task is not None:
+            try:
+                # shield：超时只放弃等待，预取的搜索继续完成并写入缓存
+                return await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                return repr(TimeoutError(f"Search query timed out after {timeout}s: {query}"))
+            except Exception as e:
+                return repr(e)
+        queued_at = time.monotonic()
+        async with semaphore:
+            record("search_queue_wait_seconds", time.monotonic() - queued_at)
+            try:
+                # 超时只取消本次等待，单飞合并中的上游请求会继续完成并写入缓存
+                return await asyncio.wait_for(_asearch_query(query), timeout)
+            except asyncio.TimeoutError:
+                return repr(TimeoutError(f"Search query timed out after {timeout}s: {query}"))
+            except Exception as e:
+                return repr(e)
+    
+    outputs = await asyncio.gather(*(run(query) for query in queries))
+    return {
+        make_cache_key(query, SEARCH_MAX_RESULTS): output
+        for query, output in zip(queries, outputs)
+    }
 
 
 def _execute_search_queries_internal(search_queries: list[str]) -> list:
     """内部搜索执行函数。
     
     实际的搜索逻辑实现，由工具函数调用。
+    每个查询依次经过搜索缓存、单飞合并和共享连接池的搜索客户端，
+    多个查询以有界并发执行。
     
     Args:
         search_queries: 要执行的搜索查询列表
@@ -38,12 +412,22 @@ def _execute_search_queries_internal(search_queries: list[str]) -> list:
     Returns:
         list: 搜索结果列表，每个元素对应一个查询的结果
     """
-    # 获取搜索工具实例
-    tavily_tool = _create_search_tool()
+    results = _run_search_queries(_dedupe_queries(search_queries), *_get_search_limits())
+    return [results[make_cache_key(query, SEARCH_MAX_RESULTS)] for query in search_queries]
+
+
+async def _aexecute_search_queries_internal(search_queries: list[str]) -> list:
+    """内部搜索执行函数（异步版本）。
     
-    # 批量执行搜索查询
-    # 将查询列表转换为字典列表格式，供 Tavily 工具使用
-    return tavily_tool.batch([{"query": query} for query in search_queries])
+    Args:
+        search_queries: 要执行的搜索查询列表
+        
+    Returns:
+        list: 搜索结果列表，每个元素对应一个查询的结果
+    """
+    # 所有查询并发执行，等待期间不占用工作线程
+    results = await _arun_search_queries(_dedupe_queries(search_queries), *_get_search_limits())
+    return [results[make_cache_key(query, SEARCH_MAX_RESULTS)] for query in search_queries]
 
 
 def _answer_question_tool_function(
@@ -72,13 +456,24 @@ def _answer_question_tool_function(
     return _execute_search_queries_internal(search_queries)
 
 
+async def _aanswer_question_tool_function(
+    answer: str,
+    reflection: dict,
+    search_queries: list[str],
+) -> list:
+    """AnswerQuestion 工具的异步执行函数，供 ainvoke 路径使用。"""
+    return await _aexecute_search_queries_internal(search_queries)
+
+
 # args_schema 用于指定工具（tool）参数的 Pydantic 数据模型（schema）。
 # 这样可以对 LLM 工具调用时输入参数进行校验和类型约束，确保参数结构正确。
 # 本例中，AnswerQuestion 是一个继承自 BaseModel 的 schema，定义了 answer、reflection、search_queries 等字段。
 # LLM 在调用工具时，会按该 schema 格式传递并校验参数。
 # 使用 StructuredTool.from_function 可以显式设置工具名称为 "AnswerQuestion"
+# coroutine 参数提供异步实现，ToolNode.ainvoke 会优先使用它
 answer_question_tool = StructuredTool.from_function(
     func=_answer_question_tool_function,
+    coroutine=_aanswer_question_tool_function,
     name="AnswerQuestion",
     description="执行搜索查询以获取信息，用于回答问题和生成初始答案。",
     args_schema=AnswerQuestion,
@@ -113,9 +508,20 @@ def _revise_answer_tool_function(
     return _execute_search_queries_internal(search_queries)
 
 
+async def _arevise_answer_tool_function(
+    answer: str,
+    reflection: dict,
+    search_queries: list[str],
+    references: list[str],
+) -> list:
+    """ReviseAnswer 工具的异步执行函数，供 ainvoke 路径使用。"""
+    return await _aexecute_search_queries_internal(search_queries)
+
+
 # 使用 StructuredTool.from_function 可以显式设置工具名称为 "ReviseAnswer"
 revise_answer_tool = StructuredTool.from_function(
     func=_revise_answer_tool_function,
+    coroutine=_arevise_answer_tool_function,
     name="ReviseAnswer",
     description="执行搜索查询以获取信息，用于修订和改进答案。",
     args_schema=ReviseAnswer,
@@ -139,6 +545,9 @@ def _create_tool_node():
     # 使用 StructuredTool.from_function 创建的工具实例
     # 工具名称通过 name="..." 参数显式设置为 Schema 类名（"AnswerQuestion" 和 "ReviseAnswer"）
     # ToolNode 内部会创建一个 {tool.name: tool} 的映射字典，用于匹配工具调用
+    # langgraph.prebuilt 只在第一次需要 ToolNode 时导入，不计入包的导入时间
+    from langgraph.prebuilt import ToolNode
+
     tool_node = ToolNode(
         [
             answer_question_tool,  # 工具名称: "AnswerQuestion"（通过 StructuredTool.from_function 显式设置）
@@ -149,8 +558,11 @@ def _create_tool_node():
     return tool_node
 
 
+# 由 execute_tools 节点直接汇总执行查询的搜索工具名称
+_SEARCH_TOOL_NAMES = {answer_question_tool.name, revise_answer_tool.name}
+
 # 创建工具节点实例（延迟初始化，避免在导入时创建）
-_tool_node_instance = None
+_tool_node_instance = LazySingleton(_create_tool_node, name="tool_node")
 
 
 def _get_tool_node():
@@ -159,37 +571,18 @@ def _get_tool_node():
     Returns:
         ToolNode: 工具节点实例
     """
-    global _tool_node_instance
-    if _tool_node_instance is None:
-        _tool_node_instance = _create_tool_node()
-    return _tool_node_instance
+    return _tool_node_instance.get()
 
 
-def execute_tools_node(state: dict) -> dict:
-    """工具执行节点。
-    
-    这个节点执行 LLM 生成的搜索查询，使用 Tavily 搜索工具
-    来获取相关信息以改进答案。
+def _wrap_tool_node_result(result) -> dict:
+    """将 ToolNode 的返回值包装成 StateGraph 期望的格式。
     
     Args:
-        state: 当前状态字典，包含 messages 键（消息列表）
+        result: ToolNode 的 invoke/ainvoke 返回值
         
     Returns:
-        dict: 包含工具执行结果的状态更新
+        dict: {"messages": [...]} 格式的状态更新
     """
-    # 从状态中提取消息列表
-    messages = state.get("messages", [])
-    
-    # 获取工具节点实例
-    tool_node = _get_tool_node()
-    
-    # tool_node 是一个 ToolNode 实例，它会：
-    # 1. 检测消息中的工具调用
-    # 2. 执行对应的工具（这里是搜索查询）
-    # 3. 返回工具执行结果（消息列表）
-    # 注意：ToolNode.invoke() 在 StateGraph 节点中调用时，需要传入消息列表
-    result = tool_node.invoke(messages)
-    
     # ToolNode 返回的是消息列表，我们需要包装成 StateGraph 期望的格式
     # 确保 result 是列表格式
     if isinstance(result, list):
@@ -199,7 +592,220 @@ def execute_tools_node(state: dict) -> dict:
         return result
     else:
         # 其他情况，包装成列表
-        from langchain_core.messages import BaseMessage
         if isinstance(result, BaseMessage):
             return {"messages": [result]}
         return {"messages": []}
+
+
+def _split_tool_calls(messages: list) -> tuple[Optional[AIMessage], list, list]:
+    """从最后一条 AIMessage 中拆分出搜索工具调用和其他工具调用。
+    
+    Args:
+        messages: 消息列表
+        
+    Returns:
+        tuple: (最后一条 AIMessage, 搜索工具调用列表, 其他工具调用列表)
+    """
+    last_ai = next((m for m in reversed(messages) if isinstance(m, AIMessage)), None)
+    if last_ai is None:
+        return None, [], []
+    search_calls, other_calls = [], []
+    for tool_call in last_ai.tool_calls:
+        if tool_call["name"] in _SEARCH_TOOL_NAMES:
+            search_calls.append(tool_call)
+        else:
+            other_calls.append(tool_call)
+    return last_ai, search_calls, other_calls
+
+
+def _collect_queries(search_calls: list) -> list[str]:
+    """收集所有搜索工具调用中的查询，并按规范化后的查询去重。"""
+    queries = []
+    for tool_call in search_calls:
+        queries.extend(tool_call["args"].get("search_queries") or [])
+    return _dedupe_queries(queries)
+
+
+def _get_result_shaper(config: Optional[RunnableConfig]):
+    """获取本次运行的搜索结果整形器。
+    
+    整形器可以通过 config["configurable"]["result_shaper"] 按运行替换；
+    显式传入 None 表示不整形。未指定时使用默认整形器（见 infra.result_store）。
+    """
+    configurable = (config or {}).get("configurable", {})
+    return configurable.get("result_shaper", get_default_result_shaper())
+
+
+def _count_results(per_query: list) -> int:
+    return sum(len(results) for results in per_query if isinstance(results, list))
+
+
+def _seen_urls(state: dict) -> frozenset:
+    """之前轮次已经返回过的结果 URL。
+
+    读取由 reducer（track_result_urls）维护的 result_urls；状态中没有时从消息历史计算。
+    """
+    urls = state.get("result_urls")
+    if urls is None:
+        return frozenset(seen_result_urls(state.get("messages", [])))
+    return urls
+
+
+def _build_tool_messages(
+    search_calls: list, results: dict, shaper=None, seen_urls: Optional[set] = None
+) -> list[ToolMessage]:
+    """将去重后的搜索结果映射回各个工具调用，生成对应的 ToolMessage。
+    
+    提供整形器时，结果先经过整形：与之前轮次和本步骤中已经出现过的 URL 去重、
+    正文截断为片段，完整结果写入内容寻址存储，ToolMessage 中只保留引用。
+    
+    Args:
+        search_calls: 搜索工具调用列表
+        results: 规范化缓存键 -> 搜索结果
+        shaper: 搜索结果整形器，为 None 时原样序列化
+        seen_urls: 之前轮次已经返回过的 URL，用于跨轮次的 URL 去重；整形时会加入本步骤的新 URL
+        
+    Returns:
+        list[ToolMessage]: 每个工具调用对应一条 ToolMessage
+    """
+    if seen_urls is None:
+        seen_urls = set()
+    tool_messages = []
+    for tool_call in search_calls:
+        output = [
+            results[make_cache_key(query, SEARCH_MAX_RESULTS)]
+            for query in tool_call["args"].get("search_queries") or []
+        ]
+        if shaper is not None:
+            before = _count_results(output)
+            output = shaper(output, seen_urls)
+            record("search_results_deduped", before - _count_results(output))
+        tool_messages.append(
+            ToolMessage(
+                # 与 ToolNode 的序列化方式保持一致
+                content=json.dumps(output, ensure_ascii=False),
+                name=tool_call["name"],
+                tool_call_id=tool_call["id"],
+            )
+        )
+    return tool_messages
+
+
+def _messages_for_tool_node(messages: list, last_ai: AIMessage, other_calls: list) -> list:
+    """构造只包含非搜索工具调用的消息列表，交给 ToolNode 处理（包括未知工具的报错）。"""
+    return messages[:-1] + [last_ai.model_copy(update={"tool_calls": other_calls})]
+
+
+def _tool_step_update(
+    tool_messages: list, budget: Optional[RunBudget] = None, new_urls: Optional[set] = None
+) -> dict:
+    """构造工具执行步骤的状态更新：新消息、迭代计数、节点计数增量和本步骤新返回的结果 URL，
+    有预算时附带预算消耗。"""
+    # iterations、node_counts 和 result_urls 都是增量，由 ReflexionState 的 reducer 合并
+    update = {
+        "messages": tool_messages,
+        "iterations": 1,
+        "node_counts": {"execute_tools": 1},
+    }
+    if new_urls:
+        update["result_urls"] = frozenset(new_urls)
+    if budget is not None:
+        update["budget_usage"] = budget.usage()
+    return update
+
+
+def execute_tools_node(state: dict, config: Optional[RunnableConfig] = None) -> dict:
+    """工具执行节点。
+    
+    这个节点执行 LLM 生成的搜索查询，使用 Tavily 搜索工具
+    来获取相关信息以改进答案。
+    
+    最后一条 AIMessage 中所有 AnswerQuestion/ReviseAnswer 工具调用的查询会被
+    汇总、去重，然后通过同一个有界并发执行器一起执行，一个步骤的耗时约等于
+    最慢的单个查询，而不是各批次耗时之和。结果再按查询映射回各自的 ToolMessage。
+    draft 节点已经推测式预取的查询（见 prefetch_search）直接使用进行中的搜索。
+    写入 ToolMessage 之前，结果经过整形阶段（见 infra.result_store），状态中只保留
+    去重后的摘要片段和完整结果的引用。
+    
+    Args:
+        state: 当前状态字典，包含 messages 键（消息列表）
+        config: 运行配置，可通过 configurable 中的 search_max_concurrency 和
+            search_timeout 覆盖并发上限和单查询超时；budget 为运行预算（见 infra.budget），
+            超出预算剩余次数的查询会被跳过；result_shaper 替换或（传入 None）关闭结果整形
+        
+    Returns:
+        dict: 包含工具执行结果、迭代计数和节点计数增量的状态更新
+    """
+    # 从状态中提取消息列表
+    messages = state.get("messages", [])
+    last_ai, search_calls, other_calls = _split_tool_calls(messages)
+    budget = get_run_budget(config)
+    
+    tool_messages = []
+    new_urls = None
+    if search_calls:
+        max_concurrency, timeout = _get_search_limits(config)
+        prefetched = _take_prefetched(search_calls)
+        queries, skipped, timeout = _apply_budget(
+            _collect_queries(search_calls), timeout, budget, prefetched
+        )
+        results = _run_search_queries(queries, max_concurrency, timeout, prefetched) if queries else {}
+        previous_urls = _seen_urls(state)
+        seen_urls = set(previous_urls)
+        tool_messages.extend(
+            _build_tool_messages(search_calls, {**results, **skipped}, _get_result_shaper(config), seen_urls)
+        )
+        new_urls = seen_urls - previous_urls
+    
+    if other_calls:
+        # 其他工具调用仍由 ToolNode 处理
+        result = _get_tool_node().invoke(
+            _messages_for_tool_node(messages, last_ai, other_calls), config
+        )
+        tool_messages.extend(_wrap_tool_node_result(result)["messages"])
+    
+    return _tool_step_update(tool_messages, budget, new_urls)
+
+
+async def aexecute_tools_node(state: dict, config: Optional[RunnableConfig] = None) -> dict:
+    """工具执行节点（异步版本）。
+    
+    与 execute_tools_node 逻辑相同，查询通过 asyncio 以有界并发执行。
+    
+    Args:
+        state: 当前状态字典，包含 messages 键（消息列表）
+        config: 运行配置
+        
+    Returns:
+        dict: 包含工具执行结果的状态更新
+    """
+    messages = state.get("messages", [])
+    last_ai, search_calls, other_calls = _split_tool_calls(messages)
+    budget = get_run_budget(config)
+    
+    tool_messages = []
+    new_urls = None
+    if search_calls:
+        max_concurrency, timeout = _get_search_limits(config)
+        prefetched = _take_prefetched(search_calls)
+        queries, skipped, timeout = _apply_budget(
+            _collect_queries(search_calls), timeout, budget, prefetched
+        )
+        results = (
+            await _arun_search_queries(queries, max_concurrency, timeout, prefetched) if queries else {}
+        )
+        previous_urls = _seen_urls(state)
+        seen_urls = set(previous_urls)
+        tool_messages.extend(
+            _build_tool_messages(search_calls, {**results, **skipped}, _get_result_shaper(config), seen_urls)
+        )
+        new_urls = seen_urls - previous_urls
+    
+    if other_calls:
+        tool_node = await _tool_node_instance.aget()
+        result = await tool_node.ainvoke(
+            _messages_for_tool_node(messages, last_ai, other_calls), config
+        )
+        tool_messages.extend(_wrap_tool_node_result(result)["messages"])
+    
+    return _tool_step_update(tool_messages, budget, new_urls)
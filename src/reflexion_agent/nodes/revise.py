@@ -4,17 +4,38 @@
 该模块自包含所有需要的逻辑，不依赖其他链模块。
 """
 
+from typing import Optional
+
 from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
 
 from reflexion_agent.infra import (
     REVISE_INSTRUCTIONS,
     create_actor_prompt_template,
+    get_default_compactor,
     get_llm_instance,
 )
+from reflexion_agent.infra.budget import (
+    DeadlineExceeded,
+    acall_with_deadline,
+    best_answer_message,
+    call_with_deadline,
+    charge_llm_tokens,
+    get_run_budget,
+)
+from reflexion_agent.infra.llm_pool import get_llm_pool, llm_spec_from_config
+from reflexion_agent.infra.rate_limit import acall_llm_limited, call_llm_limited
+from reflexion_agent.infra.singleton import LazySingleton
 from reflexion_agent.nodes.execute_tools import revise_answer_tool
+from reflexion_agent.nodes.stopping import latest_answer
+from reflexion_agent.nodes.streaming import (
+    ainvoke_streaming_answer,
+    invoke_streaming_answer,
+    stream_answer_enabled,
+)
 
 
-def _create_revisor_chain():
+def _create_revisor_chain(llm=None):
     """创建答案修订链。
     
     这个链用于基于新信息和批评修订初始答案，包括：
@@ -23,11 +44,14 @@ def _create_revisor_chain():
     - 确保答案不超过 250 字
     - 添加引用部分
     
+    Args:
+        llm: 链绑定的模型，为 None 时使用全局 LLM 实例
+    
     Returns:
         Runnable: 配置好的链，可以处理消息并返回修订后的答案
     """
     # 获取 LLM 实例
-    llm = get_llm_instance()
+    llm = llm or get_llm_instance()
     
     # 获取提示模板
     actor_prompt_template = create_actor_prompt_template()
@@ -42,64 +66,186 @@ def _create_revisor_chain():
     return revisor
 
 
-# 创建链实例（延迟初始化，避免在导入时创建）
-_revisor_chain = None
+# 创建链实例（延迟初始化，避免在导入时创建；并发冷启动时只创建一次）
+_revisor_chain = LazySingleton(_create_revisor_chain, name="revisor")
 
 
-def _get_revisor_chain():
-    """获取 revisor 链实例（单例模式）。
+def _get_revisor_chain(config: Optional[RunnableConfig] = None):
+    """获取 revisor 链实例。
+    
+    运行配置的 configurable 中指定了 llm（见 infra.llm_pool）时，返回模型池中绑定在该模型上的链；
+    否则返回绑定在全局 LLM 实例上的链（单例模式）。
+    
+    Args:
+        config: 运行配置
     
     Returns:
         Runnable: revisor 链实例
     """
-    global _revisor_chain
-    if _revisor_chain is None:
-        _revisor_chain = _create_revisor_chain()
-    return _revisor_chain
+    spec = llm_spec_from_config(config)
+    if spec is not None:
+        return get_llm_pool().get_chain(spec, "revisor", _create_revisor_chain)
+    return _revisor_chain.get()
 
 
-def revise_node(state: dict) -> dict:
-    """答案修订节点。
+async def _aget_revisor_chain(config: Optional[RunnableConfig] = None):
+    """异步获取 revisor 链实例，首次创建（LLM 客户端和链）在线程中执行，不阻塞事件循环。
     
-    这个节点使用 revisor 链来基于新信息修订初始答案。
-    修订后的答案会包含引用和改进后的内容。
+    Args:
+        config: 运行配置
+    
+    Returns:
+        Runnable: revisor 链实例
+    """
+    spec = llm_spec_from_config(config)
+    if spec is not None:
+        return await get_llm_pool().aget_chain(spec, "revisor", _create_revisor_chain)
+    return await _revisor_chain.aget()
+
+
+def _normalize_response(response) -> list:
+    """将链的返回值规范化为消息对象列表。
     
     Args:
-        state: 当前状态字典，包含 messages 键（消息列表）
+        response: 链的 invoke/ainvoke 返回值
         
     Returns:
-        dict: 包含修订后答案的状态更新
+        list: 消息对象列表
     """
-    # 从状态中提取消息列表
-    messages = state.get("messages", [])
-    
-    # 获取 revisor 链
-    revisor = _get_revisor_chain()
-    
-    # revisor 是一个 LangChain Runnable，用于修订答案
-    # 它会基于之前的答案、反思和新搜索到的信息生成修订版本
-    # 注意：当使用 init_chat_model 时，invoke 返回的是单个 AIMessage 对象
-    response = revisor.invoke(messages)
-    
-    # 确保返回的是消息对象列表
-    # response 应该是一个 AIMessage 对象，需要包装在列表中
-    from langchain_core.messages import BaseMessage
-    
     # 处理返回值：确保是消息对象列表
     # 根据 LangChain 文档，链的 invoke 方法应该返回单个消息对象或消息列表
     if isinstance(response, BaseMessage):
         # 单个消息对象，直接包装在列表中
-        messages = [response]
-    elif isinstance(response, list):
+        return [response]
+    if isinstance(response, list):
         # 如果已经是列表，确保所有元素都是消息对象
         messages = [msg for msg in response if isinstance(msg, BaseMessage)]
         # 如果过滤后列表为空，说明列表中的元素不是消息对象，抛出错误
         if not messages and response:
             raise ValueError(f"Response list contains non-message objects: {[type(x).__name__ for x in response]}")
+        return messages
+    # 其他类型，尝试作为单个消息处理（可能不应该发生）
+    # 但为了兼容性，尝试转换
+    return [response]
+
+
+def _compact_messages(messages: list, config: Optional[RunnableConfig]) -> list:
+    """在调用 revisor 链之前压缩消息历史。
+    
+    压缩器可以通过 config["configurable"]["compactor"] 按运行替换；
+    显式传入 None 表示不压缩。未指定时使用默认压缩器。
+    
+    Args:
+        messages: 完整的消息历史
+        config: 运行配置
+        
+    Returns:
+        list: 发送给 LLM 的消息列表
+    """
+    configurable = (config or {}).get("configurable", {})
+    compactor = configurable.get("compactor", get_default_compactor())
+    if compactor is None:
+        return messages
+    return compactor(messages)
+
+
+def revise_node(state: dict, config: Optional[RunnableConfig] = None) -> dict:
+    """答案修订节点。
+    
+    这个节点使用 revisor 链来基于新信息修订初始答案。
+    修订后的答案会包含引用和改进后的内容。
+    发送给 LLM 之前，消息历史会先经过压缩阶段（见 infra.compaction），
+    避免提示词随迭代次数无限增长。
+    运行预算（见 infra.budget）已经耗尽或在等待 LLM 时到达截止时间，
+    节点不会抛出异常，而是沿用目前最好的答案，路由函数随后结束运行。
+    
+    Args:
+        state: 当前状态字典，包含 messages 键（消息列表）
+        config: 运行配置，可通过 configurable 中的 compactor 替换或关闭压缩器；
+            stream_answer 为 True 时流式输出答案（见 nodes.streaming）；budget 为运行预算；
+            llm 指定本次运行使用的模型（见 infra.llm_pool）
+        
+    Returns:
+        dict: 包含修订后答案、节点计数增量和答案进度的状态更新；有预算时还包含 budget_usage
+    """
+    history = state.get("messages", [])
+    budget = get_run_budget(config)
+    
+    # 获取 revisor 链（按运行配置选择模型）
+    revisor = _get_revisor_chain(config)
+    
+    reason = budget.check(include_searches=False) if budget is not None else None
+    if reason:
+        new_messages = best_answer_message(history, reason)
     else:
-        # 其他类型，尝试作为单个消息处理（可能不应该发生）
-        # 但为了兼容性，尝试转换
-        messages = [response]
+        # 从状态中提取消息列表，并压缩为发送给 LLM 的上下文
+        messages = _compact_messages(history, config)
+        
+        # revisor 是一个 LangChain Runnable，用于修订答案
+        # 它会基于之前的答案、反思和新搜索到的信息生成修订版本
+        # 注意：当使用 init_chat_model 时，invoke 返回的是单个 AIMessage 对象
+        def invoke():
+            if stream_answer_enabled(config):
+                return invoke_streaming_answer(revisor, messages, "revise")
+            return revisor.invoke(messages)
+        
+        try:
+            response = call_with_deadline(budget, lambda: call_llm_limited(invoke, messages))
+            new_messages = _normalize_response(response)
+            charge_llm_tokens(budget, messages, new_messages)
+        except DeadlineExceeded:
+            new_messages = best_answer_message(history, budget.check())
     
     # StateGraph 期望的返回值格式：{"messages": [Message, ...]}
-    return {"messages": messages}
+    # node_counts 是增量，由 ReflexionState 的 reducer 累加；
+    # answer_progress 是本轮的答案参数，由 reducer 合并为停止策略读取的进度摘要
+    update = {
+        "messages": new_messages,
+        "node_counts": {"revise": 1},
+        "answer_progress": latest_answer(new_messages),
+    }
+    if budget is not None:
+        update["budget_usage"] = budget.usage()
+    return update
+
+
+async def arevise_node(state: dict, config: Optional[RunnableConfig] = None) -> dict:
+    """答案修订节点（异步版本）。
+    
+    与 revise_node 逻辑相同，但通过 ainvoke 调用 revisor 链。
+    
+    Args:
+        state: 当前状态字典，包含 messages 键（消息列表）
+        config: 运行配置
+        
+    Returns:
+        dict: 包含修订后答案、节点计数增量和答案进度的状态更新；有预算时还包含 budget_usage
+    """
+    history = state.get("messages", [])
+    budget = get_run_budget(config)
+    revisor = await _aget_revisor_chain(config)
+    reason = budget.check(include_searches=False) if budget is not None else None
+    if reason:
+        new_messages = best_answer_message(history, reason)
+    else:
+        messages = _compact_messages(history, config)
+        
+        async def ainvoke():
+            if stream_answer_enabled(config):
+                return await ainvoke_streaming_answer(revisor, messages, "revise")
+            return await revisor.ainvoke(messages)
+        
+        try:
+            response = await acall_with_deadline(budget, lambda: acall_llm_limited(ainvoke, messages))
+            new_messages = _normalize_response(response)
+            charge_llm_tokens(budget, messages, new_messages)
+        except DeadlineExceeded:
+            new_messages = best_answer_message(history, budget.check())
+    update = {
+        "messages": new_messages,
+        "node_counts": {"revise": 1},
+        "answer_progress": latest_answer(new_messages),
+    }
+    if budget is not None:
+        update["budget_usage"] = budget.usage()
+    return update
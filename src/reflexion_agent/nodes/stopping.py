@@ -0,0 +1,226 @@
+"""提前终止策略实现。
+
+默认情况下事件循环固定执行 max_iterations 轮。停止策略在每次 revise 之后检查状态，
+当继续迭代已经不太可能带来改进时提前结束循环，节省整轮 LLM + 搜索调用：
+- answer_converged: 相邻两次答案几乎相同（词级 shingle 的 Jaccard 相似度）
+- empty_missing_critique: 最新反思中的 missing 批评为空
+- no_new_queries: 最新一轮没有提出新的搜索查询（或只有已经搜索过的查询）
+
+策略是接收状态、返回停止原因（不停止时返回 None）的可调用对象，可以用 any_of 组合：
+
+    graph = create_reflexion_graph(max_iterations=4, stopping_policy=DEFAULT_STOPPING_POLICY)
+
+策略是无状态的，各个工厂函数对相同的参数返回同一个策略对象，get_reflexion_graph 按策略对象
+缓存编译后的图，每个请求重新调用 default_stopping_policy() 也能命中缓存。
+
+策略读取状态中由 reducer（track_answers）增量维护的 answer_progress：上一次和最新的答案、
+最新的 missing 批评和查询，以及之前各轮已经提出过的查询。draft / revise 节点每次只写入本轮的
+答案参数，路由时不再扫描整个消息历史。状态中没有 answer_progress 时（例如在只有 messages 的
+自定义图中使用），退回到从消息历史计算。
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from reflexion_agent.infra.search_cache import normalize_query
+
+# 停止策略：接收状态，返回停止原因；返回 None 表示继续迭代
+StoppingPolicy = Callable[[dict], Optional[str]]
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _answer_args(message: BaseMessage) -> Optional[dict]:
+    """返回消息中带答案的工具调用参数，不是答案消息时返回 None。"""
+    if isinstance(message, AIMessage) and message.tool_calls:
+        args = message.tool_calls[0].get("args") or {}
+        if "answer" in args:
+            return args
+    return None
+
+
+def latest_answer(messages: Sequence[BaseMessage]) -> Optional[dict]:
+    """返回节点新生成的消息中最后一个带答案的工具调用参数，写入状态的 answer_progress。
+
+    Args:
+        messages: draft / revise 节点本轮返回的消息
+
+    Returns:
+        Optional[dict]: 工具调用参数（answer、reflection、search_queries 等），没有答案时为 None
+    """
+    for message in reversed(messages):
+        args = _answer_args(message)
+        if args is not None:
+            return args
+    return None
+
+
+def track_answers(left: Optional[dict], right: Optional[dict]) -> dict:
+    """answer_progress 的 reducer：把本轮的答案参数合并到进度摘要中。
+
+    摘要只保留停止策略需要的字段，每轮的开销与本轮的查询数成正比，与消息历史的长度无关：
+    - previous_answer / answer: 上一次和最新的答案文本
+    - missing: 最新反思中的 missing 批评
+    - queries: 最新一轮提出的查询（规范化后）
+    - seen_queries: 之前各轮提出过的查询（规范化后，不含最新一轮）
+    - count: 已经记录的答案数
+
+    Args:
+        left: 当前进度摘要
+        right: 节点本轮写入的答案工具调用参数
+
+    Returns:
+        dict: 合并后的进度摘要
+    """
+    left = left or {}
+    if not right:
+        return left
+    reflection = right.get("reflection") or {}
+    return {
+        "previous_answer": left.get("answer"),
+        "answer": str(right.get("answer") or ""),
+        "missing": str((reflection.get("missing") if isinstance(reflection, dict) else None) or ""),
+        "queries": frozenset(normalize_query(q) for q in right.get("search_queries") or []),
+        "seen_queries": frozenset(left.get("seen_queries") or ()) | (left.get("queries") or frozenset()),
+        "count": left.get("count", 0) + 1,
+    }
+
+
+def _answer_progress(state: dict) -> dict:
+    """读取答案进度摘要；状态中没有时从消息历史计算。"""
+    progress = state.get("answer_progress")
+    if progress is None:
+        progress = {}
+        for message in state.get("messages", []):
+            progress = track_answers(progress, _answer_args(message))
+    return progress
+
+
+def shingles(text: str, size: int = 3) -> set[tuple[str, ...]]:
+    """把文本切分为词级 shingle（连续 size 个词）集合。
+
+    Args:
+        text: 文本
+        size: 每个 shingle 的词数
+
+    Returns:
+        set: shingle 集合；词数少于 size 时整段文本作为一个 shingle
+    """
+    words = _WORD_PATTERN.findall(text.casefold())
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard_similarity(a: str, b: str, size: int = 3) -> float:
+    """计算两段文本 shingle 集合的 Jaccard 相似度。
+
+    Args:
+        a: 文本 a
+        b: 文本 b
+        size: 每个 shingle 的词数
+
+    Returns:
+        float: 0 到 1 之间的相似度，两段文本都为空时为 1
+    """
+    shingles_a, shingles_b = shingles(a, size), shingles(b, size)
+    if not shingles_a and not shingles_b:
+        return 1.0
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+@lru_cache(maxsize=64)
+def answer_converged(threshold: float = 0.9, shingle_size: int = 3) -> StoppingPolicy:
+    """相邻两次答案的相似度达到阈值时停止。
+
+    Args:
+        threshold: Jaccard 相似度阈值
+        shingle_size: 每个 shingle 的词数
+
+    Returns:
+        StoppingPolicy: 停止策略
+    """
+
+    def policy(state: dict) -> Optional[str]:
+        progress = _answer_progress(state)
+        if progress.get("count", 0) < 2:
+            return None
+        similarity = jaccard_similarity(progress["previous_answer"] or "", progress["answer"], shingle_size)
+        return "answer_converged" if similarity >= threshold else None
+
+    return policy
+
+
+@lru_cache(maxsize=64)
+def empty_missing_critique() -> StoppingPolicy:
+    """最新反思的 missing 批评为空时停止。
+
+    Returns:
+        StoppingPolicy: 停止策略
+    """
+
+    def policy(state: dict) -> Optional[str]:
+        progress = _answer_progress(state)
+        if not progress.get("count"):
+            return None
+        return "empty_missing_critique" if not progress["missing"].strip() else None
+
+    return policy
+
+
+@lru_cache(maxsize=64)
+def no_new_queries() -> StoppingPolicy:
+    """最新一轮没有提出新的搜索查询时停止（按规范化后的查询比较）。
+
+    Returns:
+        StoppingPolicy: 停止策略
+    """
+
+    def policy(state: dict) -> Optional[str]:
+        progress = _answer_progress(state)
+        if progress.get("count", 0) < 2:
+            return None
+        return "no_new_queries" if progress["queries"] <= progress["seen_queries"] else None
+
+    return policy
+
+
+@lru_cache(maxsize=64)
+def any_of(*policies: StoppingPolicy) -> StoppingPolicy:
+    """组合多个策略：任一策略给出停止原因时停止。
+
+    Args:
+        *policies: 停止策略
+
+    Returns:
+        StoppingPolicy: 组合后的停止策略，返回第一个命中的停止原因
+    """
+
+    def policy(state: dict) -> Optional[str]:
+        for inner in policies:
+            reason = inner(state)
+            if reason:
+                return reason
+        return None
+
+    return policy
+
+
+@lru_cache(maxsize=64)
+def default_stopping_policy(threshold: float = 0.9) -> StoppingPolicy:
+    """默认的组合策略：答案收敛、missing 批评为空或没有新查询时停止。
+
+    Args:
+        threshold: 答案收敛的 Jaccard 相似度阈值
+
+    Returns:
+        StoppingPolicy: 停止策略
+    """
+    return any_of(answer_converged(threshold), empty_missing_critique(), no_new_queries())
+
+
+# 默认策略的共享实例
+DEFAULT_STOPPING_POLICY = default_stopping_policy()
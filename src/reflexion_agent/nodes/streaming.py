@@ -0,0 +1,352 @@
+"""答案流式输出实现。
+
+draft 和 revise 节点默认通过 invoke 一次性拿到完整的工具调用消息。启用流式输出后
+（config["configurable"]["stream_answer"] 为 True），节点改为调用链的 stream/astream，
+在模型生成工具调用参数的同时增量解析 JSON，把 answer 字段新生成的文本通过 LangGraph
+的自定义流（stream_mode="custom"）发送给客户端：
+
+    for event in graph.stream(inputs, {"configurable": {"stream_answer": True}}, stream_mode="custom"):
+        print(event["delta"], end="")
+
+每个事件的格式为 {"type": "answer_delta", "node": "draft" | "revise", "delta": "..."}。
+节点返回的最终消息与 invoke 路径完全相同。
+
+同一套增量解析也用于推测式搜索预取（config["configurable"]["speculative_search"] 为 True）：
+draft 生成 search_queries 中的每个查询字符串后立即开始搜索，与剩余的生成过程重叠。
+"""
+
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessageChunk, BaseMessage, message_chunk_to_message
+from langchain_core.messages.ai import add_ai_message_chunks
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableSequence
+from langgraph.config import get_stream_writer
+
+# JSON 字符串中单字符转义序列的含义
+_SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class _IncrementalJsonParser:
+    """增量解析工具调用参数 JSON 的公共部分。
+
+    参数按任意长度的片段输入，解析器只维护容器栈、字符串和转义状态，每个字符只处理一次，
+    不会像 parse_partial_json 那样每来一个片段都重新解析整个前缀。子类通过 _capture
+    决定哪些字符串值需要提取，并通过 _on_capture_char / _on_capture_end 接收其内容；
+    各钩子的默认实现什么都不做（不提取任何值）。
+    """
+
+    def __init__(self, field: str):
+        """初始化解析器。
+
+        Args:
+            field: 要提取的顶层字段名
+        """
+        self.field = field
+        # 容器栈：每个元素为 [类型 "{" 或 "[", 对象中下一个字符串是否为键, 打开容器时对应的键]
+        self._stack: list[list] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._capturing = False
+        self._chars: list[str] = []
+        self._escape: Optional[str] = None  # None 表示不在转义中，否则为已读取的转义内容
+        self._high_surrogate: Optional[int] = None
+        self._last_key: Optional[str] = None
+        self.done = False
+
+    def _capture(self) -> bool:
+        """即将开始的字符串值是否需要提取。"""
+        return False
+
+    def _on_capture_char(self, char: str) -> None:
+        """提取中的字符串值每解码出一个字符时调用。"""
+
+    def _on_capture_end(self) -> None:
+        """提取中的字符串值结束时调用。"""
+
+    def _on_container_end(self, entry: list) -> None:
+        """容器结束时调用，entry 为出栈的容器栈元素。"""
+
+    def _emit_char(self, char: str) -> None:
+        if self._capturing:
+            self._on_capture_char(char)
+        elif self._string_is_key:
+            self._chars.append(char)
+
+    def _finish_escape(self) -> None:
+        """处理完整的转义序列。"""
+        escape, self._escape = self._escape, None
+        if escape[0] != "u":
+            self._emit_char(_SIMPLE_ESCAPES.get(escape, escape))
+            return
+        code = int(escape[1:], 16)
+        if 0xD800 <= code < 0xDC00:
+            # 代理对的高位，等待紧随其后的低位
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._emit_char(chr(code))
+
+    def _consume(self, text: str) -> None:
+        """逐字符处理一段参数文本。"""
+        for char in text:
+            if self._in_string:
+                if self._escape is not None:
+                    self._escape += char
+                    if self._escape[0] != "u" or len(self._escape) == 5:
+                        self._finish_escape()
+                elif char == "\\":
+                    self._escape = ""
+                elif char == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._last_key = "".join(self._chars)
+                    elif self._capturing:
+                        self._capturing = False
+                        self._on_capture_end()
+                else:
+                    self._emit_char(char)
+                continue
+
+            if char == '"':
+                top = self._stack[-1] if self._stack else None
+                self._in_string = True
+                self._string_is_key = top is not None and top[0] == "{" and top[1]
+                self._chars = []
+                self._capturing = not self._string_is_key and top is not None and self._capture()
+            elif char in "{[":
+                parent = self._stack[-1] if self._stack else None
+                key = self._last_key if parent is not None and parent[0] == "{" else None
+                self._stack.append([char, char == "{", key])
+            elif char in "}]":
+                if self._stack:
+                    self._on_container_end(self._stack.pop())
+            elif char == ":":
+                if self._stack and self._stack[-1][0] == "{":
+                    self._stack[-1][1] = False
+            elif char == ",":
+                if self._stack and self._stack[-1][0] == "{":
+                    self._stack[-1][1] = True
+
+
+class AnswerStreamParser(_IncrementalJsonParser):
+    """增量解析工具调用参数 JSON，提取顶层某个字符串字段的内容。"""
+
+    def __init__(self, field: str = "answer"):
+        """初始化解析器。
+
+        Args:
+            field: 要提取的顶层字段名
+        """
+        super().__init__(field)
+        self._out: list[str] = []
+
+    def _capture(self) -> bool:
+        # 只有顶层对象中目标字段的值才需要输出
+        return (
+            len(self._stack) == 1
+            and self._stack[0][0] == "{"
+            and self._last_key == self.field
+            and not self.done
+        )
+
+    def _on_capture_char(self, char: str) -> None:
+        self._out.append(char)
+
+    def _on_capture_end(self) -> None:
+        self.done = True
+
+    def feed(self, text: str) -> str:
+        """输入一段参数文本。
+
+        Args:
+            text: 工具调用参数 JSON 的下一个片段
+
+        Returns:
+            str: 本片段中解码出的目标字段新文本（可能为空）
+        """
+        self._out = []
+        self._consume(text)
+        return "".join(self._out)
+
+
+class QueryStreamParser(_IncrementalJsonParser):
+    """增量解析工具调用参数 JSON，逐个返回顶层字符串数组字段中已经完整的元素。"""
+
+    def __init__(self, field: str = "search_queries"):
+        """初始化解析器。
+
+        Args:
+            field: 顶层字符串数组字段名
+        """
+        super().__init__(field)
+        self._item: list[str] = []
+        self._completed: list[str] = []
+
+    def _capture(self) -> bool:
+        # 顶层对象中目标字段对应的数组里的字符串元素
+        return (
+            len(self._stack) == 2
+            and self._stack[0][0] == "{"
+            and self._stack[1][0] == "["
+            and self._stack[1][2] == self.field
+            and not self.done
+        )
+
+    def _on_capture_char(self, char: str) -> None:
+        self._item.append(char)
+
+    def _on_capture_end(self) -> None:
+        self._completed.append("".join(self._item))
+        self._item = []
+
+    def _on_container_end(self, entry: list) -> None:
+        if len(self._stack) == 1 and entry[0] == "[" and entry[2] == self.field:
+            self.done = True
+
+    def feed(self, text: str) -> list[str]:
+        """输入一段参数文本。
+
+        Args:
+            text: 工具调用参数 JSON 的下一个片段
+
+        Returns:
+            list[str]: 本片段中新完成的数组元素（可能为空）
+        """
+        self._completed = []
+        self._consume(text)
+        return self._completed
+
+
+def stream_answer_enabled(config: Optional[RunnableConfig]) -> bool:
+    """当前运行是否启用了答案流式输出。"""
+    return bool(((config or {}).get("configurable") or {}).get("stream_answer"))
+
+
+def _get_writer() -> Callable[[dict], None]:
+    """获取 LangGraph 的自定义流写入器；不在图中执行时返回空操作。"""
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        return lambda event: None
+
+
+def _first_tool_call_chunk(chunk: AIMessageChunk) -> Optional[dict]:
+    """提取消息片段中第一个工具调用的片段。"""
+    for tool_call_chunk in chunk.tool_call_chunks:
+        if tool_call_chunk.get("index", 0) in (0, None):
+            return tool_call_chunk
+    return None
+
+
+class _AnswerStreamer:
+    """累积流式消息片段，把 answer 字段的新文本写入自定义流，并回调已经完整的搜索查询。"""
+
+    def __init__(
+        self,
+        node: str,
+        emit_answer: bool = True,
+        on_query: Optional[Callable[[str, str], None]] = None,
+    ):
+        self.node = node
+        self.parser = AnswerStreamParser("answer") if emit_answer else None
+        self.query_parser = QueryStreamParser("search_queries") if on_query is not None else None
+        self.on_query = on_query
+        self.writer = _get_writer()
+        # 片段只在 result() 中合并一次：每次相加都会对累积的工具调用参数重新做
+        # parse_partial_json，整体是 O(n²)，异步模式下会阻塞事件循环
+        self.chunks: list[BaseMessage] = []
+        self.tool_call_id: Optional[str] = None
+
+    def add(self, chunk) -> None:
+        self.chunks.append(chunk)
+        if not isinstance(chunk, AIMessageChunk):
+            return
+        tool_call_chunk = _first_tool_call_chunk(chunk)
+        if tool_call_chunk is None:
+            return
+        # 工具调用 ID 通常只出现在第一个片段中
+        self.tool_call_id = self.tool_call_id or tool_call_chunk.get("id")
+        text = tool_call_chunk.get("args") or ""
+        if not text:
+            return
+        if self.parser is not None and not self.parser.done:
+            delta = self.parser.feed(text)
+            if delta:
+                self.writer({"type": "answer_delta", "node": self.node, "delta": delta})
+        if self.query_parser is not None and not self.query_parser.done:
+            for query in self.query_parser.feed(text):
+                if self.tool_call_id:
+                    self.on_query(self.tool_call_id, query)
+
+    def result(self) -> Optional[BaseMessage]:
+        if not self.chunks:
+            return None
+        first, *rest = self.chunks
+        if all(isinstance(chunk, AIMessageChunk) for chunk in self.chunks):
+            return message_chunk_to_message(add_ai_message_chunks(first, *rest))
+        message = first
+        for chunk in rest:
+            message = message + chunk
+        return message_chunk_to_message(message) if isinstance(message, AIMessageChunk) else message
+
+
+def _split_model_step(chain: Runnable) -> tuple[Optional[Runnable], Runnable]:
+    """把 prompt | model 形式的链拆成 (前缀, 模型)。
+
+    RunnableSequence 的 stream 会把每个输出片段累加到 final_output 上（用于回调），
+    AIMessageChunk 每次相加都要重新解析累积的工具调用参数，整体是 O(n²)。
+    前缀（提示模板）没有增量输出，直接 invoke；只对最后的模型调用 stream。
+
+    Returns:
+        tuple: (前缀，链不是 RunnableSequence 时为 None, 需要流式调用的最后一步)
+    """
+    if not isinstance(chain, RunnableSequence):
+        return None, chain
+    *prefix, last = chain.steps
+    return (prefix[0] if len(prefix) == 1 else RunnableSequence(*prefix)), last
+
+
+def invoke_streaming_answer(
+    chain: Runnable,
+    messages: list,
+    node: str,
+    emit_answer: bool = True,
+    on_query: Optional[Callable[[str, str], None]] = None,
+) -> BaseMessage:
+    """通过 stream 调用链，同时把 answer 字段的增量文本写入自定义流。
+
+    Args:
+        chain: 以工具调用形式输出答案的链
+        messages: 输入消息列表
+        node: 节点名，写入事件的 node 字段
+        emit_answer: 是否写入 answer_delta 事件
+        on_query: search_queries 中每个查询字符串完整生成后的回调，参数为 (工具调用 ID, 查询)，
+            用于在生成结束之前预取搜索结果（见 execute_tools.prefetch_search）
+
+    Returns:
+        BaseMessage: 与 invoke 返回值相同的完整消息
+    """
+    streamer = _AnswerStreamer(node, emit_answer, on_query)
+    prefix, model = _split_model_step(chain)
+    inputs = prefix.invoke(messages) if prefix is not None else messages
+    for chunk in model.stream(inputs):
+        streamer.add(chunk)
+    return streamer.result()
+
+
+async def ainvoke_streaming_answer(
+    chain: Runnable,
+    messages: list,
+    node: str,
+    emit_answer: bool = True,
+    on_query: Optional[Callable[[str, str], None]] = None,
+) -> BaseMessage:
+    """invoke_streaming_answer 的异步版本。"""
+    streamer = _AnswerStreamer(node, emit_answer, on_query)
+    prefix, model = _split_model_step(chain)
+    inputs = await prefix.ainvoke(messages) if prefix is not None else messages
+    async for chunk in model.astream(inputs):
+        streamer.add(chunk)
+    return streamer.result()
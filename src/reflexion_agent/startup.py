@@ -0,0 +1,114 @@
+"""服务启动预热模块。
+
+LLM 客户端、draft / revise 的链、ToolNode、搜索客户端和缓存、线程池以及编译后的图都在第一次
+使用时才创建，第一个请求因此要额外承担数百毫秒到数秒的冷启动开销。服务进程可以在开始接收请求
+之前调用 warmup()，把这些共享组件全部创建好：
+
+    from reflexion_agent import warmup
+
+    timings = warmup()                                   # {"settings": 0.001, "llm": 0.42, ...}
+    warmup(llm_specs=[LLMSpec.of("gpt-4o-mini")])        # 同时预建多租户模型池中的模型和链
+    await awarmup()                                      # 在事件循环中调用，不阻塞事件循环
+
+这些组件都是线程安全的延迟单例（见 infra.singleton），warmup() 可以和已经到达的请求并发执行，
+不会重复创建任何组件。可以关闭的组件（压缩器、结果整形器、搜索缓存）在未启用时不会创建。
+"""
+
+import time
+from typing import Callable, Iterable
+
+from reflexion_agent.graph import MAX_ITERATIONS, get_reflexion_graph
+from reflexion_agent.infra.compaction import get_default_compactor
+from reflexion_agent.infra.llm import get_llm_instance
+from reflexion_agent.infra.llm_pool import LLMSpec, get_llm_pool
+from reflexion_agent.infra.result_store import get_default_result_shaper
+from reflexion_agent.infra.search import get_search_client
+from reflexion_agent.infra.search_cache import get_search_cache
+from reflexion_agent.infra.settings import get_settings
+from reflexion_agent.nodes.draft import _create_first_responder_chain, _get_first_responder_chain
+from reflexion_agent.nodes.execute_tools import _get_search_executor, _get_tool_node
+from reflexion_agent.nodes.revise import _create_revisor_chain, _get_revisor_chain
+
+
+def warmup(
+    *,
+    search: bool = True,
+    graph: bool = True,
+    use_async: bool = False,
+    max_iterations: int = MAX_ITERATIONS,
+    llm_specs: Iterable[LLMSpec] = (),
+) -> dict[str, float]:
+    """预先创建运行需要的所有共享组件。
+
+    Args:
+        search: 是否创建搜索客户端、搜索缓存和搜索线程池（离线注入了替身客户端时可以关闭）
+        graph: 是否编译并缓存默认配置的图（见 get_reflexion_graph）
+        use_async: 编译异步节点版本的图
+        max_iterations: 编译的图的最大迭代次数
+        llm_specs: 需要预先放入模型池的模型（见 infra.llm_pool）
+
+    Returns:
+        dict[str, float]: 组件名 -> 创建（或确认已存在）耗时秒数
+
+    Raises:
+        ValueError: 缺少必需的配置（例如 TAVILY_API_KEY）
+    """
+    timings: dict[str, float] = {}
+
+    def step(name: str, fn: Callable[[], object]) -> None:
+        started = time.perf_counter()
+        fn()
+        timings[name] = round(time.perf_counter() - started, 4)
+
+    step("settings", get_settings)
+    step("llm", get_llm_instance)
+    step("first_responder_chain", _get_first_responder_chain)
+    step("revisor_chain", _get_revisor_chain)
+    step("tool_node", _get_tool_node)
+    step("compactor", get_default_compactor)
+    step("result_shaper", get_default_result_shaper)
+    if search:
+        step("search_client", get_search_client)
+        step("search_cache", get_search_cache)
+        step("search_executor", _get_search_executor)
+    for spec in llm_specs:
+        spec = LLMSpec.coerce(spec)
+        pool = get_llm_pool()
+        step(
+            f"llm_pool:{spec.model}",
+            lambda: (
+                pool.get_chain(spec, "first_responder", _create_first_responder_chain),
+                pool.get_chain(spec, "revisor", _create_revisor_chain),
+            ),
+        )
+    if graph:
+        step("graph", lambda: get_reflexion_graph(max_iterations, use_async=use_async))
+    return timings
+
+
+async def awarmup(
+    *,
+    search: bool = True,
+    graph: bool = True,
+    use_async: bool = True,
+    max_iterations: int = MAX_ITERATIONS,
+    llm_specs: Iterable[LLMSpec] = (),
+) -> dict[str, float]:
+    """warmup() 的异步版本：在线程中执行，预热期间事件循环可以继续处理其他任务。
+
+    参数与 warmup() 相同，use_async 默认为 True（异步服务通常运行异步节点版本的图）。
+
+    Returns:
+        dict[str, float]: 组件名 -> 耗时秒数
+    """
+    import asyncio
+
+    return await asyncio.to_thread(
+        lambda: warmup(
+            search=search,
+            graph=graph,
+            use_async=use_async,
+            max_iterations=max_iterations,
+            llm_specs=llm_specs,
+        )
+    )
@@ -0,0 +1,63 @@
+"""测试公共设施。
+
+LLM 和搜索使用 benchmarks/fakes.py 中的确定性替身，不访问网络。每个测试前后重置进程级的
+共享组件（LLM 实例、链、搜索客户端、配置等），避免测试之间互相影响。
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from fakes import FakeChatModel, FakeSearchClient  # noqa: E402
+
+from reflexion_agent.infra import (  # noqa: E402
+    Settings,
+    set_default_compactor,
+    set_default_result_shaper,
+    set_llm_instance,
+    set_llm_pool,
+    set_search_cache,
+    set_search_client,
+    set_settings,
+)
+from reflexion_agent.nodes import draft, revise  # noqa: E402
+
+
+def _reset() -> None:
+    set_llm_instance(None)
+    set_llm_pool(None)
+    set_search_client(None)
+    set_search_cache(None)
+    set_default_compactor(None)
+    set_default_result_shaper(None)
+    draft._first_responder_chain.set(None)
+    revise._revisor_chain.set(None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings():
+    """使用与环境无关的默认配置，并关闭进程级搜索缓存。"""
+    set_settings(Settings.from_env({"SEARCH_CACHE_ENABLED": "false"}))
+    _reset()
+    yield
+    _reset()
+    set_settings(None)
+
+
+@pytest.fixture
+def fake_llm() -> FakeChatModel:
+    """注入替身 LLM，draft / revise 的链在第一次使用时绑定到它。"""
+    llm = FakeChatModel()
+    set_llm_instance(llm)
+    return llm
+
+
+@pytest.fixture
+def fake_search() -> FakeSearchClient:
+    """注入替身搜索客户端。"""
+    client = FakeSearchClient()
+    set_search_client(client)
+    return client
@@ -0,0 +1,111 @@
+"""语义答案缓存（infra.answer_cache）的测试。"""
+
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from reflexion_agent import AnswerCache, AnswerCachedGraph, LLMSpec
+
+QUESTION = "What is the reflexion agent architecture?"
+
+
+class _CountingGraph:
+    """每次调用都返回一条新的 ReviseAnswer 的替身图。"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, inputs, config=None, **kwargs):
+        self.calls += 1
+        message = AIMessage(
+            content="",
+            tool_calls=[{"name": "ReviseAnswer", "args": {"answer": f"answer {self.calls}"}, "id": "call"}],
+        )
+        return {"messages": [HumanMessage(content=QUESTION), message]}
+
+
+def _answer(state: dict) -> str:
+    return state["messages"][-1].tool_calls[0]["args"]["answer"]
+
+
+def _run(graph, **configurable) -> dict:
+    return graph.invoke({"messages": [("user", QUESTION)]}, {"configurable": configurable})
+
+
+def test_entries_are_scoped_by_llm_spec_and_tenant():
+    inner = _CountingGraph()
+    graph = AnswerCachedGraph(inner, AnswerCache())
+    cheap, premium = LLMSpec.of("gpt-4o-mini", temperature=0), LLMSpec.of("gpt-4o", temperature=0)
+
+    assert _answer(_run(graph, llm=cheap)) == "answer 1"
+    assert _answer(_run(graph, llm=cheap)) == "answer 1"
+    # 另一个模型（或没有指定模型的全局作用域）不会命中 cheap 的答案
+    assert _answer(_run(graph, llm=premium)) == "answer 2"
+    assert _answer(_run(graph)) == "answer 3"
+    # answer_cache_scope 优先于模型
+    assert _answer(_run(graph, llm=cheap, answer_cache_scope="tenant-a")) == "answer 4"
+    assert _answer(_run(graph, llm=premium, answer_cache_scope="tenant-a")) == "answer 4"
+    assert inner.calls == 4
+
+
+def test_opted_out_run_is_not_stored():
+    inner = _CountingGraph()
+    cache = AnswerCache()
+    graph = AnswerCachedGraph(inner, cache)
+
+    _run(graph, answer_cache=False)
+    assert cache.stats["size"] == 0
+
+    _run(graph)
+    _run(graph)
+    assert inner.calls == 2
+    assert cache.stats["hits"] == 1
+
+
+class _StreamingGraph(_CountingGraph):
+    """按 updates / values 模式输出数据块的替身图。"""
+
+    stream_mode = "updates"
+
+    def stream(self, inputs, config=None, *, stream_mode=None, **kwargs):
+        state = self.invoke(inputs, config)
+        modes = [stream_mode or self.stream_mode] if isinstance(stream_mode or "", str) else stream_mode
+        for mode in modes:
+            chunk = {"revise": {"messages": state["messages"][1:]}} if mode == "updates" else state
+            yield chunk if isinstance(stream_mode or "", str) else (mode, chunk)
+
+    async def astream(self, inputs, config=None, **kwargs):
+        for chunk in self.stream(inputs, config, **kwargs):
+            yield chunk
+
+
+def test_stream_uses_and_fills_the_cache():
+    inner = _StreamingGraph()
+    graph = AnswerCachedGraph(inner, AnswerCache())
+    inputs = {"messages": [("user", QUESTION)]}
+
+    # 未命中：原样转发，并从 updates 数据块中收集最终答案写入缓存
+    (chunk,) = graph.stream(inputs)
+    assert "revise" in chunk
+    (update,) = graph.stream(inputs)
+    assert update["answer_cache"]["messages"][0].tool_calls[0]["args"]["answer"] == "answer 1"
+    chunks = list(graph.stream(inputs, stream_mode=["values", "custom"]))
+    assert [mode for mode, _ in chunks] == ["values", "custom"]
+    assert _answer(chunks[0][1]) == "answer 1"
+    assert chunks[1][1] == {"type": "answer_delta", "node": "answer_cache", "delta": "answer 1"}
+    assert inner.calls == 1
+
+
+def test_astream_skips_the_cache_for_unsupported_formats():
+    inner = _StreamingGraph()
+    graph = AnswerCachedGraph(inner, AnswerCache())
+    inputs = {"messages": [("user", QUESTION)]}
+
+    async def collect(**kwargs):
+        return [chunk async for chunk in graph.astream(inputs, **kwargs)]
+
+    asyncio.run(collect(stream_mode="values"))
+    assert asyncio.run(collect(stream_mode="values"))[0]["iterations"] == 0
+    # subgraphs 的输出格式不同，直接转发给原图
+    asyncio.run(collect(stream_mode="values", subgraphs=True))
+    assert inner.calls == 2
@@ -0,0 +1,37 @@
+"""批量问答 API（batch）的测试。"""
+
+import json
+
+from reflexion_agent import run_batch
+
+QUESTIONS = ["What is reflexion?", "What is LangGraph?", "What is Tavily?"]
+
+
+def test_checkpoint_resume_skips_finished_items_and_ignores_unknown_fields(tmp_path, fake_llm, fake_search):
+    path = tmp_path / "batch.jsonl"
+    records = [
+        # 其他版本写入的检查点可能带有 BatchResult 没有的字段
+        {"index": 0, "question": QUESTIONS[0], "answer": "done", "error": None, "trace_id": "abc"},
+        {"index": 1, "question": QUESTIONS[1], "answer": None, "error": "RuntimeError()"},
+    ]
+    # 最后一行是中断时写了一半的记录
+    lines = "".join(json.dumps(record) + "\n" for record in records) + '{"index": 2, "quest'
+    path.write_text(lines, encoding="utf-8")
+
+    batch = run_batch(QUESTIONS, concurrency=2, max_iterations=1, checkpoint_path=str(path))
+    results = {result.index: result for result in batch}
+
+    assert results[0].resumed and results[0].answer == "done"
+    # 失败的问题和写了一半的记录都会重新执行
+    assert not results[1].resumed and results[1].ok and results[1].answer
+    assert not results[2].resumed and results[2].ok
+    assert fake_search.calls > 0
+    # 第二次运行全部来自检查点
+    assert all(result.resumed for result in run_batch(QUESTIONS, checkpoint_path=str(path)))
+
+
+def test_non_positive_concurrency_runs_one_at_a_time(fake_llm, fake_search):
+    results = list(run_batch(QUESTIONS[:2], concurrency=0, max_iterations=1))
+
+    assert sorted(result.index for result in results) == [0, 1]
+    assert all(result.ok for result in results)
@@ -0,0 +1,95 @@
+"""运行预算（infra.budget）在 execute_tools 和整个图中的测试。"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from reflexion_agent import RunBudget, create_reflexion_graph, get_run_counters
+from reflexion_agent.infra import Settings, set_settings
+from reflexion_agent.infra import budget as budget_module
+from reflexion_agent.infra.budget import DeadlineExceeded, call_with_deadline
+from reflexion_agent.nodes.execute_tools import aexecute_tools_node, execute_tools_node
+
+
+def _state(*queries: str) -> dict:
+    call = {
+        "name": "AnswerQuestion",
+        "args": {"answer": "draft", "reflection": {}, "search_queries": list(queries)},
+        "id": "call_0",
+        "type": "tool_call",
+    }
+    return {"messages": [HumanMessage(content="q"), AIMessage(content="", tool_calls=[call])]}
+
+
+def _config(budget: RunBudget) -> dict:
+    return {"configurable": {"budget": budget, "result_shaper": None}}
+
+
+def test_exhausted_token_budget_skips_all_searches(fake_search):
+    budget = RunBudget(max_tokens=100)
+    budget.add_tokens(100)
+
+    update = execute_tools_node(_state("alpha", "beta"), _config(budget))
+
+    assert fake_search.calls == 0
+    assert budget.searches_used == 0
+    (message,) = update["messages"]
+    assert isinstance(message, ToolMessage)
+    assert "Search skipped: run budget exhausted" in message.content
+
+
+def test_passed_deadline_skips_all_searches_async(fake_search):
+    budget = RunBudget(deadline_seconds=0.0)
+
+    asyncio.run(aexecute_tools_node(_state("alpha", "beta"), _config(budget)))
+
+    assert fake_search.calls == 0
+    assert budget.searches_used == 0
+
+
+def test_max_searches_truncates_queries(fake_search):
+    budget = RunBudget(max_searches=1)
+
+    update = execute_tools_node(_state("alpha", "beta", "gamma"), _config(budget))
+
+    assert fake_search.calls == 1
+    assert budget.searches_used == 1
+    assert update["messages"][0].content.count("Search skipped") == 2
+
+
+def test_graph_stops_with_best_answer_when_tokens_run_out(fake_llm, fake_search):
+    budget = RunBudget(max_tokens=1)
+    graph = create_reflexion_graph(max_iterations=5)
+
+    result = graph.invoke({"messages": [("user", "What is reflexion?")]}, _config(budget))
+
+    counters = get_run_counters(result)
+    assert counters["budget_usage"]["exhausted"] == "tokens"
+    # draft 超出 token 上限后不再执行任何搜索，revise 直接返回当前最佳答案，图在一轮后结束
+    assert fake_search.calls == 0
+    assert counters["iterations"] == 1
+    last = result["messages"][-1]
+    assert last.response_metadata.get("budget_exhausted") == "tokens"
+
+
+def test_deadline_calls_do_not_queue_behind_a_full_pool():
+    set_settings(
+        Settings.from_env({"SEARCH_CACHE_ENABLED": "false", "REFLEXION_DEADLINE_WORKERS": "2"})
+    )
+    previous = budget_module._deadline_runner.set(None)
+    release = threading.Event()
+    try:
+        # 两个被放弃但仍在运行的调用占满了线程池
+        for _ in range(2):
+            with pytest.raises(DeadlineExceeded):
+                call_with_deadline(RunBudget(deadline_seconds=0.05), release.wait)
+
+        started = time.monotonic()
+        assert call_with_deadline(RunBudget(deadline_seconds=0.5), lambda: "done") == "done"
+        assert time.monotonic() - started < 0.25
+    finally:
+        release.set()
+        budget_module._deadline_runner.set(previous)
@@ -0,0 +1,118 @@
+"""增量 SQLite 检查点（infra.checkpoint）的恢复和回放测试。"""
+
+import asyncio
+
+import pytest
+
+from reflexion_agent import create_async_reflexion_graph, create_reflexion_graph, get_run_counters
+from reflexion_agent.infra import SqliteDeltaCheckpointer
+
+QUESTION = {"messages": [("user", "What is reflexion?")]}
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _contents(messages: list) -> list:
+    # 替身模型的工具调用 id 是进程级递增的，比较时只看类型、内容和工具参数
+    return [
+        (type(m).__name__, m.content, [(c["name"], c["args"]) for c in getattr(m, "tool_calls", [])])
+        for m in messages
+    ]
+
+
+def test_history_replays_identically_after_reopen(tmp_path, fake_llm, fake_search):
+    path = str(tmp_path / "checkpoints.sqlite")
+    # keyframe_interval 很小，历史中同时包含增量和完整快照
+    checkpointer = SqliteDeltaCheckpointer(path, keyframe_interval=3)
+    graph = create_reflexion_graph(max_iterations=3, checkpointer=checkpointer)
+    result = graph.invoke(QUESTION, _config("run-1"))
+    history = [_contents(s.values.get("messages", [])) for s in graph.get_state_history(_config("run-1"))]
+    checkpointer.close()
+
+    # 新的检查点实例没有内存缓存，所有通道值都从数据库中的增量链重建
+    reopened = SqliteDeltaCheckpointer(path, keyframe_interval=3)
+    replayed = create_reflexion_graph(max_iterations=3, checkpointer=reopened)
+    snapshots = list(replayed.get_state_history(_config("run-1")))
+
+    assert [_contents(s.values.get("messages", [])) for s in snapshots] == history
+    assert _contents(snapshots[0].values["messages"]) == _contents(result["messages"])
+    # 每一步的消息数单调增加，最早的检查点是空的输入步骤
+    lengths = [len(s.values.get("messages", [])) for s in reversed(snapshots)]
+    assert lengths == sorted(lengths) and lengths[0] == 0
+    reopened.close()
+
+
+def test_interrupted_run_resumes_from_last_checkpoint(tmp_path, fake_llm, fake_search):
+    path = str(tmp_path / "checkpoints.sqlite")
+    expected = create_reflexion_graph(max_iterations=2).invoke(QUESTION)
+    searches = fake_search.calls
+
+    checkpointer = SqliteDeltaCheckpointer(path)
+    graph = create_reflexion_graph(max_iterations=2, checkpointer=checkpointer)
+    # 第一次 revise 之前中断，模拟进程崩溃
+    graph.invoke(QUESTION, _config("run-1"), interrupt_before=["revise"])
+    assert graph.get_state(_config("run-1")).next == ("revise",)
+    checkpointer.close()
+
+    reopened = SqliteDeltaCheckpointer(path)
+    resumed = create_reflexion_graph(max_iterations=2, checkpointer=reopened).invoke(None, _config("run-1"))
+
+    assert _contents(resumed["messages"]) == _contents(expected["messages"])
+    assert get_run_counters(resumed)["iterations"] == get_run_counters(expected)["iterations"]
+    # 中断前已经完成的搜索不会在恢复时重复执行
+    assert fake_search.calls == 2 * searches
+    reopened.close()
+
+
+def test_compaction_keeps_latest_checkpoints_loadable(tmp_path, fake_llm, fake_search):
+    checkpointer = SqliteDeltaCheckpointer(
+        str(tmp_path / "checkpoints.sqlite"), keyframe_interval=4, max_checkpoints_per_thread=3
+    )
+    graph = create_reflexion_graph(max_iterations=3, checkpointer=checkpointer)
+    result = graph.invoke(QUESTION, _config("run-1"))
+
+    checkpointer.compact()
+    checkpointer._cache.clear()
+
+    snapshots = list(graph.get_state_history(_config("run-1")))
+    assert len(snapshots) == 3
+    assert _contents(snapshots[0].values["messages"]) == _contents(result["messages"])
+    checkpointer.close()
+
+
+def test_async_graph_resumes_with_async_interface(tmp_path, fake_llm, fake_search):
+    checkpointer = SqliteDeltaCheckpointer(str(tmp_path / "checkpoints.sqlite"))
+    graph = create_async_reflexion_graph(max_iterations=1, checkpointer=checkpointer)
+
+    async def run():
+        await graph.ainvoke(QUESTION, _config("run-1"), interrupt_before=["execute_tools"])
+        return await graph.ainvoke(None, _config("run-1"))
+
+    result = asyncio.run(run())
+
+    assert get_run_counters(result)["iterations"] == 2
+    assert asyncio.run(graph.aget_state(_config("run-1"))).next == ()
+    checkpointer.close()
+
+
+def test_missing_delta_base_raises_instead_of_rebuilding_garbage(tmp_path, fake_llm, fake_search):
+    path = str(tmp_path / "checkpoints.sqlite")
+    checkpointer = SqliteDeltaCheckpointer(path)
+    create_reflexion_graph(max_iterations=1, checkpointer=checkpointer).invoke(QUESTION, _config("run-1"))
+    # 删除最新消息增量的基准版本，模拟损坏的数据库
+    ((base_version,),) = checkpointer._conn.execute(
+        "SELECT base_version FROM blobs WHERE channel = 'messages' AND type = 'delta' "
+        "ORDER BY version DESC LIMIT 1"
+    ).fetchall()
+    checkpointer._conn.execute(
+        "DELETE FROM blobs WHERE channel = 'messages' AND version = ?", (base_version,)
+    )
+    checkpointer._conn.commit()
+    checkpointer.close()
+
+    reopened = SqliteDeltaCheckpointer(path)
+    with pytest.raises(ValueError, match="missing base version"):
+        reopened.get_tuple(_config("run-1"))
+    reopened.close()
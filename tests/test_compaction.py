@@ -0,0 +1,106 @@
+"""上下文压缩（infra.compaction）的测试。"""
+
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from reflexion_agent.infra import MessageCompactor, count_tokens
+from reflexion_agent.infra.compaction import _MIN_SNIPPET_CHARS, count_message_tokens, truncate_tokens
+
+
+def _results(round_: int, query: str) -> list[dict]:
+    # 每轮的第 0 条结果与上一轮相同，用于检查跨轮次的 URL 去重
+    return [
+        {
+            "url": f"https://example.com/{query}/{0 if i == 0 else f'{round_}-{i}'}",
+            "content": f"{query} result {i} of round {round_}. " * 40,
+            "score": 1.0 - i / 10,
+        }
+        for i in range(5)
+    ]
+
+
+def _history(rounds: int = 3) -> list:
+    messages = [HumanMessage(content="What is reflexion?")]
+    for round_ in range(rounds):
+        call_id = f"call_{round_}"
+        queries = ["qa", "qb"]
+        messages.append(
+            AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "AnswerQuestion" if round_ == 0 else "ReviseAnswer",
+                        "args": {"answer": f"answer {round_}", "search_queries": queries},
+                        "id": call_id,
+                    }
+                ],
+            )
+        )
+        messages.append(
+            ToolMessage(content=json.dumps([_results(round_, q) for q in queries]), tool_call_id=call_id)
+        )
+    return messages
+
+
+def _assert_tool_pairs_consistent(messages: list) -> None:
+    """每条 ToolMessage 都紧跟在发出对应工具调用的 AIMessage 之后。"""
+    open_calls: set = set()
+    for message in messages:
+        if isinstance(message, AIMessage):
+            open_calls = {call["id"] for call in message.tool_calls}
+        elif isinstance(message, ToolMessage):
+            assert message.tool_call_id in open_calls
+            open_calls.discard(message.tool_call_id)
+    assert not open_calls
+
+
+def test_token_counter_is_deterministic():
+    assert count_tokens("Hello, world!") == 4
+    assert count_tokens("反思 agent") == 2
+    assert truncate_tokens("one two, three four", 3) == "one two,"
+    assert truncate_tokens("short", 10) == "short"
+
+
+def test_within_budget_keeps_head_notes_and_latest_round():
+    messages = _history()
+
+    compacted = MessageCompactor(token_budget=100_000)(messages)
+
+    head, notes, *tail = compacted
+    assert head is messages[0]
+    assert tail == messages[-2:]
+    assert isinstance(notes, HumanMessage)
+    assert notes.content.startswith("Earlier search results (summarized):")
+    # 更早两轮各 2 个查询 x top-3，重复出现的 URL 只保留一次
+    lines = notes.content.splitlines()[1:]
+    assert len(lines) == len({line.split(": ")[0] for line in lines}) == 10
+    _assert_tool_pairs_consistent(compacted)
+
+
+@pytest.mark.parametrize("token_budget", [3000, 1500, 800])
+def test_budget_is_enforced_by_trimming(token_budget):
+    messages = _history()
+    assert count_message_tokens(messages) > token_budget
+
+    compacted = MessageCompactor(token_budget=token_budget)(messages)
+
+    assert count_message_tokens(compacted) <= token_budget
+    assert compacted[0] is messages[0]
+    assert compacted[-2].tool_calls == messages[-2].tool_calls
+    _assert_tool_pairs_consistent(compacted)
+    per_query = json.loads(compacted[-1].content)
+    assert all(len(results) <= 3 for results in per_query)
+
+
+def test_snippets_stop_shrinking_at_the_minimum():
+    messages = _history()
+
+    compacted = MessageCompactor(token_budget=1)(messages)
+
+    # 预算无法满足时返回最小的压缩结果：没有更早轮次的摘要，片段不短于最小长度
+    assert [type(m) for m in compacted] == [HumanMessage, AIMessage, ToolMessage]
+    snippets = [result["content"] for results in json.loads(compacted[-1].content) for result in results]
+    assert snippets and all(len(snippet) == _MIN_SNIPPET_CHARS for snippet in snippets)
+    _assert_tool_pairs_consistent(compacted)
@@ -0,0 +1,125 @@
+"""execute_tools 节点搜索调度和推测式预取的测试。"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pytest
+from fakes import LatencyDistribution
+from langchain_core.messages import AIMessage, HumanMessage
+
+from reflexion_agent import RunBudget
+from reflexion_agent.infra.search_cache import make_cache_key
+from reflexion_agent.nodes import execute_tools
+from reflexion_agent.nodes.execute_tools import (
+    SEARCH_MAX_RESULTS,
+    _run_search_queries,
+    aexecute_tools_node,
+    execute_tools_node,
+    prefetch_search,
+)
+
+
+@pytest.fixture
+def small_search_pool():
+    """把共享搜索线程池换成只有 2 个工作线程的线程池。"""
+    executor = ThreadPoolExecutor(max_workers=2)
+    previous = execute_tools._search_executor.set(executor)
+    yield executor
+    execute_tools._search_executor.set(previous)
+    executor.shutdown(wait=True)
+
+
+def test_time_queued_for_a_worker_does_not_count_toward_the_timeout(fake_search, small_search_pool):
+    fake_search.latency = LatencyDistribution("const:0.3")
+    queries = ["q0", "q1", "q2", "q3"]
+
+    results = _run_search_queries(queries, max_concurrency=4, timeout=0.5)
+
+    # q2 / q3 要等 q0 / q1 占用的工作线程空出来，排队时间不算超时
+    assert fake_search.calls == 4
+    for query in queries:
+        assert isinstance(results[make_cache_key(query, SEARCH_MAX_RESULTS)], list)
+
+
+def test_slow_query_still_times_out(fake_search, small_search_pool):
+    fake_search.latency = LatencyDistribution("const:0.3")
+
+    results = _run_search_queries(["slow"], max_concurrency=1, timeout=0.05)
+
+    assert "timed out" in results[make_cache_key("slow", SEARCH_MAX_RESULTS)]
+
+
+def _state(*queries: str, call_id: str = "call_0") -> dict:
+    call = {
+        "name": "AnswerQuestion",
+        "args": {"answer": "draft", "reflection": {}, "search_queries": list(queries)},
+        "id": call_id,
+        "type": "tool_call",
+    }
+    return {"messages": [HumanMessage(content="q"), AIMessage(content="", tool_calls=[call])]}
+
+
+def _config(budget: Optional[RunBudget] = None) -> dict:
+    return {"configurable": {"budget": budget, "result_shaper": None}}
+
+
+@pytest.fixture
+def prefetched():
+    """清空进程级的预取表。"""
+    execute_tools._prefetched.clear()
+    yield execute_tools._prefetched
+    execute_tools._prefetched.clear()
+
+
+def test_sync_prefetch_is_handed_off_to_execute_tools(fake_search, prefetched):
+    prefetch_search("call_0", "alpha")
+
+    update = execute_tools_node(_state("Alpha ", "beta"), _config())
+
+    # 预取的 alpha 不再重复搜索
+    assert fake_search.calls == 2
+    assert "call_0" not in prefetched
+    assert "alpha result 0" in update["messages"][0].content
+
+
+def test_async_prefetch_is_handed_off_to_execute_tools(fake_search, prefetched):
+    async def run():
+        prefetch_search("call_0", "alpha")
+        return await aexecute_tools_node(_state("alpha", "beta"), _config())
+
+    update = asyncio.run(run())
+
+    assert fake_search.calls == 2
+    assert "call_0" not in prefetched
+    assert "alpha result 0" in update["messages"][0].content
+
+
+def test_prefetch_reserves_budget_and_refusals_leave_no_entry(fake_search, prefetched):
+    budget = RunBudget(max_searches=1)
+
+    prefetch_search("call_0", "alpha", budget)
+    prefetch_search("call_0", "beta", budget)
+    prefetch_search("call_1", "gamma", budget)
+
+    assert budget.searches_used == 1
+    assert list(prefetched) == ["call_0"]
+    assert list(prefetched["call_0"]) == [make_cache_key("alpha", SEARCH_MAX_RESULTS)]
+
+    update = execute_tools_node(_state("alpha", "beta"), _config(budget))
+
+    assert fake_search.calls == 1
+    assert budget.searches_used == 1
+    assert "Search skipped: run budget exhausted (beta)" in update["messages"][0].content
+
+
+def test_orphaned_prefetches_are_evicted_in_lru_order(fake_search, prefetched, monkeypatch):
+    monkeypatch.setattr(execute_tools, "_PREFETCH_MAX_CALLS", 2)
+
+    prefetch_search("call_a", "alpha")
+    prefetch_search("call_b", "beta")
+    prefetch_search("call_a", "gamma")
+    prefetch_search("call_c", "delta")
+
+    # call_a 最近又被使用过，最久未使用的 call_b 被淘汰
+    assert list(prefetched) == ["call_a", "call_c"]
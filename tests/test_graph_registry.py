@@ -0,0 +1,62 @@
+"""编译图注册表（graph.get_reflexion_graph）的测试。"""
+
+from reflexion_agent import get_reflexion_graph
+from reflexion_agent import graph as graph_module
+from reflexion_agent.graph import get_graph_registry_stats, invalidate_graph_cache
+from reflexion_agent.infra import Settings, SqliteDeltaCheckpointer, set_settings
+from reflexion_agent.nodes import DEFAULT_STOPPING_POLICY, default_stopping_policy
+
+
+def test_registry_reuses_graphs_per_configuration():
+    invalidate_graph_cache()
+    before = get_graph_registry_stats()
+
+    graph = get_reflexion_graph(3)
+    assert get_reflexion_graph(3) is graph
+    assert get_reflexion_graph(3, use_async=True) is not graph
+
+    stats = get_graph_registry_stats()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["compiles"] - before["compiles"] == 2
+
+
+def test_model_and_search_settings_are_part_of_the_key():
+    invalidate_graph_cache()
+    graph = get_reflexion_graph(3)
+
+    set_settings(Settings.from_env({"SEARCH_CACHE_ENABLED": "false", "AZURE_OPENAI_DEPLOYMENT_NAME": "gpt-4o"}))
+    other_model = get_reflexion_graph(3)
+    set_settings(Settings.from_env({"SEARCH_CACHE_ENABLED": "false", "SEARCH_MAX_CONCURRENCY": "2"}))
+    other_search = get_reflexion_graph(3)
+
+    assert len({id(graph), id(other_model), id(other_search)}) == 3
+    assert invalidate_graph_cache(3) == 3
+
+
+def test_stopping_policy_factories_hit_the_registry():
+    invalidate_graph_cache()
+    before = get_graph_registry_stats()
+
+    graphs = {id(get_reflexion_graph(3, stopping_policy=default_stopping_policy())) for _ in range(5)}
+
+    assert default_stopping_policy() is DEFAULT_STOPPING_POLICY
+    assert len(graphs) == 1
+    stats = get_graph_registry_stats()
+    assert stats["compiles"] - before["compiles"] == 1
+    assert stats["hits"] - before["hits"] == 4
+
+
+def test_registry_evicts_least_recently_used_graphs(tmp_path):
+    invalidate_graph_cache()
+    before = get_graph_registry_stats()
+    first = get_reflexion_graph(3)
+
+    # 每个请求都使用新的 checkpointer：注册表不会无限增长
+    for i in range(graph_module._GRAPH_REGISTRY_MAX_SIZE):
+        get_reflexion_graph(3, checkpointer=SqliteDeltaCheckpointer(str(tmp_path / f"{i}.sqlite")))
+
+    stats = get_graph_registry_stats()
+    assert stats["size"] == graph_module._GRAPH_REGISTRY_MAX_SIZE
+    assert stats["evictions"] - before["evictions"] == 1
+    # 最久未使用的是第一个图
+    assert get_reflexion_graph(3) is not first
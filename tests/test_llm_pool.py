@@ -0,0 +1,182 @@
+"""多租户模型池（infra.llm_pool）的测试。"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from reflexion_agent.infra import LLMPool, LLMSpec
+from reflexion_agent.infra import llm_pool
+
+
+class _Factory:
+    """记录创建次数的模型工厂，返回的"模型"就是 LLMSpec 本身。"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.created: list = []
+        self._lock = threading.Lock()
+
+    def __call__(self, spec: LLMSpec):
+        time.sleep(self.delay)
+        with self._lock:
+            self.created.append(spec)
+        return spec
+
+
+class _Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def _chain(llm):
+    return ("chain", llm)
+
+
+def test_specs_key_by_provider_model_params_and_credentials():
+    factory = _Factory()
+    pool = LLMPool(factory=factory)
+    base = LLMSpec.of("gpt-4o-mini", temperature=0, max_tokens=64, api_key="k1")
+
+    same = [
+        LLMSpec.of("gpt-4o-mini", max_tokens=64, temperature=0, api_key="k1"),
+        LLMSpec.coerce({"deployment": "gpt-4o-mini", "temperature": 0, "max_tokens": 64, "api_key": "k1"}),
+    ]
+    different = [
+        LLMSpec.of("gpt-4o-mini", "openai", temperature=0, max_tokens=64, api_key="k1"),
+        LLMSpec.of("gpt-4o", temperature=0, max_tokens=64, api_key="k1"),
+        LLMSpec.of("gpt-4o-mini", temperature=1, max_tokens=64, api_key="k1"),
+        LLMSpec.of("gpt-4o-mini", temperature=0, max_tokens=64, api_key="k2"),
+        LLMSpec.of("gpt-4o-mini", temperature=0, max_tokens=64, api_key="k1", endpoint="https://e"),
+    ]
+
+    chain = pool.get_chain(base, "revisor", _chain)
+    assert all(pool.get_chain(spec, "revisor", _chain) is chain for spec in same)
+    assert all(pool.get_chain(spec, "revisor", _chain) is not chain for spec in different)
+    assert len(factory.created) == 1 + len(different)
+    assert "k1" not in repr(base)
+
+
+def test_chains_are_built_once_per_name():
+    pool = LLMPool(factory=_Factory())
+    spec = LLMSpec.of("m")
+
+    first = pool.get_chain(spec, "first_responder", _chain)
+    assert pool.get_chain(spec, "first_responder", lambda llm: pytest.fail("rebuilt")) is first
+    assert pool.get_chain(spec, "revisor", lambda llm: ("revisor", llm)) == ("revisor", spec)
+
+
+def test_pool_evicts_least_recently_used_beyond_max_size():
+    factory = _Factory()
+    pool = LLMPool(max_size=2, factory=factory)
+    a, b, c = (LLMSpec.of(name) for name in "abc")
+
+    pool.get_llm(a)
+    pool.get_llm(b)
+    pool.get_llm(a)
+    pool.get_llm(c)
+
+    assert len(pool) == 2
+    assert pool.stats()["evictions"] == 1
+    pool.get_llm(a)
+    pool.get_llm(b)
+    assert factory.created == [a, b, c, b]
+
+
+def test_pool_evicts_idle_entries(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(llm_pool, "time", clock)
+    factory = _Factory()
+    pool = LLMPool(idle_ttl=60, factory=factory)
+    a, b = LLMSpec.of("a"), LLMSpec.of("b")
+
+    pool.get_llm(a)
+    clock.now += 50
+    pool.get_llm(b)
+    clock.now += 20
+
+    pool.get_llm(b)
+    assert len(pool) == 1
+    assert pool.stats()["evictions"] == 1
+    pool.get_llm(a)
+    assert factory.created == [a, b, a]
+
+
+def test_concurrent_cold_starts_create_the_model_once():
+    factory = _Factory(delay=0.05)
+    pool = LLMPool(factory=factory)
+    spec = LLMSpec.of("m")
+    barrier = threading.Barrier(8)
+    llms = []
+
+    def worker():
+        barrier.wait()
+        llms.append(pool.get_llm(spec))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert factory.created == [spec]
+    assert len(llms) == 8 and all(llm is spec for llm in llms)
+
+
+def test_different_specs_do_not_block_each_other():
+    slow, fast = LLMSpec.of("slow"), LLMSpec.of("fast")
+    started = threading.Event()
+    release = threading.Event()
+
+    def factory(spec):
+        if spec == slow:
+            started.set()
+            release.wait(5)
+        return spec
+
+    pool = LLMPool(factory=factory)
+    thread = threading.Thread(target=pool.get_llm, args=(slow,))
+    thread.start()
+    started.wait(5)
+    try:
+        assert pool.get_llm(fast) is fast
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_aget_chain_hits_without_a_thread_and_refreshes_lru(monkeypatch):
+    pool = LLMPool(max_size=2, factory=_Factory())
+    a, b, c = (LLMSpec.of(name) for name in "abc")
+    chain = pool.get_chain(a, "revisor", _chain)
+    pool.get_llm(b)
+
+    async def no_thread(*args, **kwargs):
+        raise AssertionError("cached chains should not go through a worker thread")
+
+    monkeypatch.setattr(asyncio, "to_thread", no_thread)
+    assert asyncio.run(pool.aget_chain(a, "revisor", _chain)) is chain
+    assert pool.stats()["hits"] == 1
+
+    # a 刚被 aget_chain 使用过，容量淘汰的是 b
+    pool.get_llm(c)
+    assert pool.stats()["models"] == [repr(a), repr(c)]
+
+
+def test_aget_chain_builds_cold_chains_off_the_event_loop():
+    loop_thread = threading.get_ident()
+    built_on = []
+
+    def factory(spec):
+        built_on.append(threading.get_ident())
+        return spec
+
+    pool = LLMPool(factory=factory)
+    chain = asyncio.run(pool.aget_chain(LLMSpec.of("m"), "revisor", _chain))
+
+    assert chain == ("chain", LLMSpec.of("m"))
+    assert built_on and built_on[0] != loop_thread
@@ -0,0 +1,151 @@
+"""多部署 LLM 路由（infra.llm_router）的测试。"""
+
+import asyncio
+
+import pytest
+from fakes import FakeChatModel, LatencyDistribution
+from langchain_core.messages import HumanMessage
+
+from reflexion_agent.infra import Deployment, LLMRouter
+
+MESSAGES = [HumanMessage(content="What is reflexion?")]
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FailingChatModel(FakeChatModel):
+    """每次调用都返回给定 HTTP 状态码错误的替身模型。"""
+
+    status_code: int = 429
+
+    def _generate(self, *args, **kwargs):
+        raise _StatusError(self.status_code)
+
+    async def _agenerate(self, *args, **kwargs):
+        raise _StatusError(self.status_code)
+
+    def _stream(self, *args, **kwargs):
+        raise _StatusError(self.status_code)
+
+    async def _astream(self, *args, **kwargs):
+        raise _StatusError(self.status_code)
+        yield
+
+
+def _slow(seconds: float) -> FakeChatModel:
+    return FakeChatModel(latency=LatencyDistribution(f"const:{seconds}"))
+
+
+def _stats(router: LLMRouter) -> dict:
+    return {entry["name"]: entry for entry in router.stats()}
+
+
+def test_rate_limited_deployment_opens_breaker_and_fails_over():
+    router = LLMRouter(
+        [Deployment("limited", FailingChatModel(status_code=429)), Deployment("healthy", FakeChatModel())],
+        initial_latency=0.0,
+    )
+    # 初始延迟相同，第一次选择 "limited"，429 后切换到 "healthy"
+    message = router.invoke(MESSAGES, None, None)
+
+    assert message.tool_calls
+    stats = _stats(router)
+    assert stats["limited"]["breaker"] == "open"
+    assert stats["healthy"]["requests_last_minute"] == 1
+    assert all(entry["in_flight"] == 0 for entry in stats.values())
+
+
+def test_server_errors_open_breaker_after_threshold():
+    router = LLMRouter([Deployment("flaky", FailingChatModel(status_code=503))], failure_threshold=2)
+
+    with pytest.raises(_StatusError):
+        router.invoke(MESSAGES, None, None)
+    assert _stats(router)["flaky"]["breaker"] == "closed"
+    with pytest.raises(_StatusError):
+        router.invoke(MESSAGES, None, None)
+    assert _stats(router)["flaky"]["breaker"] == "open"
+
+
+def _collect(router: LLMRouter, mode: str):
+    if mode == "invoke":
+        return router.invoke(MESSAGES, None, None)
+    if mode == "ainvoke":
+        return asyncio.run(router.ainvoke(MESSAGES, None, None))
+    if mode == "stream":
+        return list(router.stream(MESSAGES, None, None))[-1]
+
+    async def collect():
+        return [chunk async for chunk in router.astream(MESSAGES, None, None)]
+
+    return asyncio.run(collect())[-1]
+
+
+@pytest.mark.parametrize("mode", ["invoke", "ainvoke", "stream", "astream"])
+def test_server_error_below_threshold_fails_over_to_untried_deployment(mode):
+    router = LLMRouter(
+        [Deployment("flaky", FailingChatModel(status_code=503)), Deployment("healthy", FakeChatModel())],
+        initial_latency=0.0,
+        failure_threshold=3,
+    )
+    # 503 之后 flaky 的熔断器仍是闭合的，但同一次调用不会再选择它
+    assert _collect(router, mode) is not None
+
+    stats = _stats(router)
+    assert stats["flaky"]["breaker"] == "closed"
+    assert stats["flaky"]["requests_last_minute"] == 1
+    assert stats["healthy"]["requests_last_minute"] == 1
+
+
+def test_non_retryable_error_does_not_open_breaker():
+    router = LLMRouter([Deployment("bad", FailingChatModel(status_code=400))], failure_threshold=1)
+
+    with pytest.raises(_StatusError):
+        router.invoke(MESSAGES, None, None)
+    assert _stats(router)["bad"]["breaker"] == "closed"
+
+
+def test_cancelled_ainvoke_releases_deployment():
+    router = LLMRouter([Deployment("slow", _slow(1.0))])
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(router.ainvoke(MESSAGES, None, None), 0.05)
+
+    asyncio.run(run())
+    stats = _stats(router)["slow"]
+    assert stats["in_flight"] == 0
+    # 取消的请求不计入延迟
+    assert stats["ewma_latency_seconds"] == 1.0
+
+
+def test_closed_stream_releases_deployment():
+    router = LLMRouter([Deployment("streaming", FakeChatModel())])
+
+    stream = router.stream(MESSAGES, None, None)
+    next(stream)
+    assert _stats(router)["streaming"]["in_flight"] == 1
+    stream.close()
+
+    assert _stats(router)["streaming"]["in_flight"] == 0
+
+
+def test_cancelled_probe_lets_half_open_deployment_probe_again():
+    router = LLMRouter([Deployment("recovering", _slow(0.2))], cooldown_seconds=0.01, max_queue_seconds=0.5)
+    state = router._states[0]
+    # 冷却已结束的熔断：半开状态
+    state.open_until = 1e-9
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(router.ainvoke(MESSAGES, None, None), 0.05)
+        # 探测请求被取消后，下一个请求可以重新探测并关闭熔断
+        return await router.ainvoke(MESSAGES, None, None)
+
+    assert asyncio.run(run()).tool_calls
+    stats = _stats(router)["recovering"]
+    assert stats["breaker"] == "closed"
+    assert stats["in_flight"] == 0
@@ -0,0 +1,25 @@
+"""节点和路由插桩（infra.metrics）的测试。"""
+
+from reflexion_agent import create_reflexion_graph
+from reflexion_agent.infra import enable_metrics, get_metrics_registry, reset_metrics
+from reflexion_agent.nodes import default_stopping_policy
+
+
+def test_router_records_decisions_and_wall_time(fake_llm, fake_search):
+    # 插桩开关在构建图时解析，先打开再构建
+    enable_metrics()
+    reset_metrics()
+    try:
+        graph = create_reflexion_graph(max_iterations=3, stopping_policy=default_stopping_policy())
+        graph.invoke({"messages": [("user", "What is reflexion?")]})
+
+        snapshot = get_metrics_registry().snapshot()
+        (decision,) = snapshot["counters"]["reflexion_router_decisions_total"]
+        (duration,) = snapshot["histograms"]["reflexion_router_duration_seconds"]
+        # 替身模型的答案在第一次 revise 之后即收敛，路由只执行一次
+        assert decision == {"labels": {"destination": "__end__"}, "value": 1}
+        assert duration["labels"] == {"router": "event_loop"}
+        assert duration["count"] == 1 and duration["sum"] > 0
+    finally:
+        enable_metrics(False)
+        reset_metrics()
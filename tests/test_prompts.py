@@ -0,0 +1,33 @@
+"""提示模板前缀稳定性（infra.prompts）的测试。"""
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from reflexion_agent.infra import Settings, check_prefix_stability, set_settings
+from reflexion_agent.nodes import draft, revise
+
+MESSAGES = [HumanMessage(content="What is reflexion?")]
+
+
+@pytest.mark.parametrize(
+    "create_chain",
+    [draft._create_first_responder_chain, revise._create_revisor_chain],
+    ids=["draft", "revise"],
+)
+def test_node_prompts_keep_a_stable_prefix(fake_llm, create_chain):
+    # 链的第一步就是节点实际使用的提示模板（已经填好 first_instruction）
+    prompt = create_chain(fake_llm).first
+
+    prefix = check_prefix_stability(prompt, calls=3, interval=0.01, messages=MESSAGES)
+
+    first_message = prompt.format_messages(messages=MESSAGES)[0].content
+    assert prefix > len(first_message)
+
+
+def test_legacy_layout_is_reported_as_unstable(fake_llm):
+    set_settings(Settings.from_env({"SEARCH_CACHE_ENABLED": "false", "REFLEXION_PROMPT_LAYOUT": "legacy"}))
+    prompt = draft._create_first_responder_chain(fake_llm).first
+
+    # 旧布局的第二行是微秒精度的当前时间，两次渲染的系统提示不同
+    with pytest.raises(AssertionError, match="not stable"):
+        check_prefix_stability(prompt, calls=2, interval=0.01, messages=MESSAGES)
@@ -0,0 +1,61 @@
+"""客户端限流（infra.rate_limit）的测试。"""
+
+import asyncio
+import threading
+
+from reflexion_agent.infra.rate_limit import AdaptiveConcurrency
+
+
+def test_async_waiters_never_exceed_the_limit():
+    concurrency = AdaptiveConcurrency(max_limit=2)
+    active, peak = 0, 0
+
+    async def task():
+        nonlocal active, peak
+        await concurrency.aacquire()
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        concurrency.release(0.01, rate_limited=False)
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(*(task() for _ in range(20))), timeout=5)
+
+    asyncio.run(main())
+    assert peak == 2
+    assert concurrency.in_flight == 0
+
+
+def test_cancelled_waiter_passes_its_wakeup_on():
+    concurrency = AdaptiveConcurrency(max_limit=1)
+
+    async def main():
+        await concurrency.aacquire()
+        first = asyncio.create_task(concurrency.aacquire())
+        second = asyncio.create_task(concurrency.aacquire())
+        await asyncio.sleep(0)
+        # release 唤醒 first，first 在运行之前被取消，唤醒应当转交给 second
+        concurrency.release(0.0, rate_limited=False)
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+        return first.cancelled()
+
+    assert asyncio.run(main())
+    assert concurrency.in_flight == 1
+
+
+def test_release_from_another_thread_wakes_async_waiter():
+    concurrency = AdaptiveConcurrency(max_limit=1)
+    concurrency.acquire()
+
+    async def main():
+        waiting = asyncio.create_task(concurrency.aacquire())
+        await asyncio.sleep(0.01)
+        # 等待者在队列中等待唤醒，而不是轮询
+        assert not waiting.done() and len(concurrency._waiters) == 1
+        threading.Timer(0.01, concurrency.release, args=(0.0, False)).start()
+        await asyncio.wait_for(waiting, timeout=1)
+
+    asyncio.run(main())
+    assert concurrency.in_flight == 1
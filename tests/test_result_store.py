@@ -0,0 +1,115 @@
+"""搜索结果整形与内容寻址存储（infra.result_store）的测试。"""
+
+import json
+
+from langchain_core.messages import ToolMessage
+
+from reflexion_agent import create_reflexion_graph
+from reflexion_agent.infra import count_tokens, result_store
+from reflexion_agent.infra.result_store import ResultShaper, ResultStore, content_ref, seen_result_urls
+
+
+def _result(url: str, content: str = "body") -> dict:
+    return {"url": url, "title": url.rsplit("/", 1)[-1], "score": 0.5, "content": content, "raw": None}
+
+
+def _urls(messages) -> list:
+    return [
+        result["url"]
+        for message in messages
+        if isinstance(message, ToolMessage)
+        for results in json.loads(message.content)
+        for result in results
+    ]
+
+
+def test_graph_tracks_seen_urls_in_state_instead_of_rescanning(fake_llm, fake_search, monkeypatch):
+    def rescan(messages):
+        raise AssertionError("tool steps should read result_urls from state")
+
+    monkeypatch.setattr("reflexion_agent.nodes.execute_tools.seen_result_urls", rescan)
+
+    result = create_reflexion_graph(max_iterations=3).invoke({"messages": [("user", "What is reflexion?")]})
+
+    urls = _urls(result["messages"])
+    # 替身模型每轮都会重复提出 "<topic> overview"，后续轮次中它的结果全部被去重
+    assert len(urls) == len(set(urls)) < fake_search.calls * fake_search.max_results
+    assert result["result_urls"] == frozenset(urls)
+
+
+def test_track_result_urls_merges_step_deltas():
+    merged = result_store.track_result_urls(None, {"a", "b"})
+    merged = result_store.track_result_urls(merged, None)
+    merged = result_store.track_result_urls(merged, {"b", "c"})
+
+    assert merged == frozenset({"a", "b", "c"})
+
+
+def test_shaper_dedupes_urls_across_queries_and_iterations():
+    shaper = ResultShaper(store=ResultStore())
+    seen = set()
+
+    first = shaper([[_result("u/a"), _result("u/b")], [_result("u/b"), _result("u/c")]], seen)
+    second = shaper([[_result("u/a"), _result("u/d")], "Error: timeout"], seen)
+
+    assert [[r["url"] for r in results] for results in first] == [["u/a", "u/b"], ["u/c"]]
+    # 之前轮次出现过的 URL 被丢弃，错误字符串原样保留
+    assert second[0] == [dict(second[0][0], url="u/d")] and second[1] == "Error: timeout"
+    assert seen == {"u/a", "u/b", "u/c", "u/d"}
+
+
+def test_shaper_caps_content_by_chars_and_tokens():
+    content = " ".join(f"word{i}" for i in range(500))
+    store = ResultStore()
+
+    (by_chars,), = ResultShaper(content_chars=100, store=store)([[_result("u/a", content)]], set())
+    (by_tokens,), = ResultShaper(content_chars=10_000, content_tokens=20, store=store)(
+        [[_result("u/a", content)]], set()
+    )
+
+    assert by_chars["content"] == content[:100]
+    assert count_tokens(by_tokens["content"]) <= 20
+    assert content.startswith(by_tokens["content"].rstrip(".… "))
+    assert set(by_chars) == {"url", "title", "score", "content", "ref"}
+
+
+def test_shaped_refs_round_trip_the_full_result():
+    store = ResultStore()
+    result = _result("u/a", "x" * 5000)
+
+    (shaped,), = ResultShaper(content_chars=50, store=store)([[result]], set())
+
+    assert shaped["ref"] == content_ref(result) == content_ref(dict(reversed(list(result.items()))))
+    assert store.get(shaped["ref"]) == result
+
+
+def test_store_is_content_addressed_and_lru_bounded():
+    store = ResultStore(max_entries=2)
+    refs = [store.put({"n": n}) for n in range(3)]
+
+    assert store.put({"n": 2}) == refs[2]
+    assert len(store) == 2
+    # 只有内存层时，被淘汰的条目无法再取回
+    assert store.get(refs[0]) is None
+    assert store.get(refs[1]) == {"n": 1}
+
+
+def test_store_reads_evicted_entries_back_from_sqlite(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    store = ResultStore(max_entries=1, db_path=path)
+    first = store.put({"url": "u/a", "content": "中文"})
+    store.put({"url": "u/b"})
+
+    assert store.get(first) == {"url": "u/a", "content": "中文"}
+    assert ResultStore(db_path=path).get(first) == {"url": "u/a", "content": "中文"}
+    assert ResultStore(db_path=path).get("sha256:missing") is None
+
+
+def test_seen_result_urls_fallback_skips_errors_and_bad_payloads():
+    messages = [
+        ToolMessage(json.dumps([[{"url": "u/a"}], "Error: x"]), tool_call_id="1"),
+        ToolMessage("not json", tool_call_id="2"),
+        ToolMessage(json.dumps([[{"url": "u/b"}, {"title": "no url"}]]), tool_call_id="3"),
+    ]
+
+    assert seen_result_urls(messages) == {"u/a", "u/b"}
@@ -0,0 +1,138 @@
+"""两级搜索缓存（infra.search_cache）的测试。"""
+
+import sqlite3
+
+import pytest
+
+from reflexion_agent.infra import search_cache
+from reflexion_agent.infra.search_cache import SearchCache, make_cache_key, normalize_query
+
+RESULTS = [{"url": "https://example.com/a", "content": "a"}]
+
+
+class _Clock:
+    """替换模块里的 time，让测试直接控制写入和读取时间。"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(search_cache, "time", clock)
+    return clock
+
+
+def _disk_keys(path) -> set:
+    with sqlite3.connect(path) as conn:
+        return {key for (key,) in conn.execute("SELECT key FROM search_cache")}
+
+
+def test_queries_are_normalized_before_keying():
+    assert normalize_query("  AI \t SOC\n") == "ai soc"
+    assert make_cache_key("AI  SOC", 5) == make_cache_key("ai soc", 5) != make_cache_key("ai soc", 3)
+
+    cache = SearchCache()
+    cache.set("  Reflexion   Agents ", 5, RESULTS)
+
+    assert cache.get("reflexion agents", 5) == RESULTS
+    assert cache.get("reflexion agents", 3) is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SearchCache(ttl=60)
+    cache.set("q", 5, RESULTS)
+
+    clock.now += 59
+    assert cache.get("q", 5) == RESULTS
+    clock.now += 1
+    assert cache.get("q", 5) is None
+    assert cache.stats["size"] == 0
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = SearchCache(max_entries=2)
+    cache.set("a", 5, RESULTS)
+    cache.set("b", 5, RESULTS)
+    cache.get("a", 5)
+    cache.set("c", 5, RESULTS)
+
+    assert cache.get("b", 5) is None
+    assert cache.get("a", 5) == RESULTS
+    assert cache.get("c", 5) == RESULTS
+    assert cache.stats["size"] == 2
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    SearchCache(db_path=path).set("q", 5, RESULTS)
+
+    cache = SearchCache(db_path=path)
+    assert cache.stats["size"] == 0
+    assert cache.get("q", 5) == RESULTS
+    assert cache.get("q", 5) == RESULTS
+
+    assert cache.stats["size"] == 1
+    assert cache.stats["disk_hits"] == 1
+    assert cache.stats["hits"] == 2
+
+
+def test_error_strings_are_not_cached(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SearchCache(db_path=path)
+    cache.set("q", 5, "Error: rate limited")
+
+    assert cache.get("q", 5) is None
+    assert cache.stats["size"] == 0
+    assert _disk_keys(path) == set()
+
+
+def test_stats_count_hits_and_misses():
+    cache = SearchCache()
+    cache.get("q", 5)
+    cache.set("q", 5, RESULTS)
+    cache.get("q", 5)
+    cache.get("Q", 5)
+
+    assert cache.stats == {"hits": 2, "misses": 1, "disk_hits": 0, "hit_rate": 2 / 3, "size": 1}
+
+    cache.clear()
+    assert cache.stats == {"hits": 0, "misses": 0, "disk_hits": 0, "hit_rate": 0.0, "size": 0}
+
+
+def test_disk_tier_sweeps_expired_rows_without_reading_them(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(search_cache, "_SWEEP_EVERY_WRITES", 2)
+    path = str(tmp_path / "cache.sqlite")
+    cache = SearchCache(ttl=60, db_path=path)
+    cache.set("old", 5, RESULTS)
+
+    clock.now += 61
+    cache.set("new", 5, RESULTS)
+
+    # 过期的 "old" 从未被读取，仍由第 2 次写入触发的清理删除
+    assert _disk_keys(path) == {make_cache_key("new", 5)}
+
+
+def test_disk_tier_is_bounded_by_max_disk_entries(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(search_cache, "_SWEEP_EVERY_WRITES", 1)
+    path = str(tmp_path / "cache.sqlite")
+    cache = SearchCache(db_path=path, max_disk_entries=2)
+    for query in ("a", "b", "c"):
+        clock.now += 1
+        cache.set(query, 5, RESULTS)
+
+    assert _disk_keys(path) == {make_cache_key("b", 5), make_cache_key("c", 5)}
+
+
+def test_opening_the_cache_sweeps_leftover_expired_rows(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    SearchCache(ttl=60, db_path=path).set("old", 5, RESULTS)
+
+    clock.now += 61
+    SearchCache(ttl=60, db_path=path)
+
+    assert _disk_keys(path) == set()
@@ -0,0 +1,46 @@
+"""Tavily 搜索客户端（infra.search）的测试，不发送网络请求。"""
+
+import asyncio
+import threading
+
+from reflexion_agent.infra import TavilySearchClient
+
+
+async def _async_client(client: TavilySearchClient):
+    return client._get_async_client()
+
+
+def test_close_releases_async_clients_of_every_loop():
+    client = TavilySearchClient(api_key="test")
+    # 一个在其他线程中运行的事件循环，一个已经创建但没有运行的事件循环
+    running = asyncio.new_event_loop()
+    thread = threading.Thread(target=running.run_forever, daemon=True)
+    thread.start()
+    idle = asyncio.new_event_loop()
+    try:
+        on_running = asyncio.run_coroutine_threadsafe(_async_client(client), running).result()
+        on_idle = idle.run_until_complete(_async_client(client))
+
+        client.close()
+        # 运行中的循环上的关闭是异步提交的，等它执行完
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), running).result()
+
+        assert on_running.is_closed and on_idle.is_closed
+        assert client._client.is_closed
+    finally:
+        running.call_soon_threadsafe(running.stop)
+        thread.join()
+        running.close()
+        idle.close()
+
+
+def test_close_inside_the_clients_own_loop():
+    client = TavilySearchClient(api_key="test")
+
+    async def main():
+        async_client = client._get_async_client()
+        client.close()
+        await asyncio.sleep(0.01)
+        return async_client.is_closed
+
+    assert asyncio.run(main())
@@ -0,0 +1,89 @@
+"""单飞请求合并（infra.singleflight）及其在搜索路径上的测试。"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fakes import LatencyDistribution
+
+from reflexion_agent.infra import AsyncSingleFlight, SingleFlight
+from reflexion_agent.nodes.execute_tools import _asearch_query, _search_query
+
+QUERIES = ["AI SOC", "ai  soc", "Ai Soc ", "AI SOC"]
+
+
+def test_concurrent_equivalent_queries_share_one_search(fake_search):
+    # 上游请求足够慢，保证所有调用都在 leader 完成之前到达
+    fake_search.latency = LatencyDistribution("const:0.2")
+
+    with ThreadPoolExecutor(max_workers=len(QUERIES)) as executor:
+        results = list(executor.map(_search_query, QUERIES))
+
+    assert fake_search.calls == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_concurrent_equivalent_queries_share_one_search_async(fake_search):
+    fake_search.latency = LatencyDistribution("const:0.05")
+
+    async def run():
+        return await asyncio.gather(*(_asearch_query(query) for query in QUERIES))
+
+    results = asyncio.run(run())
+
+    assert fake_search.calls == 1
+    assert all(result == results[0] for result in results)
+    # 请求完成后 key 即被释放，之后的调用会重新执行
+    asyncio.run(run())
+    assert fake_search.calls == 2
+
+
+def test_waiters_share_the_leader_error():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait()
+        raise RuntimeError("upstream down")
+
+    def follow():
+        started.wait()
+        return flight.do("key", lambda: "never called")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "key", fail)
+        follower = executor.submit(follow)
+        # 等待者登记之后再让 leader 失败
+        while flight.stats["shared"] == 0:
+            time.sleep(0.01)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="upstream down"):
+                future.result()
+
+    assert flight.stats == {"executed": 1, "shared": 1, "in_flight": 0}
+
+
+def test_cancelled_waiter_does_not_cancel_the_leader():
+    flight = AsyncSingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", fetch))
+        waiter = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        return await leader, waiter.cancelled()
+
+    assert asyncio.run(run()) == ("result", True)
+    assert calls == 1
+    assert flight.stats == {"executed": 1, "shared": 1, "in_flight": 0}
@@ -0,0 +1,51 @@
+"""进程级延迟单例（infra.singleton 及各组件的 get_* 函数）的测试。"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from reflexion_agent.infra import (
+    Settings,
+    get_default_compactor,
+    get_default_result_shaper,
+    get_llm_pool,
+    get_search_cache,
+    get_search_client,
+    set_settings,
+)
+
+
+@pytest.mark.parametrize(
+    "getter",
+    [get_default_compactor, get_default_result_shaper, get_search_cache, get_search_client, get_llm_pool],
+)
+def test_concurrent_cold_start_creates_one_instance(getter):
+    set_settings(Settings.from_env({"TAVILY_API_KEY": "test", "SEARCH_CACHE_ENABLED": "true"}))
+    barrier = threading.Barrier(8)
+
+    def cold_start(_):
+        barrier.wait()
+        return getter()
+
+    with ThreadPoolExecutor(8) as executor:
+        instances = list(executor.map(cold_start, range(8)))
+
+    assert instances[0] is not None
+    assert all(instance is instances[0] for instance in instances)
+
+
+def test_disabled_optional_components_are_not_created():
+    set_settings(
+        Settings.from_env(
+            {
+                "SEARCH_CACHE_ENABLED": "false",
+                "REFLEXION_COMPACTION_ENABLED": "false",
+                "REFLEXION_RESULT_SHAPING_ENABLED": "false",
+            }
+        )
+    )
+
+    assert get_search_cache() is None
+    assert get_default_compactor() is None
+    assert get_default_result_shaper() is None
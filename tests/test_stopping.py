@@ -0,0 +1,90 @@
+"""提前终止策略（nodes.stopping）的测试。"""
+
+from functools import reduce
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from reflexion_agent import create_reflexion_graph, get_run_counters
+from reflexion_agent.nodes import (
+    answer_converged,
+    default_stopping_policy,
+    empty_missing_critique,
+    no_new_queries,
+    track_answers,
+)
+
+
+def _answer(answer: str, queries: list[str], missing: str = "more detail") -> dict:
+    return {"answer": answer, "reflection": {"missing": missing, "superfluous": ""}, "search_queries": queries}
+
+
+def _message(args: dict) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": "ReviseAnswer", "args": args, "id": "call"}])
+
+
+def _states(*answers: dict) -> tuple[dict, dict]:
+    """同一组答案的两种状态：reducer 维护的 answer_progress，和只有消息历史的状态。"""
+    progress = reduce(track_answers, answers, {})
+    messages = [HumanMessage(content="q"), *(_message(args) for args in answers)]
+    return {"answer_progress": progress}, {"messages": messages}
+
+
+@pytest.mark.parametrize(
+    "policy, answers, expected",
+    [
+        (answer_converged(0.9), [_answer("the same answer text here", ["a"])], None),
+        (
+            answer_converged(0.9),
+            [_answer("the same answer text here", ["a"]), _answer("The same answer, text here!", ["b"])],
+            "answer_converged",
+        ),
+        (
+            answer_converged(0.9),
+            [_answer("one answer entirely", ["a"]), _answer("a different response altogether", ["b"])],
+            None,
+        ),
+        (empty_missing_critique(), [_answer("x", ["a"], missing="  ")], "empty_missing_critique"),
+        (empty_missing_critique(), [_answer("x", ["a"], missing="sources")], None),
+        (
+            no_new_queries(),
+            [_answer("x", ["Alpha", "beta"]), _answer("y", ["gamma"]), _answer("z", ["ALPHA ", "Gamma"])],
+            "no_new_queries",
+        ),
+        (no_new_queries(), [_answer("x", ["alpha"]), _answer("y", ["alpha", "delta"])], None),
+        # 同一轮内重复的查询不算“之前提出过”
+        (no_new_queries(), [_answer("x", ["alpha"])], None),
+    ],
+)
+def test_policies_read_progress_and_match_message_history(policy, answers, expected):
+    from_progress, from_messages = _states(*answers)
+
+    assert policy(from_progress) == expected
+    # 没有 answer_progress 的自定义图退回到从消息历史计算，结果相同
+    assert policy(from_messages) == expected
+
+
+def test_track_answers_keeps_only_a_summary():
+    progress = reduce(
+        track_answers,
+        [_answer("first", ["a"]), None, _answer("second", ["b", "a"]), _answer("third", ["c"])],
+        {},
+    )
+
+    assert progress["count"] == 3
+    assert (progress["previous_answer"], progress["answer"]) == ("second", "third")
+    assert progress["queries"] == {"c"}
+    assert progress["seen_queries"] == {"a", "b"}
+
+
+def test_graph_stops_early_with_default_policy(fake_llm, fake_search):
+    full = create_reflexion_graph(max_iterations=4).invoke({"messages": [("user", "What is reflexion?")]})
+    stopped = create_reflexion_graph(max_iterations=4, stopping_policy=default_stopping_policy()).invoke(
+        {"messages": [("user", "What is reflexion?")]}
+    )
+
+    # 替身模型每轮的答案几乎相同，第一次 revise 之后即收敛
+    assert get_run_counters(stopped)["iterations"] == 1
+    assert get_run_counters(full)["iterations"] == 5
+    assert stopped["answer_progress"]["count"] == 2
+    assert default_stopping_policy()(stopped) == "answer_converged"
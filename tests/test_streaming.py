@@ -0,0 +1,105 @@
+"""答案流式输出（nodes.streaming）的测试。"""
+
+import asyncio
+import json
+import random
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from reflexion_agent.nodes import draft
+from reflexion_agent.nodes.streaming import (
+    AnswerStreamParser,
+    QueryStreamParser,
+    ainvoke_streaming_answer,
+    invoke_streaming_answer,
+)
+
+MESSAGES = [HumanMessage(content="What is reflexion?")]
+
+ARGS = {
+    # 嵌套对象中的同名字段不会被提取
+    "reflection": {"answer": "nested", "search_queries": ["nested"], "missing": "a \"quoted\" gap"},
+    "search_queries": ["plain", "with \"quotes\" and \\ slash", "tab\tnew\nline", "emoji 😀 é 中文"],
+    "answer": "Line one\nLine \"two\" \\ back/slash \u2028 😀 𝄞 é 中文 end",
+    "references": ["https://example.com/a"],
+}
+
+
+def _chunks(payload: str, sizes) -> list[str]:
+    chunks, i = [], 0
+    for size in sizes:
+        if i >= len(payload):
+            break
+        chunks.append(payload[i : i + size])
+        i += size
+    if i < len(payload):
+        chunks.append(payload[i:])
+    return chunks
+
+
+def _splits(payload: str) -> list[list[str]]:
+    """固定长度和随机长度的切分方式，覆盖在转义序列和代理对中间切开的情况。"""
+    rng = random.Random(0)
+    fixed = [_chunks(payload, [size] * len(payload)) for size in (1, 2, 3, 5, 16)]
+    randomized = [_chunks(payload, [rng.randint(1, 12) for _ in payload]) for _ in range(20)]
+    return fixed + randomized
+
+
+def _payloads(args: dict) -> list[str]:
+    # ensure_ascii=True 时非 ASCII 字符编码为 \uXXXX，BMP 以外的字符编码为代理对
+    payloads = [json.dumps(args, ensure_ascii=True), json.dumps(args, ensure_ascii=False)]
+    # 转义的斜杠和空白分隔也是合法的 JSON
+    payloads.append(json.dumps(args, indent=2).replace("/", "\\/"))
+    return payloads
+
+
+@pytest.mark.parametrize(
+    "order",
+    [
+        ["reflection", "search_queries", "answer", "references"],
+        ["answer", "references", "search_queries", "reflection"],
+    ],
+)
+def test_parsers_match_json_for_any_chunking_and_key_order(order):
+    args = {key: ARGS[key] for key in order}
+    for payload in _payloads(args):
+        assert json.loads(payload) == args
+        for chunks in _splits(payload):
+            answer, queries = AnswerStreamParser("answer"), QueryStreamParser("search_queries")
+            deltas = [answer.feed(chunk) for chunk in chunks]
+            completed = [query for chunk in chunks for query in queries.feed(chunk)]
+
+            assert "".join(deltas) == args["answer"]
+            assert answer.done
+            assert completed == args["search_queries"]
+            assert queries.done
+
+
+def test_queries_complete_before_the_payload_ends():
+    payload = json.dumps({"search_queries": ["first", "second"], "answer": "x" * 100})
+    parser = QueryStreamParser()
+
+    cut = payload.index('"second"')
+    assert parser.feed(payload[:cut]) == ["first"]
+    assert parser.feed(payload[cut : cut + len('"second"')]) == ["second"]
+    assert not parser.done
+    assert parser.feed(payload[cut + len('"second"') :]) == []
+    assert parser.done
+
+
+def _tool_calls(message) -> list:
+    # 替身模型的工具调用 id 是进程级递增的，只比较名称和参数
+    return [(call["name"], call["args"]) for call in message.tool_calls]
+
+
+def test_streamed_message_matches_invoke(fake_llm):
+    chain = draft._create_first_responder_chain(fake_llm)
+    queries = []
+
+    streamed = invoke_streaming_answer(chain, MESSAGES, "draft", on_query=lambda _, query: queries.append(query))
+    asynced = asyncio.run(ainvoke_streaming_answer(chain, MESSAGES, "draft"))
+
+    expected = _tool_calls(chain.invoke(MESSAGES))
+    assert _tool_calls(streamed) == _tool_calls(asynced) == expected
+    assert queries == expected[0][1]["search_queries"]